@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, select
 from datetime import datetime, timedelta
 from typing import Optional
 
-from app.models.database import get_db, EmotionLog, LearningSession, Intervention
+from app.models.database import get_async_db, EmotionLog, LearningSession, Intervention
 from app.models.schemas import AnalyticsResponse
+from app.services.activity_rollups import emotion_frame_counts
+from app.services.emotion_compaction import load_emotion_spans
+from app.utils.time_ranges import between
 import logging
 
 router = APIRouter()
@@ -15,51 +18,44 @@ logger = logging.getLogger(__name__)
 async def get_user_analytics(
     user_id: int,
     days: int = 30,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get comprehensive analytics for a user"""
     try:
-        start_date = datetime.utcnow() - timedelta(days=days)
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
         
         # Get basic session stats
-        sessions = db.query(LearningSession).filter(
+        sessions = (await db.execute(select(LearningSession).where(
             and_(
                 LearningSession.user_id == user_id,
-                LearningSession.start_time >= start_date
+                between(LearningSession.start_time, start_date, end_date)
             )
-        ).all()
+        ))).scalars().all()
         
         total_sessions = len(sessions)
         average_engagement = sum(s.average_engagement or 0 for s in sessions) / max(total_sessions, 1)
         
-        # Get emotion distribution
-        emotions = db.query(
-            EmotionLog.primary_emotion,
-            func.count(EmotionLog.id).label('count')
-        ).filter(
-            and_(
-                EmotionLog.user_id == user_id,
-                EmotionLog.timestamp >= start_date
-            )
-        ).group_by(EmotionLog.primary_emotion).all()
+        # Get emotion distribution from hourly rollups
+        emotion_counts = await emotion_frame_counts(db, user_id, start_date, end_date)
         
-        total_emotions = sum(e.count for e in emotions)
+        total_emotions = sum(emotion_counts.values())
         emotion_distribution = {
-            e.primary_emotion: e.count / max(total_emotions, 1)
-            for e in emotions
+            emotion: count / max(total_emotions, 1)
+            for emotion, count in emotion_counts.items()
         }
         
         # Get intervention effectiveness
-        interventions = db.query(
+        interventions = (await db.execute(select(
             Intervention.intervention_type,
             func.avg(Intervention.effectiveness_score).label('avg_effectiveness')
-        ).join(Intervention.session).filter(
+        ).join(Intervention.session).where(
             and_(
-                Intervention.session.has(user_id=user_id),
-                Intervention.timestamp >= start_date,
+                LearningSession.user_id == user_id,
+                between(Intervention.timestamp, start_date, end_date),
                 Intervention.effectiveness_score.isnot(None)
             )
-        ).group_by(Intervention.intervention_type).all()
+        ).group_by(Intervention.intervention_type))).all()
         
         intervention_effectiveness = {
             i.intervention_type: float(i.avg_effectiveness or 0)
@@ -80,7 +76,7 @@ async def get_user_analytics(
         logger.error(f"Error getting analytics: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving analytics")
 
-async def _analyze_learning_patterns(user_id: int, sessions: list, db: Session) -> dict:
+async def _analyze_learning_patterns(user_id: int, sessions: list, db: AsyncSession) -> dict:
     """Analyze learning patterns for insights"""
     if not sessions:
         return {}
@@ -119,28 +115,50 @@ async def _analyze_learning_patterns(user_id: int, sessions: list, db: Session)
 async def get_emotion_timeline(
     user_id: int,
     hours: int = 24,
-    db: Session = Depends(get_db)
+    raw: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get emotion timeline for visualization"""
+    """Get emotion timeline for visualization.
+
+    By default each entry is a run of frames with the same emotion (mean
+    confidence and engagement over `frames` frames from timestamp to end);
+    raw=true returns every stored frame instead.
+    """
     try:
-        start_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        emotions = db.query(EmotionLog).filter(
-            and_(
-                EmotionLog.user_id == user_id,
-                EmotionLog.timestamp >= start_time
-            )
-        ).order_by(EmotionLog.timestamp).all()
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=hours)
         
-        timeline = [
-            {
-                "timestamp": e.timestamp.isoformat(),
-                "emotion": e.primary_emotion,
-                "confidence": e.confidence_score,
-                "engagement": e.engagement_level
-            }
-            for e in emotions
-        ]
+        if raw:
+            emotions = (await db.execute(select(EmotionLog).where(
+                and_(
+                    EmotionLog.user_id == user_id,
+                    between(EmotionLog.timestamp, start_time, end_time)
+                )
+            ).order_by(EmotionLog.timestamp))).scalars().all()
+            timeline = [
+                {
+                    "timestamp": e.timestamp.isoformat(),
+                    "end": e.timestamp.isoformat(),
+                    "emotion": e.primary_emotion,
+                    "confidence": e.confidence_score,
+                    "engagement": e.engagement_level,
+                    "frames": 1
+                }
+                for e in emotions
+            ]
+        else:
+            spans = await load_emotion_spans(db, user_id, start_time, end_time)
+            timeline = [
+                {
+                    "timestamp": span.timestamp.isoformat(),
+                    "end": span.end.isoformat(),
+                    "emotion": span.primary_emotion,
+                    "confidence": span.confidence,
+                    "engagement": span.engagement,
+                    "frames": span.frames
+                }
+                for span in spans
+            ]
         
         return {"timeline": timeline}
     except Exception as e:
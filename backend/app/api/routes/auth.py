@@ -1,10 +1,11 @@
 # api/routes/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
-from app.models.database import get_db, User
+from app.models.database import get_async_db, User
 from app.models.schemas import UserCreate, UserResponse, Token
 from app.services.auth_service import auth_service
 import logging
@@ -13,13 +14,13 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register new user"""
     try:
         # Check if user already exists
-        existing_user = db.query(User).filter(
+        existing_user = (await db.execute(select(User).where(
             (User.email == user_data.email) | (User.username == user_data.username)
-        ).first()
+        ))).scalars().first()
         
         if existing_user:
             raise HTTPException(
@@ -37,8 +38,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         logger.info(f"New user registered: {user_data.email}")
         return new_user
@@ -49,10 +50,10 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), 
-               db: Session = Depends(get_db)):
+               db: AsyncSession = Depends(get_async_db)):
     """Login user and return JWT token"""
     try:
-        user = auth_service.authenticate_user(db, form_data.username, form_data.password)
+        user = await auth_service.authenticate_user(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,15 +84,15 @@ async def get_current_user_info(current_user: User = Depends(auth_service.get_cu
 async def update_user_profile(
     username: str = None,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user profile"""
     try:
         if username:
             # Check if username is already taken
-            existing_user = db.query(User).filter(
+            existing_user = (await db.execute(select(User).where(
                 User.username == username, User.id != current_user.id
-            ).first()
+            ))).scalars().first()
             if existing_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -99,8 +100,8 @@ async def update_user_profile(
                 )
             current_user.username = username
         
-        db.commit()
-        db.refresh(current_user)
+        await db.commit()
+        await db.refresh(current_user)
         return current_user
         
     except HTTPException:
@@ -114,7 +115,7 @@ async def change_password(
     current_password: str,
     new_password: str,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Change user password"""
     try:
@@ -125,7 +126,7 @@ async def change_password(
             )
         
         current_user.hashed_password = auth_service.get_password_hash(new_password)
-        db.commit()
+        await db.commit()
         
         return {"message": "Password changed successfully"}
         
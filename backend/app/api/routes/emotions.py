@@ -1,14 +1,21 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from collections import deque
+from typing import Callable, Deque, List, Tuple
+import asyncio
 import json
 import logging
+import math
+import time
+
+from app.config.settings import settings
 
-from app.models.database import get_db, EmotionLog, LearningSession
 from app.models.schemas import EmotionData, EmotionResponse
 from app.services.emotion_detection import emotion_service
+from app.services.emotion_log_writer import emotion_log_row, emotion_log_writer
 from app.services.feedback_engine import feedback_engine
 from app.models.schemas import InterventionRequest
+from app.utils.frame_protocol import EmotionFrame, FrameProtocolError, decode_frame
+from app.utils.frame_queue import LatestFrameQueue
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -24,8 +31,10 @@ class ConnectionManager:
         self.user_connections[user_id] = websocket
     
     def disconnect(self, websocket: WebSocket, user_id: int):
-        self.active_connections.remove(websocket)
-        if user_id in self.user_connections:
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        # A newer connection of the same user stays registered
+        if self.user_connections.get(user_id) is websocket:
             del self.user_connections[user_id]
     
     async def send_personal_message(self, message: str, user_id: int):
@@ -34,31 +43,104 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+class SupersededAudio:
+    """Frames dropped under backpressure whose audio still belongs in the voice window.
+
+    Only frames dropped within window_seconds of the newest are kept, and at
+    most max_frames of them, so catching up never costs more than the
+    window the voice ring holds anyway.
+    """
+
+    def __init__(self, window_seconds: float, max_frames: int = 64,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._frames: Deque[Tuple[float, EmotionFrame]] = deque(maxlen=max_frames)
+
+    def add(self, frame: EmotionFrame):
+        if not frame.has_audio:
+            return
+        now = self.clock()
+        self._frames.append((now, frame))
+        while self._frames[0][0] < now - self.window_seconds:
+            self._frames.popleft()
+
+    def take(self) -> List[EmotionFrame]:
+        """Kept frames, oldest first, emptying the buffer"""
+        frames = [frame for _, frame in self._frames]
+        self._frames.clear()
+        return frames
+
+# Totals across all live connections, since process start
+websocket_stats = {'frames_received': 0, 'frames_processed': 0, 'frames_dropped': 0}
+
+def _parse_frame(message: dict) -> EmotionFrame:
+    """Decode a WebSocket message in either wire format"""
+    if message.get("bytes") is not None:
+        return decode_frame(message["bytes"])
+    return EmotionFrame.from_emotion_data(EmotionData.parse_raw(message["text"]))
+
+async def _receive_frames(websocket: WebSocket, user_id: int, queue: LatestFrameQueue):
+    """Read client messages into the connection's frame queue until it disconnects"""
+    try:
+        while True:
+            # Receive emotion data (binary frames, or JSON from older clients)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                frame = _parse_frame(message)
+            except FrameProtocolError as e:
+                logger.warning(f"Dropping malformed frame from user {user_id}: {e}")
+                continue
+            dropped = queue.dropped
+            queue.put(frame)
+            websocket_stats['frames_received'] += 1
+            websocket_stats['frames_dropped'] += queue.dropped - dropped
+    finally:
+        queue.close()
+
+def _backpressure_notice(queue: LatestFrameQueue, reported_drops: int, frame_seconds: float) -> dict:
+    """Message asking the client to send no faster than frames are processed"""
+    return {
+        "type": "backpressure",
+        "dropped": queue.dropped,
+        "dropped_since_last": queue.dropped - reported_drops,
+        "suggested_interval_ms": int(math.ceil(frame_seconds * 1.25 * 1000))
+    }
+
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, user_id: int):
     await manager.connect(websocket, user_id)
+    # Receiving runs independently of processing; when inference falls behind,
+    # stale frames are replaced by the newest instead of piling up. Their
+    # audio is still fed to the rolling voice window, in arrival order.
+    superseded_audio = SupersededAudio(settings.VOICE_STREAM_WINDOW_SECONDS)
+    queue = LatestFrameQueue(settings.WS_FRAME_QUEUE_SIZE,
+                             on_drop=superseded_audio.add if settings.VOICE_STREAMING else None)
+    receiver = asyncio.create_task(_receive_frames(websocket, user_id, queue))
+    reported_drops = 0
+    last_notice = 0.0
+    frame_seconds = 0.0
     try:
         while True:
-            # Receive emotion data
-            data = await websocket.receive_text()
-            emotion_data = EmotionData.parse_raw(data)
+            frame = await queue.get()
+            if frame is None:
+                break
+            started = time.monotonic()
+            superseded = superseded_audio.take()
+            if superseded:
+                await emotion_service.buffer_audio(superseded, id(websocket))
             
             # Process emotion data
-            emotion_response = await emotion_service.process_emotion_data(emotion_data)
-            
-            # Store in database
-            emotion_log = EmotionLog(
-                user_id=user_id,
-                session_id=emotion_data.interaction_data.get('session_id'),
-                facial_emotions=emotion_response.facial_emotions,
-                voice_emotions=emotion_response.voice_emotions,
-                interaction_score=emotion_response.interaction_score,
-                primary_emotion=emotion_response.primary_emotion,
-                confidence_score=emotion_response.confidence,
-                engagement_level=emotion_response.engagement_level
+            emotion_response = await emotion_service.process_frame(
+                frame, connection_id=id(websocket)
             )
-            db.add(emotion_log)
-            db.commit()
+            
+            # Store in database (batched write-behind)
+            emotion_log_writer.add(emotion_log_row(
+                user_id, frame.interaction_data.get('session_id'), emotion_response
+            ))
             
             # Send response back
             await websocket.send_text(emotion_response.json())
@@ -68,7 +150,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = D
                 intervention_request = InterventionRequest(
                     emotion=emotion_response.primary_emotion,
                     confidence=emotion_response.confidence,
-                    context=emotion_data.interaction_data
+                    context=frame.interaction_data
                 )
                 
                 intervention = await feedback_engine.generate_intervention(
@@ -80,37 +162,44 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = D
                     "type": "intervention",
                     "data": intervention.dict()
                 }))
-                
+            
+            websocket_stats['frames_processed'] += 1
+            elapsed = time.monotonic() - started
+            frame_seconds = elapsed if not frame_seconds else 0.8 * frame_seconds + 0.2 * elapsed
+            
+            # Tell the client to slow down while frames are being dropped
+            if (settings.WS_BACKPRESSURE_NOTICES and queue.dropped > reported_drops
+                    and time.monotonic() - last_notice >= settings.WS_BACKPRESSURE_NOTICE_SECONDS):
+                await websocket.send_text(json.dumps(_backpressure_notice(queue, reported_drops, frame_seconds)))
+                reported_drops = queue.dropped
+                last_notice = time.monotonic()
+        
+        # Surfaces receive errors; a clean disconnect just ends the loop
+        await receiver
+        logger.info(f"User {user_id} disconnected ({queue.received} frames received, {queue.dropped} dropped)")
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
         logger.info(f"User {user_id} disconnected")
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {e}")
         await websocket.close()
+    finally:
+        receiver.cancel()
+        manager.disconnect(websocket, user_id)
+        emotion_service.close_connection(id(websocket))
 
 @router.post("/analyze", response_model=EmotionResponse)
 async def analyze_emotion(
     emotion_data: EmotionData,
-    user_id: int,
-    db: Session = Depends(get_db)
+    user_id: int
 ):
     """Analyze emotion data via REST API"""
     try:
         emotion_response = await emotion_service.process_emotion_data(emotion_data)
         
-        # Store in database
-        emotion_log = EmotionLog(
-            user_id=user_id,
-            session_id=emotion_data.interaction_data.get('session_id'),
-            facial_emotions=emotion_response.facial_emotions,
-            voice_emotions=emotion_response.voice_emotions,
-            interaction_score=emotion_response.interaction_score,
-            primary_emotion=emotion_response.primary_emotion,
-            confidence_score=emotion_response.confidence,
-            engagement_level=emotion_response.engagement_level
-        )
-        db.add(emotion_log)
-        db.commit()
+        # Store in database (batched write-behind)
+        emotion_log_writer.add(emotion_log_row(
+            user_id, emotion_data.interaction_data.get('session_id'), emotion_response
+        ))
         
         return emotion_response
     except Exception as e:
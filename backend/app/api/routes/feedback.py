@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models.database import get_db, Intervention
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.database import get_async_db, Intervention, LearningSession
 from app.models.schemas import InterventionRequest, InterventionResponse
 from app.services.feedback_engine import feedback_engine
 import logging
@@ -13,7 +14,7 @@ async def request_intervention(
     request: InterventionRequest,
     user_id: int,
     session_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Request intervention based on detected emotion"""
     try:
@@ -28,7 +29,7 @@ async def request_intervention(
             user_response='pending'
         )
         db.add(intervention_record)
-        db.commit()
+        await db.commit()
         
         return intervention
     except Exception as e:
@@ -40,11 +41,11 @@ async def record_intervention_response(
     intervention_id: int,
     response: str,  # accepted, dismissed, completed
     effectiveness: float = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Record user response to intervention"""
     try:
-        intervention = db.query(Intervention).filter(Intervention.id == intervention_id).first()
+        intervention = await db.get(Intervention, intervention_id)
         if not intervention:
             raise HTTPException(status_code=404, detail="Intervention not found")
         
@@ -52,7 +53,7 @@ async def record_intervention_response(
         if effectiveness is not None:
             intervention.effectiveness_score = effectiveness
         
-        db.commit()
+        await db.commit()
         return {"status": "success"}
     except Exception as e:
         logger.error(f"Error recording intervention response: {e}")
@@ -62,15 +63,15 @@ async def record_intervention_response(
 async def get_intervention_history(
     user_id: int,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get intervention history for a user"""
     try:
-        interventions = db.query(Intervention).join(
+        interventions = (await db.execute(select(Intervention).join(
             Intervention.session
-        ).filter(
-            Intervention.session.has(user_id=user_id)
-        ).order_by(Intervention.timestamp.desc()).limit(limit).all()
+        ).where(
+            LearningSession.user_id == user_id
+        ).order_by(Intervention.timestamp.desc()).limit(limit))).scalars().all()
         
         return [
             {
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import logging
+
+from app.models.database import User
+from app.models.emotion_models import emotion_models, model_paths
+from app.models.schemas import ModelReloadRequest, ModelVersionResponse
+from app.services.auth_service import auth_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _version_response() -> ModelVersionResponse:
+    return ModelVersionResponse(
+        version=emotion_models.version,
+        ready=emotion_models.ready,
+        models=emotion_models.status()
+    )
+
+@router.get("/", response_model=ModelVersionResponse)
+async def get_model_version():
+    """Get the active emotion model version"""
+    return _version_response()
+
+@router.post("/reload", response_model=ModelVersionResponse)
+async def reload_models(request: ModelReloadRequest,
+                        admin: User = Depends(auth_service.get_current_admin)):
+    """Load, validate and activate a model version without a restart (admins only).
+
+    Only registry versions or the configured paths can be loaded. The
+    version is validated in the worker that serves the request, then
+    written to the registry's shared pointer, which every other worker and
+    inference process checks every MODEL_RELOAD_CHECK_SECONDS.
+    """
+    try:
+        model_paths(request.version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        await asyncio.to_thread(emotion_models.activate, request.version)
+    except RuntimeError as e:
+        logger.error(f"Model reload rejected: {e}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reloading models: {e}")
+        raise HTTPException(status_code=500, detail="Error reloading models")
+    return _version_response()
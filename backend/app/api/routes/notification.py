@@ -1,22 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models.database import get_db
+from fastapi import APIRouter, HTTPException
 from app.services.notification_service import notification_service
 
 router = APIRouter()
 
 @router.post("/send-progress")
-async def send_progress_notification(user_id: int, achievement: str, db: Session = Depends(get_db)):
+async def send_progress_notification(user_id: int, achievement: str):
     try:
-        await notification_service.send_progress_notification(user_id, achievement, db)
+        await notification_service.send_progress_notification(user_id, achievement)
         return {"status": "sent"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/send-reminder")
-async def send_reminder_notification(user_id: int, message: str, db: Session = Depends(get_db)):
+async def send_reminder_notification(user_id: int, message: str):
     try:
-        await notification_service.send_reminder_notification(user_id, message, db)
+        await notification_service.send_reminder_notification(user_id, message)
         return {"status": "sent"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,11 +1,24 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
     # Database (loaded from .env)
     DATABASE_URL: str
+    # asyncio driver URL for request handlers; derived from DATABASE_URL when unset
+    # (postgresql -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
 
+    # Connection pools, per engine and worker: steady size, burst overflow, seconds
+    # to wait for a free connection and connection lifetime (ignored for SQLite)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Run python -m app.services.schema_migration when the app is imported
+    # (gunicorn.conf.py turns this off and migrates once in the master)
+    MIGRATE_ON_STARTUP: bool = True
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
@@ -14,12 +27,90 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Accounts allowed to use admin endpoints such as model reload (a JSON list in .env)
+    ADMIN_EMAILS: List[str] = []
     
     # Model paths
     FACIAL_MODEL_PATH: str = "app/ml_models/facial_emotion_model.pkl"
     VOICE_MODEL_PATH: str = "app/ml_models/voice_emotion_model.pkl"
     INTERACTION_MODEL_PATH: str = "app/ml_models/interaction_model.pkl"
     
+    # Model loading: in the background at startup (else on first use) with memory-mapped arrays
+    MODEL_BACKGROUND_LOAD: bool = True
+    MODEL_MMAP: bool = True
+    
+    # Model versions: MODEL_REGISTRY_DIR/<version>/ holds one file per model path above and
+    # MODEL_REGISTRY_DIR/.active names the version all processes serve; the pointer and the
+    # active files are checked for changes every MODEL_RELOAD_CHECK_SECONDS (0 = off)
+    MODEL_REGISTRY_DIR: str = "app/ml_models/versions"
+    MODEL_RELOAD_CHECK_SECONDS: float = 30.0
+    
+    # Voice feature profile ("full" matches training, "fast" skips tempo/tonnetz)
+    VOICE_FEATURE_PROFILE: str = "full"
+    
+    # Incremental voice features over a rolling window for WebSocket streams
+    # (matches the extractor except tonnetz, which gets the fast-profile fill)
+    VOICE_STREAMING: bool = True
+    VOICE_STREAM_WINDOW_SECONDS: float = 3.0
+    
+    # Facial frame gating (skip inference on unchanged or empty frames)
+    FRAME_GATE_ENABLED: bool = True
+    FRAME_GATE_DIFF_THRESHOLD: float = 4.0
+    FRAME_GATE_MIN_STD: float = 8.0
+    FRAME_GATE_MAX_REUSE: int = 10
+    
+    # Facial image path: JPEG decode downscale (1, 2, 4 or 8) and face ROI tracking
+    FACIAL_DECODE_SCALE: int = 2
+    FACE_TRACKING_ENABLED: bool = True
+    FACE_DETECT_INTERVAL: int = 10
+    FACE_TRACK_MIN_SCORE: float = 0.6
+    
+    # Voice activity gate in front of voice inference
+    VAD_ENABLED: bool = True
+    VAD_ENERGY_THRESHOLD_DB: float = -45.0
+    VAD_MAX_ZCR: float = 0.35
+    VAD_MIN_SPEECH_RATIO: float = 0.1
+    
+    # Inference executor ("thread" or "process")
+    INFERENCE_EXECUTOR: str = "thread"
+    INFERENCE_WORKERS: int = 4
+
+    # WebSocket frame queue: frames waiting per connection (newest wins) and
+    # how often clients are told to lower their send rate while frames drop
+    WS_FRAME_QUEUE_SIZE: int = 1
+    WS_BACKPRESSURE_NOTICES: bool = True
+    WS_BACKPRESSURE_NOTICE_SECONDS: float = 5.0
+    
+    # Write-behind EmotionLog persistence: bulk insert every N rows or T seconds
+    EMOTION_LOG_BATCH_SIZE: int = 500
+    EMOTION_LOG_FLUSH_SECONDS: float = 1.0
+    EMOTION_LOG_MAX_BUFFER: int = 50000
+    
+    # Native time partitioning of emotion_logs (PostgreSQL; takes effect when the table
+    # is created). Partitions are "month" or "week" wide and created PARTITIONS_AHEAD
+    # periods in advance; past partitions beyond RETENTION_PARTITIONS (0 = keep all)
+    # are detached, or dropped with EMOTION_LOG_DROP_EXPIRED
+    EMOTION_LOG_PARTITIONING: bool = False
+    EMOTION_LOG_PARTITION_INTERVAL: str = "month"
+    EMOTION_LOG_PARTITIONS_AHEAD: int = 2
+    EMOTION_LOG_RETENTION_PARTITIONS: int = 0
+    EMOTION_LOG_DROP_EXPIRED: bool = False
+    EMOTION_LOG_PARTITION_CHECK_SECONDS: float = 3600.0
+    
+    # Run-length compaction of emotion_logs into emotion_segments every N seconds
+    # (0 = off); a gap over MAX_GAP_SECONDS starts a new segment for the same emotion.
+    # Missing ids (batches not yet committed) hold compaction back for up to
+    # GAP_TIMEOUT_SECONDS before they are treated as rolled back
+    EMOTION_COMPACTION_SECONDS: float = 60.0
+    EMOTION_COMPACTION_CHUNK_SIZE: int = 5000
+    EMOTION_SEGMENT_MAX_GAP_SECONDS: float = 30.0
+    EMOTION_COMPACTION_GAP_TIMEOUT_SECONDS: float = 300.0
+    
+    # Cross-connection prediction batching
+    PREDICTION_BATCHING: bool = True
+    PREDICTION_BATCH_MAX_SIZE: int = 32
+    PREDICTION_BATCH_MAX_WAIT_MS: float = 5.0
+
     # API Settings
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "AI Feedback Coach"
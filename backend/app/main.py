@@ -1,22 +1,35 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 # from fastapi.staticfiles import StaticFiles  # Uncomment if you later use static files
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 import logging
 
 from app.config.settings import settings
-from app.models.database import engine, Base, get_db
-from app.api.routes import emotions, feedback, analytics, resources, auth ,notification,reports
-from app.api.routes.chat import chat_router  
+from app.models.database import async_engine, get_async_db, pool_stats, async_pool_stats
+from app.models.emotion_models import emotion_models
+from app.api.routes import emotions, feedback, analytics, resources, auth ,notification,reports, models
+from app.api.routes.chat import chat_router
+from app.api.routes.emotions import websocket_stats
+from app.services.emotion_compaction import emotion_compaction
+from app.services.emotion_log_conversion import require_converted
+from app.services.emotion_log_partitions import emotion_log_partitions
+from app.services.emotion_log_writer import emotion_log_writer
+from app.services.inference_executor import inference_executor
+from app.services.prediction_batcher import prediction_batcher
+from app.services.schema_migration import migrate
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Single-process servers set up the schema here; gunicorn.conf.py migrates once in the master
+if settings.MIGRATE_ON_STARTUP:
+    migrate()
+# Do not accept frames the emotion log writer could not persist
+require_converted()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -45,22 +58,61 @@ app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics",
 app.include_router(resources.router, prefix=f"{settings.API_V1_STR}/resources", tags=["resources"])
 app.include_router(notification.router, prefix=f"{settings.API_V1_STR}/notifications", tags=["notifications"])
 app.include_router(reports.router, prefix=f"{settings.API_V1_STR}/reports", tags=["reports"])
+app.include_router(models.router, prefix=f"{settings.API_V1_STR}/models", tags=["models"])
 app.include_router(chat_router, prefix=f"{settings.API_V1_STR}")
 
+@app.on_event("startup")
+async def startup_event():
+    """Start loading and warming up the emotion models, the log writer and emotion log upkeep"""
+    if settings.MODEL_BACKGROUND_LOAD:
+        emotion_models.start_background_load()
+    emotion_log_writer.start()
+    emotion_log_partitions.start()
+    emotion_compaction.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered emotion logs, close pooled connections and release inference workers"""
+    await emotion_log_writer.stop()
+    await emotion_log_partitions.stop()
+    await emotion_compaction.stop()
+    await async_engine.dispose()
+    inference_executor.shutdown(wait=False)
+
 @app.get("/")
 async def root():
     return {"message": "AI Feedback Coach API", "version": "1.0.0"}
 
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     """Health check endpoint"""
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until every emotion model is loaded and warmed up"""
+    if not emotion_models.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "version": emotion_models.version, "models": emotion_models.status()})
+    return {"status": "ready", "version": emotion_models.version, "models": emotion_models.status()}
+
+@app.get("/metrics")
+async def metrics():
+    """Pipeline counters: emotion log buffer, WebSocket frames, prediction batches and DB pools"""
+    return {
+        "emotion_log_writer": emotion_log_writer.stats(),
+        "websocket": websocket_stats,
+        "prediction_batches": prediction_batcher.stats,
+        "db_pools": {
+            "sync": pool_stats.stats(),
+            "async": async_pool_stats.stats()
+        }
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
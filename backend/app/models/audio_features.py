@@ -0,0 +1,97 @@
+import numpy as np
+import librosa
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Vector layout expected by the voice model (must match the training script)
+VOICE_FEATURE_LAYOUT = [
+    ('mfcc', 40),
+    ('chroma', 12),
+    ('mel', 128),
+    ('contrast', 7),
+    ('tonnetz', 6),
+    ('zcr', 1),
+    ('rms', 1),
+    ('tempo', 1),
+    ('yin', 1),
+]
+
+# Constants used in place of features a profile skips, so the vector width
+# (and the slot of every other feature) stays what the model was trained on
+SKIPPED_FEATURE_FILL = {
+    'tonnetz': 0.0,
+    'tempo': 120.0,
+}
+
+FEATURE_PROFILES: Dict[str, List[str]] = {
+    'full': [name for name, _ in VOICE_FEATURE_LAYOUT],
+    # Drops the HPSS pass behind tonnetz and the tempo autocorrelation
+    'fast': ['mfcc', 'chroma', 'mel', 'contrast', 'zcr', 'rms', 'yin'],
+}
+
+class AudioFeatureExtractor:
+    """Builds the voice model feature vector from a single STFT.
+
+    librosa's feature functions each recompute the STFT (and mfcc/tempo the
+    mel spectrogram) when given a raw signal. Here the complex STFT is
+    computed once and every spectral feature is derived from it, which gives
+    the same values as calling the functions on ``y`` directly.
+    """
+
+    def __init__(self, profile: str = 'full', n_fft: int = 2048, hop_length: int = 512):
+        if profile not in FEATURE_PROFILES:
+            raise ValueError(f"Unknown audio feature profile: {profile}")
+        self.profile = profile
+        self.features = set(FEATURE_PROFILES[profile])
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+    def extract(self, audio_data: np.ndarray, sr: int = 22050) -> np.ndarray:
+        """Return the 1xN voice feature vector for an audio signal"""
+        stft = librosa.stft(audio_data, n_fft=self.n_fft, hop_length=self.hop_length)
+        magnitude = np.abs(stft)
+        power = magnitude ** 2
+        mel = librosa.feature.melspectrogram(S=power, sr=sr)
+        log_mel = librosa.power_to_db(mel)
+
+        values = {
+            'mfcc': np.mean(librosa.feature.mfcc(S=log_mel, sr=sr, n_mfcc=40), axis=1),
+            'chroma': np.mean(librosa.feature.chroma_stft(S=power, sr=sr), axis=1),
+            'mel': np.mean(mel, axis=1),
+            'contrast': np.mean(librosa.feature.spectral_contrast(S=magnitude, sr=sr), axis=1),
+            'zcr': [np.mean(librosa.feature.zero_crossing_rate(y=audio_data))],
+            'rms': [np.mean(librosa.feature.rms(y=audio_data))],
+            'yin': self._yin(audio_data, sr),
+        }
+
+        if 'tonnetz' in self.features:
+            # Same as librosa.effects.harmonic, minus its own STFT
+            harmonic_stft = librosa.decompose.hpss(stft)[0]
+            harmonic = librosa.istft(
+                harmonic_stft, dtype=audio_data.dtype, hop_length=self.hop_length,
+                n_fft=self.n_fft, length=audio_data.shape[-1]
+            )
+            values['tonnetz'] = np.mean(librosa.feature.tonnetz(y=harmonic, sr=sr), axis=1)
+
+        if 'tempo' in self.features:
+            onset_envelope = librosa.onset.onset_strength(S=log_mel, sr=sr, hop_length=self.hop_length)
+            values['tempo'] = [librosa.beat.tempo(onset_envelope=onset_envelope, sr=sr,
+                                                  hop_length=self.hop_length)[0]]
+
+        parts = []
+        for name, size in VOICE_FEATURE_LAYOUT:
+            if name in values:
+                parts.append(values[name])
+            else:
+                parts.append(np.full(size, SKIPPED_FEATURE_FILL[name]))
+        return np.hstack(parts).reshape(1, -1)
+
+    @staticmethod
+    def _yin(audio_data: np.ndarray, sr: int) -> List[float]:
+        # YIN (fundamental frequency)
+        try:
+            return [np.mean(librosa.yin(audio_data, fmin=50, fmax=300, sr=sr))]
+        except Exception:
+            return [0.0]
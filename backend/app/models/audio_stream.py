@@ -0,0 +1,184 @@
+import math
+import threading
+import numpy as np
+import librosa
+from typing import Optional
+import logging
+
+from app.models.audio_features import (
+    FEATURE_PROFILES, SKIPPED_FEATURE_FILL, VOICE_FEATURE_LAYOUT
+)
+
+logger = logging.getLogger(__name__)
+
+class PcmRingBuffer:
+    """Fixed-size float32 ring buffer addressed by absolute sample position"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self.total_written = 0
+
+    def push(self, samples: np.ndarray):
+        samples = samples[-self.capacity:]
+        start = self.total_written % self.capacity
+        end = start + len(samples)
+        if end <= self.capacity:
+            self._buffer[start:end] = samples
+        else:
+            split = self.capacity - start
+            self._buffer[start:] = samples[:split]
+            self._buffer[:end - self.capacity] = samples[split:]
+        self.total_written += len(samples)
+
+    @property
+    def oldest(self) -> int:
+        """Absolute position of the oldest sample still held"""
+        return max(0, self.total_written - self.capacity)
+
+    def read(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """Copy samples [start, end) out of the buffer"""
+        end = self.total_written if end is None else end
+        start = max(start, self.oldest)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        indices = np.arange(start, end) % self.capacity
+        return self._buffer[indices]
+
+class StreamingAudioFeatures:
+    """Incremental voice features over a sliding window of a live audio stream.
+
+    Every pushed chunk is appended to a PCM ring buffer and only the STFT
+    frames that became complete are analysed. Per-frame features and power
+    spectra go into frame rings covering the window, so each tick runs the
+    STFT, contrast and YIN on the new audio only. Features that depend on the
+    whole window in AudioFeatureExtractor (the top_db clip behind MFCC and
+    tempo, chroma tuning) are computed from the rings when the vector is
+    built, which keeps values within edge-frame effects of the extractor on
+    the same window.
+
+    tonnetz needs an HPSS and CQT pass over the whole window, which costs
+    more than the batch extractor saves, so it always gets the constant the
+    fast profile uses.
+    """
+
+    # Column layout of the frame ring
+    _COLUMNS = [('mel', 128), ('contrast', 7), ('zcr', 1), ('rms', 1), ('yin', 1)]
+
+    # Features the stream never computes, filled as in the fast profile
+    UNSTREAMED = {'tonnetz'}
+
+    def __init__(self, sr: int = 22050, window_seconds: float = 3.0, profile: str = 'full',
+                 n_fft: int = 2048, hop_length: int = 512):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.features = set(FEATURE_PROFILES[profile]) - self.UNSTREAMED
+        self.window_frames = max(1, math.ceil(window_seconds * sr / hop_length))
+
+        self._pcm = PcmRingBuffer(int(window_seconds * sr) + n_fft)
+        self._next_frame_start = 0
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
+        self._window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+
+        self._slices = {}
+        offset = 0
+        for name, size in self._COLUMNS:
+            self._slices[name] = slice(offset, offset + size)
+            offset += size
+        self._frames = np.zeros((self.window_frames, offset), dtype=np.float32)
+        self._power = np.zeros((self.window_frames, 1 + n_fft // 2), dtype=np.float32)
+        self._frame_count = 0
+        self._lock = threading.Lock()
+
+    def push(self, audio_data: np.ndarray) -> Optional[np.ndarray]:
+        """Add a chunk of mono PCM and return the current 1xN voice vector"""
+        with self._lock:
+            self._pcm.push(np.asarray(audio_data, dtype=np.float32))
+            self._analyse_new_frames()
+            return self._vector()
+
+    def add(self, audio_data: np.ndarray):
+        """Add a chunk of mono PCM without building the vector"""
+        with self._lock:
+            self._pcm.push(np.asarray(audio_data, dtype=np.float32))
+            self._analyse_new_frames()
+
+    def _analyse_new_frames(self):
+        # Skip frames whose samples already fell out of the ring
+        self._next_frame_start = max(self._next_frame_start, self._pcm.oldest)
+        available = self._pcm.total_written - self._next_frame_start
+        if available < self.n_fft:
+            return
+
+        n_frames = 1 + (available - self.n_fft) // self.hop_length
+        if n_frames > self.window_frames:
+            # Only the newest window's worth of frames can be kept anyway
+            self._next_frame_start += (n_frames - self.window_frames) * self.hop_length
+            n_frames = self.window_frames
+        end = self._next_frame_start + (n_frames - 1) * self.hop_length + self.n_fft
+        samples = self._pcm.read(self._next_frame_start, end)
+        frames = librosa.util.frame(samples, frame_length=self.n_fft, hop_length=self.hop_length)
+        self._next_frame_start += n_frames * self.hop_length
+
+        stft = np.fft.rfft(frames * self._window[:, None], axis=0)
+        magnitude = np.abs(stft)
+        power = magnitude ** 2
+
+        block = np.zeros((n_frames, self._frames.shape[1]), dtype=np.float32)
+        block[:, self._slices['mel']] = (self._mel_basis @ power).T
+        block[:, self._slices['contrast']] = librosa.feature.spectral_contrast(
+            S=magnitude, sr=self.sr, n_fft=self.n_fft).T
+
+        # As librosa.feature.zero_crossing_rate: near-zero samples count as positive
+        signs = np.signbit(np.where(np.abs(frames) <= 1e-10, 0.0, frames))
+        block[:, self._slices['zcr']] = (np.sum(signs[1:] != signs[:-1], axis=0) / self.n_fft)[:, None]
+        block[:, self._slices['rms']] = np.sqrt(np.mean(frames ** 2, axis=0))[:, None]
+        try:
+            block[:, self._slices['yin']] = librosa.yin(
+                samples, fmin=50, fmax=300, sr=self.sr, frame_length=self.n_fft,
+                hop_length=self.hop_length, center=False)[:n_frames, None]
+        except Exception:
+            block[:, self._slices['yin']] = 0.0
+
+        positions = (self._frame_count + np.arange(n_frames)) % self.window_frames
+        self._frames[positions] = block
+        self._power[positions] = power.T
+        self._frame_count += n_frames
+
+    def _vector(self) -> Optional[np.ndarray]:
+        filled = min(self._frame_count, self.window_frames)
+        if filled == 0:
+            return None
+
+        # Ring rows in chronological order
+        start = self._frame_count % self.window_frames if self._frame_count > self.window_frames else 0
+        order = (start + np.arange(filled)) % self.window_frames
+        frames = self._frames[order]
+        mel = frames[:, self._slices['mel']].T
+        # Clipped to top_db below the window's peak, as the extractor does
+        log_mel = librosa.power_to_db(mel)
+
+        values = {name: frames[:, self._slices[name]].mean(axis=0) for name, _ in self._COLUMNS}
+        values['mfcc'] = np.mean(librosa.feature.mfcc(S=log_mel, sr=self.sr, n_mfcc=40), axis=1)
+        # Tuning is estimated over the whole window, so chroma cannot be kept per frame
+        values['chroma'] = np.mean(librosa.feature.chroma_stft(
+            S=self._power[order].T, sr=self.sr, n_fft=self.n_fft), axis=1)
+        if 'tempo' in self.features:
+            values['tempo'] = [self._tempo(log_mel)]
+
+        parts = []
+        for name, size in VOICE_FEATURE_LAYOUT:
+            if name in values and name in self.features:
+                parts.append(values[name])
+            else:
+                parts.append(np.full(size, SKIPPED_FEATURE_FILL[name]))
+        return np.hstack(parts).reshape(1, -1)
+
+    def _tempo(self, log_mel: np.ndarray) -> float:
+        try:
+            onset_envelope = librosa.onset.onset_strength(S=log_mel, sr=self.sr, hop_length=self.hop_length)
+            return float(librosa.beat.tempo(onset_envelope=onset_envelope, sr=self.sr,
+                                            hop_length=self.hop_length)[0])
+        except Exception:
+            return SKIPPED_FEATURE_FILL['tempo']
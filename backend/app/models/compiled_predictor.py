@@ -0,0 +1,261 @@
+# models/compiled_predictor.py
+import os
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COMPILED_FORMAT_VERSION = 1
+
+# Class whose probability is reported as engagement by classifier bundles
+ENGAGED_CLASS = 'engaged'
+
+class CompiledPredictor:
+    """Flat-array form of a fitted sklearn tree ensemble or linear model.
+
+    Every tree of an ensemble is concatenated into one set of node arrays
+    (feature, threshold, left, right, leaf value) so a batch is evaluated
+    by stepping all (tree, row) pairs one level at a time with numpy
+    indexing; no estimator objects or per-tree Python calls are involved.
+    Linear models keep a single weight vector with any scaler folded in.
+    predict() returns one float per row: the regression output, or the
+    probability of the engaged class (else the last class) for classifiers.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.kind = str(arrays['kind'])
+        self.arrays = arrays
+        self.mean = arrays.get('mean')
+        self.scale = arrays.get('scale')
+        if self.kind == 'trees':
+            self.roots = arrays['roots']
+            self.feature = arrays['feature']
+            self.threshold = arrays['threshold']
+            self.left = arrays['left']
+            self.right = arrays['right']
+            self.leaf_value = arrays['leaf_value']
+            self.max_depth = int(arrays['max_depth'])
+        elif self.kind == 'linear':
+            self.coef = arrays['coef']
+            self.intercept = float(arrays['intercept'])
+            self.link = str(arrays['link'])
+        else:
+            raise ValueError(f"Unknown compiled model kind: {self.kind}")
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Score a (n_rows, n_features) batch"""
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.kind == 'linear':
+            return self._predict_linear(X)
+        if self.mean is not None:
+            X = (X - self.mean) / self.scale
+        return self._predict_trees(X)
+
+    def _predict_linear(self, X: np.ndarray) -> np.ndarray:
+        z = X @ self.coef + self.intercept
+        if self.link == 'logistic':
+            return 1.0 / (1.0 + np.exp(-z))
+        return z
+
+    def _predict_trees(self, X: np.ndarray) -> np.ndarray:
+        # sklearn compares float32 inputs against float64 thresholds
+        X = X.astype(np.float32)
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            if not (left >= 0).any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(left < 0, nodes, np.where(go_left, left, self.right[nodes]))
+        return self.leaf_value[nodes].mean(axis=0)
+
+    def save(self, path: str):
+        """Write the compiled arrays to an .npz file (atomically replacing any old one)"""
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, format_version=COMPILED_FORMAT_VERSION, **self.arrays)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledPredictor":
+        """Load compiled arrays written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        if int(arrays.pop('format_version')) != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Compiled model {path} has an old format version")
+        return cls(arrays)
+
+def compile_estimator(estimator: Any) -> CompiledPredictor:
+    """Compile a fitted estimator, or a {'model', 'scaler'} bundle, to flat arrays"""
+    scaler = None
+    if isinstance(estimator, dict):
+        scaler = estimator.get('scaler')
+        estimator = estimator['model']
+
+    mean = scale = None
+    if scaler is not None:
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+    if hasattr(estimator, 'tree_') or hasattr(estimator, 'estimators_'):
+        arrays = _compile_trees(estimator)
+    elif hasattr(estimator, 'coef_'):
+        arrays = _compile_linear(estimator, mean, scale)
+        mean = scale = None
+    else:
+        raise TypeError(f"Cannot compile estimator of type {type(estimator).__name__}")
+
+    if mean is not None:
+        arrays['mean'] = mean
+        arrays['scale'] = scale
+    return CompiledPredictor(arrays)
+
+def _output_column(estimator: Any) -> Optional[int]:
+    """Column of predict_proba reported as the score (None for regressors)"""
+    classes = getattr(estimator, 'classes_', None)
+    if classes is None:
+        return None
+    classes = list(classes)
+    return classes.index(ENGAGED_CLASS) if ENGAGED_CLASS in classes else len(classes) - 1
+
+def _compile_trees(estimator: Any) -> Dict[str, np.ndarray]:
+    if not all(hasattr(e, 'tree_') for e in getattr(estimator, 'estimators_', [estimator])):
+        raise TypeError(f"Cannot compile ensemble {type(estimator).__name__}: members are not plain trees")
+    trees = [e.tree_ for e in getattr(estimator, 'estimators_', [estimator])]
+    column = _output_column(estimator)
+
+    roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        value = tree.value[:, 0, :]
+        if column is None:
+            leaf_value = value[:, 0]
+        else:
+            # Leaves hold class counts or fractions depending on the sklearn version
+            totals = value.sum(axis=1)
+            leaf_value = value[:, column] / np.where(totals > 0, totals, 1.0)
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left < 0
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        values.append(leaf_value.astype(np.float64))
+        offset += tree.node_count
+
+    return {
+        'kind': np.array('trees'),
+        'roots': np.array(roots, dtype=np.int64),
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'leaf_value': np.concatenate(values),
+        'max_depth': np.array(max(tree.max_depth for tree in trees))
+    }
+
+def _compile_linear(estimator: Any, mean: Optional[np.ndarray],
+                    scale: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+    coef = np.asarray(estimator.coef_, dtype=np.float64)
+    intercept = np.atleast_1d(np.asarray(getattr(estimator, 'intercept_', 0.0), dtype=np.float64))
+    column = _output_column(estimator)
+    link = 'identity'
+    if column is not None:
+        if coef.shape[0] != 1:
+            raise TypeError("Only binary linear classifiers can be compiled")
+        if column == 0:
+            # Score the first class: flip the decision function
+            coef, intercept = -coef, -intercept
+        link = 'logistic'
+    coef, intercept = coef.reshape(-1), float(intercept[0])
+
+    if mean is not None:
+        # (x - mean) / scale . w + b  ==  x . (w / scale) + (b - mean . w / scale)
+        coef = coef / scale
+        intercept -= float(mean @ coef)
+
+    return {
+        'kind': np.array('linear'),
+        'coef': coef,
+        'intercept': np.array(intercept),
+        'link': np.array(link)
+    }
+
+def reference_predict(estimator: Any, features: np.ndarray) -> np.ndarray:
+    """Score rows with the original estimator, matching CompiledPredictor.predict"""
+    scaler = None
+    if isinstance(estimator, dict):
+        scaler = estimator.get('scaler')
+        estimator = estimator['model']
+    X = scaler.transform(features) if scaler is not None else features
+    column = _output_column(estimator)
+    if column is None:
+        return np.asarray(estimator.predict(X), dtype=np.float64)
+    return estimator.predict_proba(X)[:, column]
+
+def check_parity(estimator: Any, compiled: CompiledPredictor, n_features: int,
+                 n_rows: int = 512, tolerance: float = 1e-9, seed: int = 0) -> float:
+    """Compare compiled and original predictions on probe rows and return the max abs difference.
+
+    Rows are drawn around the scaler statistics when there is a scaler and
+    from a wide non-negative range otherwise (the interaction features are
+    counts, rates and durations). Raises ValueError above tolerance.
+    """
+    rng = np.random.default_rng(seed)
+    scaler = estimator.get('scaler') if isinstance(estimator, dict) else None
+    if scaler is not None:
+        probe = scaler.mean_ + rng.standard_normal((n_rows, n_features)) * 2.0 * scaler.scale_
+    else:
+        probe = rng.uniform(0.0, 100.0, (n_rows, n_features))
+    difference = float(np.max(np.abs(compiled.predict(probe) - reference_predict(estimator, probe))))
+    if difference > tolerance:
+        raise ValueError(f"Compiled model differs from the estimator by {difference:.3g}")
+    return difference
+
+class EstimatorPredictor:
+    """Fallback with the CompiledPredictor interface for estimators that cannot be compiled"""
+
+    def __init__(self, estimator: Any):
+        self.estimator = estimator
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return reference_predict(self.estimator, features)
+
+def load_compiled(model_path: str, estimator: Any = None, n_features: int = 10):
+    """Return the compiled form of a pickled model, using a cache next to the pickle.
+
+    A cache (<model>.compiled.npz) newer than the pickle is loaded directly.
+    Otherwise the estimator is compiled, checked for parity and the cache
+    written; a failed write only costs the next process a recompile.
+    Estimators that cannot be compiled, or fail the parity check, are
+    served through EstimatorPredictor instead.
+    """
+    cache_path = os.path.splitext(model_path)[0] + '.compiled.npz'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+        try:
+            return CompiledPredictor.load(cache_path)
+        except Exception as e:
+            logger.warning(f"Ignoring compiled model cache {cache_path}: {e}")
+
+    if estimator is None:
+        import pickle
+        with open(model_path, 'rb') as f:
+            estimator = pickle.load(f)
+    try:
+        compiled = compile_estimator(estimator)
+        difference = check_parity(estimator, compiled, n_features)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Serving {model_path} through the estimator, compile failed: {e}")
+        return EstimatorPredictor(estimator)
+    logger.info(f"Compiled {model_path} (max parity difference {difference:.3g})")
+    try:
+        compiled.save(cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write compiled model cache {cache_path}: {e}")
+    return compiled
@@ -1,11 +1,57 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, Boolean, ForeignKey
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.sql import func
 from app.config.settings import settings
+from app.models.emotion_codes import EmotionCode, EmotionScores
+from app.utils.pool_stats import PoolStats
 
-engine = create_engine(settings.DATABASE_URL)
+# asyncio drivers for DATABASE_URL backends when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite'
+}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL rewritten to the asyncio driver of its backend"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No asyncio driver configured for {parsed.get_backend_name()} databases")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def pool_options(url: str) -> Dict:
+    """Pool sizing from settings; SQLite keeps the default pool of its driver"""
+    if make_url(url).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING
+    }
+
+# emotion_logs is range-partitioned on timestamp; PostgreSQL requires the
+# partition key in the primary key, so it joins id there
+EMOTION_LOG_PARTITIONED = (
+    settings.EMOTION_LOG_PARTITIONING and make_url(settings.DATABASE_URL).get_backend_name() == 'postgresql'
+)
+
+# Sync engine: table creation, scripts, batch jobs and the emotion log writer
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_stats = PoolStats(engine)
+
+# Async engine: request handlers, so queries never block the event loop
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+async_pool_stats = PoolStats(async_engine.sync_engine)
 Base = declarative_base()
 
 class User(Base):
@@ -23,6 +69,9 @@ class User(Base):
 
 class LearningSession(Base):
     __tablename__ = "learning_sessions"
+    __table_args__ = (
+        Index("ix_learning_sessions_user_start", "user_id", "start_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -41,27 +90,57 @@ class LearningSession(Base):
 
 class EmotionLog(Base):
     __tablename__ = "emotion_logs"
+    __table_args__ = (
+        Index("ix_emotion_logs_user_timestamp", "user_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"} if EMOTION_LOG_PARTITIONED else {}
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     session_id = Column(Integer, ForeignKey("learning_sessions.id"))
-    timestamp = Column(DateTime, server_default=func.now())
+    timestamp = Column(DateTime, server_default=func.now(), primary_key=EMOTION_LOG_PARTITIONED)
     
     # Emotion scores
-    facial_emotions = Column(JSON)  # {happy: 0.2, sad: 0.1, confused: 0.7, ...}
-    voice_emotions = Column(JSON)
+    facial_emotions = Column(EmotionScores('facial'))  # {happy: 0.2, sad: 0.1, confused: 0.7, ...} as packed float32
+    voice_emotions = Column(EmotionScores('voice'))
     interaction_score = Column(Float)
     
     # Combined analysis
-    primary_emotion = Column(String)
+    primary_emotion = Column(EmotionCode)  # label stored as a small integer code
     confidence_score = Column(Float)
     engagement_level = Column(Float)
+    model_version = Column(String)  # emotion model set that produced the scores
     
     user = relationship("User", back_populates="emotions")
     session = relationship("LearningSession", back_populates="emotions")
 
+class EmotionSegment(Base):
+    """Run of consecutive EmotionLog rows of one session with the same primary emotion"""
+    __tablename__ = "emotion_segments"
+    __table_args__ = (
+        Index("ix_emotion_segments_user_start", "user_id", "start_time"),
+        Index("ix_emotion_segments_session_end", "session_id", "end_time"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    session_id = Column(Integer, ForeignKey("learning_sessions.id"))
+    primary_emotion = Column(EmotionCode)
+    start_time = Column(DateTime)  # timestamp of the first row
+    end_time = Column(DateTime)  # timestamp of the last row
+    frame_count = Column(Integer, default=0)
+    confidence_mean = Column(Float)
+    confidence_min = Column(Float)
+    confidence_max = Column(Float)
+    engagement_mean = Column(Float)
+    engagement_min = Column(Float)
+    engagement_max = Column(Float)
+
 class Intervention(Base):
     __tablename__ = "interventions"
+    __table_args__ = (
+        Index("ix_interventions_session_timestamp", "session_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("learning_sessions.id"))
@@ -97,9 +176,90 @@ class NotificationPreference(Base):
 
     user = relationship("User", backref="notification_preferences")
 
-def get_db():
+class SessionRollup(Base):
+    """Learning sessions of one user per hour or day of start_time"""
+    __tablename__ = "session_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String, primary_key=True)  # hour, day
+    bucket_start = Column(DateTime, primary_key=True)
+    sessions = Column(Integer, default=0)
+    study_minutes = Column(Float, default=0.0)
+    engagement_sum = Column(Float, default=0.0)  # of average_engagement, missing as 0
+    completion_sum = Column(Float, default=0.0)  # of completion_percentage, missing as 0
+
+class EmotionRollup(Base):
+    """EmotionLog frames of one user per hour or day and primary emotion"""
+    __tablename__ = "emotion_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String, primary_key=True)  # hour, day
+    bucket_start = Column(DateTime, primary_key=True)
+    primary_emotion = Column(EmotionCode, primary_key=True)
+    frames = Column(Integer, default=0)
+    confidence_sum = Column(Float, default=0.0)
+    engagement_sum = Column(Float, default=0.0)
+
+class RescoringCheckpoint(Base):
+    __tablename__ = "rescoring_checkpoints"
+
+    job_name = Column(String, primary_key=True)
+    last_id = Column(Integer, default=0)  # highest emotion_logs.id the job has processed
+    first_id = Column(Integer)  # lowest emotion_logs.id of the pass in progress
+    rows_done = Column(Integer, default=0)
+    started_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    completed = Column(Boolean, default=False)
+
+def create_missing_indexes(bind=engine):
+    """Create declared indexes that tables created before they were added lack"""
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
+
+def create_missing_columns(bind=engine):
+    """Add nullable columns that tables created before they were declared lack"""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable or column.primary_key:
+                    continue
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}'
+                ))
+
+@contextmanager
+def session_scope():
+    """Session for one unit of work; its connection goes back to the pool on exit"""
     db = SessionLocal()
     try:
+        with pool_stats.timed_checkout():
+            db.connection()
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@asynccontextmanager
+async def async_session_scope():
+    """AsyncSession for one unit of work; its connection goes back to the pool on exit"""
+    async with AsyncSessionLocal() as db:
+        with async_pool_stats.timed_checkout():
+            await db.connection()
+        yield db
+
+def get_db():
+    with session_scope() as db:
+        yield db
+
+async def get_async_db():
+    async with async_session_scope() as db:
+        yield db
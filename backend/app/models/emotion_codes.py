@@ -0,0 +1,105 @@
+"""Compact column types for per-frame emotion scores.
+
+Score dicts are stored as one label-schema id byte followed by float32
+values in that schema's label order, so rows no longer repeat label strings.
+primary_emotion is stored as a small integer code. Both are SQLAlchemy
+TypeDecorators: queries, inserts and ORM reads keep using dicts and strings.
+
+A model version that changes its output labels gets a new entry in
+EMOTION_LABEL_SCHEMAS and becomes CURRENT_LABEL_SCHEMA; rows written under
+older schemas still decode with the labels they were written with.
+PRIMARY_EMOTIONS is append-only, since stored codes index into it.
+
+Tables created before this format hold JSON scores and label strings; both
+types still decode those, and python -m app.services.emotion_log_conversion
+rewrites them in place.
+"""
+import json
+from typing import Dict, Optional, Union
+
+import numpy as np
+from sqlalchemy import LargeBinary, SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+FACIAL_EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral', 'confused']
+VOICE_EMOTION_LABELS = ['calm', 'happy', 'sad', 'angry', 'fearful', 'disgust', 'surprised']
+
+EMOTION_LABEL_SCHEMAS = {
+    1: {'facial': tuple(FACIAL_EMOTION_LABELS), 'voice': tuple(VOICE_EMOTION_LABELS)}
+}
+CURRENT_LABEL_SCHEMA = 1
+
+PRIMARY_EMOTIONS = (
+    'confused', 'frustrated', 'bored', 'engaged', 'neutral',
+    'angry', 'disgust', 'fear', 'happy', 'sad', 'surprise',
+    'calm', 'fearful', 'surprised'
+)
+PRIMARY_EMOTION_CODES = {label: code for code, label in enumerate(PRIMARY_EMOTIONS)}
+
+def pack_scores(scores: Dict[str, float], modality: str, schema: int = CURRENT_LABEL_SCHEMA) -> bytes:
+    """Schema id byte + float32 scores in schema label order; labels outside the schema are dropped"""
+    labels = EMOTION_LABEL_SCHEMAS[schema][modality]
+    values = np.array([scores.get(label, 0.0) for label in labels] if scores else [], dtype='<f4')
+    return bytes([schema]) + values.tobytes()
+
+def legacy_label(value: Union[int, str]) -> str:
+    """Label of a stored primary_emotion: a code, a code read back as text, or a legacy label"""
+    if isinstance(value, int) or value.isdigit():
+        return PRIMARY_EMOTIONS[int(value)]
+    return value
+
+def unpack_scores(value: bytes, modality: str) -> Dict[str, float]:
+    """Score dict from pack_scores output, using the labels of the schema it was written with"""
+    value = bytes(value)
+    values = np.frombuffer(value, dtype='<f4', offset=1)
+    if not len(values):
+        return {}
+    return dict(zip(EMOTION_LABEL_SCHEMAS[value[0]][modality], values.tolist()))
+
+class EmotionScores(TypeDecorator):
+    """Emotion score dict stored as packed float32 (see pack_scores)"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, modality: str):
+        super().__init__()
+        self.modality = modality
+
+    def process_bind_param(self, value: Optional[Dict[str, float]], dialect):
+        if value is None or isinstance(value, (bytes, bytearray)):
+            return value
+        return pack_scores(value, self.modality)
+
+    def result_processor(self, dialect, coltype):
+        # Skip LargeBinary's own bytes() conversion, which fails on legacy JSON values
+        def process(value):
+            return self.process_result_value(value, dialect)
+        return process
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, dict):
+            return value
+        if isinstance(value, str):
+            # Legacy JSON column read back as text
+            return json.loads(value)
+        return unpack_scores(value, self.modality)
+
+class EmotionCode(TypeDecorator):
+    """Emotion label stored as its index in PRIMARY_EMOTIONS"""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect):
+        if value is None:
+            return None
+        try:
+            return PRIMARY_EMOTION_CODES[value]
+        except KeyError:
+            raise ValueError(f"Unknown emotion label {value!r}; add it to PRIMARY_EMOTIONS") from None
+
+    def process_result_value(self, value: Optional[Union[int, str]], dialect):
+        if value is None:
+            return None
+        return legacy_label(value)
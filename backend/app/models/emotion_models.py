@@ -1,37 +1,403 @@
+import hashlib
+import os
 import pickle
+import re
+import threading
+import time
+import joblib
 import numpy as np
 import cv2
 import librosa
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
 
+from app.config.settings import settings
+from app.models.audio_features import AudioFeatureExtractor
+from app.models.compiled_predictor import load_compiled
+from app.models.emotion_codes import FACIAL_EMOTION_LABELS, VOICE_EMOTION_LABELS
+
 logger = logging.getLogger(__name__)
 
+MODEL_NAMES = ('facial', 'voice', 'interaction')
+
+# Per-model load states reported by /ready
+MODEL_NOT_LOADED = 'not_loaded'
+MODEL_LOADING = 'loading'
+MODEL_LOADED = 'loaded'
+MODEL_READY = 'ready'
+MODEL_FAILED = 'failed'
+
+# Registry version directory names: no separators, no leading dot
+VERSION_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+# File in MODEL_REGISTRY_DIR naming the version every process should serve
+# (empty or missing: the configured paths). The leading dot keeps it apart
+# from version names.
+ACTIVE_POINTER = '.active'
+
+def settings_model_paths() -> Dict[str, str]:
+    """Model files configured in Settings"""
+    return {
+        'facial': settings.FACIAL_MODEL_PATH,
+        'voice': settings.VOICE_MODEL_PATH,
+        'interaction': settings.INTERACTION_MODEL_PATH
+    }
+
+def registry_model_paths(version: str) -> Dict[str, str]:
+    """Model files of a version stored under MODEL_REGISTRY_DIR/<version>/.
+    
+    Model files are unpickled, so the version must be a plain directory
+    name that resolves inside the registry; anything else is a ValueError.
+    """
+    if not VERSION_NAME.match(version):
+        raise ValueError(f"Invalid model version name {version!r}")
+    registry_dir = os.path.realpath(settings.MODEL_REGISTRY_DIR)
+    version_dir = os.path.realpath(os.path.join(registry_dir, version))
+    if os.path.dirname(version_dir) != registry_dir:
+        raise ValueError(f"Model version {version!r} is outside {settings.MODEL_REGISTRY_DIR}")
+    if not os.path.isdir(version_dir):
+        raise FileNotFoundError(f"Model version {version} not found in {settings.MODEL_REGISTRY_DIR}")
+    return {
+        name: os.path.join(version_dir, os.path.basename(path))
+        for name, path in settings_model_paths().items()
+    }
+
+def model_paths(version: Optional[str]) -> Dict[str, str]:
+    """Model files of a registry version, or the configured ones for None"""
+    return registry_model_paths(version) if version else settings_model_paths()
+
+def read_active_version() -> Optional[str]:
+    """Version named by the shared pointer, or None for the configured paths"""
+    try:
+        with open(os.path.join(settings.MODEL_REGISTRY_DIR, ACTIVE_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_active_version(version: Optional[str]):
+    """Point every worker and inference process at a version (None for the configured paths)"""
+    path = os.path.join(settings.MODEL_REGISTRY_DIR, ACTIVE_POINTER)
+    os.makedirs(settings.MODEL_REGISTRY_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(version or '')
+    # Readers see the old name or the new one, never a partial write
+    os.replace(temp_path, path)
+
+def files_signature(paths: Dict[str, str]) -> Tuple:
+    """(mtime, size) of each model file; missing files count as None"""
+    signature = []
+    for name in MODEL_NAMES:
+        try:
+            stat = os.stat(paths[name])
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def content_version(paths: Dict[str, str]) -> str:
+    """Short content hash of a set of model files, the same in every worker"""
+    digest = hashlib.sha1()
+    for name in MODEL_NAMES:
+        try:
+            with open(paths[name], 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        except OSError:
+            digest.update(b'missing')
+    return digest.hexdigest()[:12]
+
+def load_estimator(path: str):
+    """Load a pickled estimator, memory-mapping its arrays when MODEL_MMAP is on.
+
+    The pickle is converted once to a joblib file next to it
+    (<model>.joblib); loading that with mmap_mode='r' maps large numpy
+    arrays from the page cache instead of copying them onto the heap.
+    """
+    if not settings.MODEL_MMAP:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    
+    cache_path = os.path.splitext(path)[0] + '.joblib'
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(path):
+        with open(path, 'rb') as f:
+            estimator = pickle.load(f)
+        try:
+            # Replace rather than overwrite: an older model set may still have the file mapped
+            joblib.dump(estimator, cache_path + '.tmp')
+            os.replace(cache_path + '.tmp', cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write memory-mapped model cache {cache_path}: {e}")
+            return estimator
+    return joblib.load(cache_path, mmap_mode='r')
+
+class ModelSet:
+    """One version of the facial, voice and interaction models, loaded and validated together"""
+    
+    def __init__(self, paths: Dict[str, str], version: Optional[str] = None):
+        self.paths = paths
+        self.version = version
+        self.signature: Optional[Tuple] = None
+        self.models: Dict[str, object] = {name: None for name in MODEL_NAMES}
+        self.model_status: Dict[str, str] = {name: MODEL_NOT_LOADED for name in MODEL_NAMES}
+        self.model_errors: Dict[str, str] = {}
+        self._lock = threading.RLock()
+    
+    @property
+    def ready(self) -> bool:
+        """True once every model is loaded and warmed up"""
+        return all(status == MODEL_READY for status in self.model_status.values())
+    
+    def status(self) -> Dict[str, Dict[str, str]]:
+        """Per-model load state, with the error of failed models"""
+        return {
+            name: {'status': status, **({'error': self.model_errors[name]} if name in self.model_errors else {})}
+            for name, status in self.model_status.items()
+        }
+    
+    def _identify(self):
+        # Signature first: a file replaced while hashing shows up as a change next check
+        if self.signature is None:
+            self.signature = files_signature(self.paths)
+        if self.version is None:
+            self.version = content_version(self.paths)
+    
+    def load_model(self, name: str):
+        """Load one model unless it is already loaded or has failed"""
+        with self._lock:
+            if self.model_status[name] not in (MODEL_NOT_LOADED, MODEL_LOADING):
+                return
+            self._identify()
+            self.model_status[name] = MODEL_LOADING
+            try:
+                if name == 'interaction':
+                    # Flat arrays, compiled and cached on first load
+                    model = load_compiled(self.paths[name])
+                else:
+                    model = load_estimator(self.paths[name])
+                self.models[name] = model
+                self.model_status[name] = MODEL_LOADED
+                logger.info(f"Loaded {name} emotion model (version {self.version})")
+            except Exception as e:
+                self.model_status[name] = MODEL_FAILED
+                self.model_errors[name] = str(e)
+                logger.error(f"Error loading {name} model: {e}")
+    
+    def load(self):
+        """Load all models"""
+        for name in MODEL_NAMES:
+            self.load_model(name)
+    
+    def get(self, name: str):
+        """Return a model, loading it on first use"""
+        model = self.models[name]
+        if model is None:
+            self.load_model(name)
+            model = self.models[name]
+            if model is None:
+                raise RuntimeError(f"{name} model is not available: {self.model_errors.get(name)}")
+        return model
+
 class EmotionModelManager:
+    """Owns the active model set; it loads on first use or in the background.
+    
+    Nothing is read at import time. start_background_load() loads every
+    model and runs a synthetic warmup prediction through each one (this
+    also JIT-compiles librosa and touches the sklearn code paths), and
+    ready turns True once all of them are warm. Any predict call made
+    before that loads the model it needs on the spot.
+    
+    New versions are loaded and warmed up as a separate ModelSet, then
+    swapped in with a single reference assignment. A prediction reads
+    self.active once, so calls already running finish on the old set.
+    
+    The version to serve is named by the registry's shared pointer file.
+    activate() writes it after validating a version in its own process;
+    every other worker and inference process switches when its periodic
+    check sees the pointer change.
+    """
+    
     def __init__(self):
-        self.facial_model = None
-        self.voice_model = None
-        self.interaction_model = None
-        self.load_models()
+        self.audio_feature_extractor = AudioFeatureExtractor(settings.VOICE_FEATURE_PROFILE)
+        self._pointer = read_active_version()
+        try:
+            self.active = ModelSet(model_paths(self._pointer), self._pointer)
+        except (ValueError, FileNotFoundError) as e:
+            logger.error(f"Active model version {self._pointer!r} is unusable, using the configured models: {e}")
+            self.active = ModelSet(settings_model_paths())
+        self._lock = threading.Lock()
+        self._load_thread: Optional[threading.Thread] = None
+        self._reload_thread: Optional[threading.Thread] = None
+        self._next_update_check = time.monotonic() + settings.MODEL_RELOAD_CHECK_SECONDS
+    
+    @property
+    def facial_model(self):
+        return self.active.models['facial']
+    
+    @property
+    def voice_model(self):
+        return self.active.models['voice']
+    
+    @property
+    def interaction_model(self):
+        return self.active.models['interaction']
+    
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the active model set, after checking for a switch"""
+        self._check_for_update()
+        return self.active.version
+    
+    @property
+    def ready(self) -> bool:
+        """True once every model of the active set is loaded and warmed up"""
+        return self.active.ready
+    
+    def status(self) -> Dict[str, Dict[str, str]]:
+        """Per-model load state of the active set"""
+        return self.active.status()
     
     def load_models(self):
+        """Load all models of the active set"""
+        self.active.load()
+    
+    def warmup(self, model_set: Optional[ModelSet] = None):
+        """Run one synthetic prediction through every loaded model of a set"""
+        model_set = model_set or self.active
+        rng = np.random.default_rng(0)
+        inputs = {
+            'facial': lambda: self.preprocess_facial_data(rng.integers(0, 256, (48, 48), dtype=np.uint8)),
+            'voice': lambda: self.preprocess_audio_data((0.01 * rng.standard_normal(22050)).astype(np.float32)),
+            'interaction': lambda: self.preprocess_interaction_data({})
+        }
+        predictors = {
+            'facial': self.predict_facial_batch,
+            'voice': self.predict_voice_batch,
+            'interaction': self.predict_interaction_batch
+        }
+        for name in MODEL_NAMES:
+            if model_set.model_status[name] != MODEL_LOADED:
+                continue
+            try:
+                predictors[name](inputs[name](), model_set)
+                model_set.model_status[name] = MODEL_READY
+            except Exception as e:
+                model_set.model_status[name] = MODEL_FAILED
+                model_set.model_errors[name] = f"warmup failed: {e}"
+                logger.error(f"Warmup of {name} model failed: {e}")
+    
+    def load_and_warmup(self):
+        """Load and warm up all models (blocking)"""
+        self.load_models()
+        self.warmup()
+        if self.ready:
+            logger.info(f"All emotion models loaded and warmed up (version {self.version})")
+    
+    def start_background_load(self):
+        """Load and warm up all models on a background thread"""
+        with self._lock:
+            if self._load_thread is None:
+                self._load_thread = threading.Thread(
+                    target=self.load_and_warmup, name="model-loader", daemon=True
+                )
+                self._load_thread.start()
+    
+    def load_version(self, paths: Optional[Dict[str, str]] = None,
+                     version: Optional[str] = None) -> ModelSet:
+        """Load, validate and activate a model set (blocking).
+        
+        The candidate is loaded next to the active set and warmed up; it
+        only replaces the active set when every model passes, otherwise
+        the active set stays and RuntimeError is raised.
+        """
+        candidate = ModelSet(paths or settings_model_paths(), version)
+        candidate.load()
+        self.warmup(candidate)
+        if not candidate.ready:
+            raise RuntimeError(f"Model version {candidate.version} failed validation: {candidate.model_errors}")
+        
+        previous, self.active = self.active, candidate
+        logger.info(f"Activated emotion model version {candidate.version} (was {previous.version})")
+        return candidate
+    
+    def activate(self, version: Optional[str]) -> ModelSet:
+        """Load and validate a registry version (None: the configured paths) here, then point every process at it.
+        
+        Raises ValueError or FileNotFoundError for unknown versions and
+        RuntimeError when validation fails; the pointer only moves on success.
+        """
+        previous = self.active
+        model_set = self.load_version(model_paths(version), version)
         try:
-            # Load facial emotion model
-            with open('app/ml_models/facial_emotion_model.pkl', 'rb') as f:
-                self.facial_model = pickle.load(f)
-            
-            # Load voice emotion model
-            with open('app/ml_models/voice_emotion_model.pkl', 'rb') as f:
-                self.voice_model = pickle.load(f)
-            
-            # Load interaction model
-            with open('app/ml_models/interaction_model.pkl', 'rb') as f:
-                self.interaction_model = pickle.load(f)
-            
-            logger.info("All emotion models loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
+            write_active_version(version)
+        except OSError:
+            # Without the pointer the other processes would not follow
+            self.active = previous
             raise
+        self._pointer = version
+        return model_set
+    
+    def start_reload(self, paths: Optional[Dict[str, str]] = None, version: Optional[str] = None) -> bool:
+        """Run load_version on a background thread; False if a reload is already running"""
+        return self._start_reload_thread(self._reload, paths, version)
+    
+    def _start_reload_thread(self, target, *args) -> bool:
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(target=target, args=args, name="model-reloader", daemon=True)
+            self._reload_thread.start()
+            return True
+    
+    def _reload(self, paths: Optional[Dict[str, str]], version: Optional[str]):
+        try:
+            self.load_version(paths, version)
+        except Exception as e:
+            logger.error(f"Model reload failed: {e}")
+    
+    def _switch(self, paths: Dict[str, str], pointer: Optional[str]):
+        try:
+            self.load_version(paths, pointer)
+            self._pointer = pointer
+        except Exception as e:
+            # The pointer still differs, so the next check tries again
+            logger.error(f"Switching to model version {pointer} failed: {e}")
+    
+    def _check_for_update(self):
+        """Reload in the background when the shared pointer names another version or the active files change.
+        
+        Checked from the predict path at most every MODEL_RELOAD_CHECK_SECONDS,
+        so every worker and inference process picks up a rollout by itself.
+        """
+        if settings.MODEL_RELOAD_CHECK_SECONDS <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_update_check:
+            return
+        self._next_update_check = now + settings.MODEL_RELOAD_CHECK_SECONDS
+        
+        pointer = read_active_version()
+        if pointer != self._pointer:
+            try:
+                paths = model_paths(pointer)
+            except (ValueError, FileNotFoundError) as e:
+                logger.error(f"Ignoring unusable active model version {pointer!r}: {e}")
+                self._pointer = pointer
+                return
+            logger.info(f"Active model version switched to {pointer or 'the configured paths'}, loading it")
+            self._start_reload_thread(self._switch, paths, pointer)
+            return
+        
+        active = self.active
+        if active.signature is not None and files_signature(active.paths) != active.signature:
+            logger.info("Model files changed on disk, loading the new version")
+            self.start_reload(active.paths)
+    
+    def _model_set(self, model_set: Optional[ModelSet]) -> ModelSet:
+        if model_set is not None:
+            return model_set
+        self._check_for_update()
+        return self.active
     
     def preprocess_facial_data(self, image_data: np.ndarray) -> np.ndarray:
         """Preprocess facial image for emotion detection"""
@@ -47,33 +413,7 @@ class EmotionModelManager:
     
     def preprocess_audio_data(self, audio_data: np.ndarray, sr: int = 22050) -> np.ndarray:
         """Extract audio features for emotion detection (match training script)"""
-        import librosa
-        import numpy as np
-        # MFCC
-        mfccs = np.mean(librosa.feature.mfcc(y=audio_data, sr=sr, n_mfcc=40), axis=1)
-        # Chroma
-        chroma = np.mean(librosa.feature.chroma_stft(y=audio_data, sr=sr), axis=1)
-        # Mel Spectrogram
-        mel = np.mean(librosa.feature.melspectrogram(y=audio_data, sr=sr), axis=1)
-        # Spectral Contrast
-        contrast = np.mean(librosa.feature.spectral_contrast(y=audio_data, sr=sr), axis=1)
-        # Tonnetz
-        tonnetz = np.mean(librosa.feature.tonnetz(y=librosa.effects.harmonic(audio_data), sr=sr), axis=1)
-        # Zero Crossing Rate
-        zcr = [np.mean(librosa.feature.zero_crossing_rate(y=audio_data))]
-        # RMS
-        rms = [np.mean(librosa.feature.rms(y=audio_data))]
-        # Tempo
-        tempo = [librosa.beat.tempo(y=audio_data, sr=sr)[0]]
-        # YIN (fundamental frequency)
-        try:
-            yin = [np.mean(librosa.yin(audio_data, fmin=50, fmax=300, sr=sr))]
-        except Exception:
-            yin = [0.0]
-        features = np.hstack([
-            mfccs, chroma, mel, contrast, tonnetz, zcr, rms, tempo, yin
-        ])
-        return features.reshape(1, -1)
+        return self.audio_feature_extractor.extract(audio_data, sr)
     
     def preprocess_interaction_data(self, interaction_data: Dict) -> np.ndarray:
         """Preprocess interaction data to match training script features"""
@@ -102,14 +442,46 @@ class EmotionModelManager:
         ]
         return np.array(features).reshape(1, -1)
     
+    def predict_facial_batch(self, features: np.ndarray,
+                             model_set: Optional[ModelSet] = None) -> List[Dict[str, float]]:
+        """Predict facial emotions for a batch of preprocessed rows"""
+        predictions = self._model_set(model_set).get('facial').predict_proba(features)
+        return [dict(zip(FACIAL_EMOTION_LABELS, row)) for row in predictions]
+    
+    def predict_voice_batch(self, features: np.ndarray,
+                            model_set: Optional[ModelSet] = None) -> List[Dict[str, float]]:
+        """Predict voice emotions for a batch of preprocessed rows"""
+        predictions = self._model_set(model_set).get('voice').predict_proba(features)
+        return [dict(zip(VOICE_EMOTION_LABELS, row)) for row in predictions]
+    
+    def predict_interaction_batch(self, features: np.ndarray,
+                                  model_set: Optional[ModelSet] = None) -> List[float]:
+        """Predict engagement levels for a batch of preprocessed rows.
+        
+        Classifier models report the probability of the 'engaged' class.
+        """
+        return [float(score) for score in self._model_set(model_set).get('interaction').predict(features)]
+    
+    def predict_versioned(self, name: str, features: np.ndarray) -> Tuple[Optional[str], List]:
+        """Predict a batch on one model set; returns that set's version with the predictions.
+        
+        Runs wherever the model is loaded (a thread or an inference process),
+        so the version is the one that actually produced the scores.
+        """
+        model_set = self._model_set(None)
+        predictors = {
+            'facial': self.predict_facial_batch,
+            'voice': self.predict_voice_batch,
+            'interaction': self.predict_interaction_batch
+        }
+        predictions = predictors[name](features, model_set)
+        return model_set.version, predictions
+    
     def predict_facial_emotion(self, image_data: np.ndarray) -> Dict[str, float]:
         """Predict emotion from facial image"""
         try:
             processed_data = self.preprocess_facial_data(image_data)
-            prediction = self.facial_model.predict_proba(processed_data)[0]
-            
-            emotion_labels = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral', 'confused']
-            return dict(zip(emotion_labels, prediction))
+            return self.predict_facial_batch(processed_data)[0]
         except Exception as e:
             logger.error(f"Error in facial emotion prediction: {e}")
             return {}
@@ -118,10 +490,7 @@ class EmotionModelManager:
         """Predict emotion from voice audio"""
         try:
             processed_data = self.preprocess_audio_data(audio_data)
-            prediction = self.voice_model.predict_proba(processed_data)[0]
-            
-            emotion_labels = ['calm', 'happy', 'sad', 'angry', 'fearful', 'disgust', 'surprised']
-            return dict(zip(emotion_labels, prediction))
+            return self.predict_voice_batch(processed_data)[0]
         except Exception as e:
             logger.error(f"Error in voice emotion prediction: {e}")
             return {}
@@ -130,8 +499,7 @@ class EmotionModelManager:
         """Predict engagement level from interaction data"""
         try:
             processed_data = self.preprocess_interaction_data(interaction_data)
-            engagement_score = self.interaction_model.predict(processed_data)[0]
-            return float(engagement_score)
+            return self.predict_interaction_batch(processed_data)[0]
         except Exception as e:
             logger.error(f"Error in interaction prediction: {e}")
             return 0.5  # neutral engagement
@@ -52,6 +52,9 @@ class EmotionResponse(BaseModel):
     voice_emotions: Dict[str, float]
     interaction_score: float
     needs_intervention: bool
+    facial_status: Optional[str] = None  # inferred, reused or absent (frame gate)
+    voice_status: Optional[str] = None  # inferred or silent (voice activity gate)
+    model_version: Optional[str] = None
 
 class InterventionRequest(BaseModel):
     emotion: str
@@ -64,6 +67,14 @@ class InterventionResponse(BaseModel):
     message: str
     priority: int
 
+class ModelReloadRequest(BaseModel):
+    version: Optional[str] = None  # a MODEL_REGISTRY_DIR/<version> directory, else the configured paths
+
+class ModelVersionResponse(BaseModel):
+    version: Optional[str]
+    ready: bool
+    models: Dict[str, Dict[str, str]]
+
 class UserCreate(BaseModel):
     email: EmailStr
     username: str
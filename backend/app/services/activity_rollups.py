@@ -0,0 +1,308 @@
+# services/activity_rollups.py
+"""Per-user hourly and daily rollups of learning sessions and emotion frames.
+
+    python -m app.services.activity_rollups [--user ID] [--since YYYY-MM-DD]
+
+Emotion rollups are incremented in the same transaction as each write-behind
+EmotionLog insert. Session rollup buckets are recomputed from
+learning_sessions whenever an ORM flush inserts, updates or deletes a
+session. Rescoring recomputes the emotion buckets of the rows it rewrites.
+The schema migration fills empty rollup tables from the raw tables. The
+command above rebuilds both, for backfills or after sessions are written
+outside the ORM; pass --since to keep history older than the raw rows still
+retained.
+
+Dashboards and reports read rollups, so a year of emotions is at most 365
+daily buckets per emotion instead of one row per analyzed frame.
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, delete, event, func, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    EmotionLog, EmotionRollup, LearningSession, SessionRollup, session_scope
+)
+from app.utils.time_ranges import between, day_bounds, floor_datetime, truncate
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = ('hour', 'day')
+PERIOD_LENGTHS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+emotion_rollups = EmotionRollup.__table__
+session_rollups = SessionRollup.__table__
+learning_sessions = LearningSession.__table__
+emotion_logs = EmotionLog.__table__
+
+class EmotionBucket(NamedTuple):
+    """Frames of one emotion in one rollup bucket, as read by reports"""
+    timestamp: datetime
+    primary_emotion: str
+    frames: int
+    confidence: float
+    engagement: float
+
+def _upsert_add(connection, table, keys: Tuple[str, ...], values: List[Dict]):
+    """Insert rows, adding their counters to any existing row with the same key"""
+    dialect_insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[connection.dialect.name]
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + stmt.excluded[name] for name in values[0] if name not in keys}
+    )
+    connection.execute(stmt, values)
+
+def add_emotion_logs(connection, rows: Iterable[Dict]):
+    """Count newly inserted EmotionLog rows into their hour and day buckets"""
+    totals: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    for row in rows:
+        if row.get('user_id') is None or row.get('primary_emotion') is None:
+            continue
+        for period in ROLLUP_PERIODS:
+            total = totals[(row['user_id'], period, floor_datetime(row['timestamp'], period), row['primary_emotion'])]
+            total[0] += 1
+            total[1] += row.get('confidence_score') or 0.0
+            total[2] += row.get('engagement_level') or 0.0
+    if not totals:
+        return
+    _upsert_add(connection, emotion_rollups, ('user_id', 'period', 'bucket_start', 'primary_emotion'), [
+        {
+            'user_id': user_id, 'period': period, 'bucket_start': bucket, 'primary_emotion': emotion,
+            'frames': frames, 'confidence_sum': confidence, 'engagement_sum': engagement
+        }
+        for (user_id, period, bucket, emotion), (frames, confidence, engagement) in totals.items()
+    ])
+
+def refresh_emotion_buckets(connection, keys: Set[Tuple[int, datetime]]):
+    """Recompute the hour and day emotion buckets containing each (user_id, timestamp)"""
+    buckets = {
+        (user_id, period, floor_datetime(timestamp, period))
+        for user_id, timestamp in keys if user_id is not None and timestamp is not None
+        for period in ROLLUP_PERIODS
+    }
+    for user_id, period, bucket in buckets:
+        totals = connection.execute(
+            select(
+                emotion_logs.c.primary_emotion, func.count(),
+                func.sum(func.coalesce(emotion_logs.c.confidence_score, 0.0)),
+                func.sum(func.coalesce(emotion_logs.c.engagement_level, 0.0))
+            ).where(and_(
+                emotion_logs.c.user_id == user_id,
+                emotion_logs.c.primary_emotion.isnot(None),
+                between(emotion_logs.c.timestamp, bucket, bucket + PERIOD_LENGTHS[period])
+            )).group_by(emotion_logs.c.primary_emotion)
+        ).all()
+        connection.execute(delete(emotion_rollups).where(and_(
+            emotion_rollups.c.user_id == user_id,
+            emotion_rollups.c.period == period,
+            emotion_rollups.c.bucket_start == bucket
+        )))
+        if totals:
+            # Adds to, rather than fails on, a row the writer inserted for this bucket meanwhile
+            _upsert_add(connection, emotion_rollups, ('user_id', 'period', 'bucket_start', 'primary_emotion'), [
+                {
+                    'user_id': user_id, 'period': period, 'bucket_start': bucket, 'primary_emotion': emotion,
+                    'frames': frames, 'confidence_sum': confidence, 'engagement_sum': engagement
+                }
+                for emotion, frames, confidence, engagement in totals
+            ])
+
+def refresh_session_buckets(connection, keys: Set[Tuple[int, datetime]]):
+    """Recompute the hour and day session buckets containing each (user_id, start_time)"""
+    buckets = {
+        (user_id, period, floor_datetime(start_time, period))
+        for user_id, start_time in keys if user_id is not None and start_time is not None
+        for period in ROLLUP_PERIODS
+    }
+    for user_id, period, bucket in buckets:
+        totals = connection.execute(
+            select(
+                func.count(),
+                func.sum(func.coalesce(learning_sessions.c.duration_minutes, 0.0)),
+                func.sum(func.coalesce(learning_sessions.c.average_engagement, 0.0)),
+                func.sum(func.coalesce(learning_sessions.c.completion_percentage, 0.0))
+            ).where(and_(
+                learning_sessions.c.user_id == user_id,
+                between(learning_sessions.c.start_time, bucket, bucket + PERIOD_LENGTHS[period])
+            ))
+        ).one()
+        connection.execute(delete(session_rollups).where(and_(
+            session_rollups.c.user_id == user_id,
+            session_rollups.c.period == period,
+            session_rollups.c.bucket_start == bucket
+        )))
+        if totals[0]:
+            connection.execute(session_rollups.insert().values(
+                user_id=user_id, period=period, bucket_start=bucket, sessions=totals[0],
+                study_minutes=totals[1], engagement_sum=totals[2], completion_sum=totals[3]
+            ))
+
+@event.listens_for(Session, "after_flush")
+def _refresh_flushed_sessions(session: Session, flush_context):
+    """Keep session rollups in step with LearningSession rows changed through the ORM"""
+    keys: Set[Tuple[int, datetime]] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, LearningSession):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted:
+            current = (state.dict.get('user_id'), state.dict.get('start_time'))
+        else:
+            # A server-default start_time is loaded here, after the INSERT
+            current = (obj.user_id, obj.start_time)
+        keys.add(current)
+        # The bucket the row moved out of, if user_id or start_time changed
+        old_users = state.attrs.user_id.history.deleted or [current[0]]
+        old_starts = state.attrs.start_time.history.deleted or [current[1]]
+        keys.update((user_id, start) for user_id in old_users for start in old_starts)
+    if keys:
+        connection = session.connection()
+        refresh_session_buckets(connection, keys)
+
+def needs_rebuild(bind) -> bool:
+    """True when both rollup tables are empty while the raw tables hold rows"""
+    with bind.connect() as conn:
+        def has_rows(table):
+            return conn.execute(select(literal(1)).select_from(table).limit(1)).first() is not None
+        if has_rows(session_rollups) or has_rows(emotion_rollups):
+            return False
+        return has_rows(learning_sessions) or has_rows(emotion_logs)
+
+def rebuild(user_id: Optional[int] = None, since: Optional[date] = None):
+    """Recompute rollups from the raw tables, for one user and/or from a day on"""
+    with session_scope() as db:
+        connection = db.connection()
+        dialect = connection.dialect.name
+        lower = datetime.combine(since, datetime.min.time()) if since else None
+        for period in ROLLUP_PERIODS:
+            for rollup, source, time_column in (
+                (emotion_rollups, emotion_logs, emotion_logs.c.timestamp),
+                (session_rollups, learning_sessions, learning_sessions.c.start_time)
+            ):
+                rollup_filter = [rollup.c.period == period]
+                source_filter = [time_column.isnot(None), source.c.user_id.isnot(None)]
+                if user_id is not None:
+                    rollup_filter.append(rollup.c.user_id == user_id)
+                    source_filter.append(source.c.user_id == user_id)
+                if lower is not None:
+                    rollup_filter.append(rollup.c.bucket_start >= lower)
+                    source_filter.append(time_column >= lower)
+                connection.execute(delete(rollup).where(and_(*rollup_filter)))
+
+                bucket = truncate(time_column, period, dialect)
+                if rollup is emotion_rollups:
+                    source_filter.append(source.c.primary_emotion.isnot(None))
+                    query = select(
+                        source.c.user_id, literal(period), bucket, source.c.primary_emotion, func.count(),
+                        func.sum(func.coalesce(source.c.confidence_score, 0.0)),
+                        func.sum(func.coalesce(source.c.engagement_level, 0.0))
+                    ).group_by(source.c.user_id, bucket, source.c.primary_emotion)
+                    columns = ['user_id', 'period', 'bucket_start', 'primary_emotion',
+                               'frames', 'confidence_sum', 'engagement_sum']
+                else:
+                    query = select(
+                        source.c.user_id, literal(period), bucket, func.count(),
+                        func.sum(func.coalesce(source.c.duration_minutes, 0.0)),
+                        func.sum(func.coalesce(source.c.average_engagement, 0.0)),
+                        func.sum(func.coalesce(source.c.completion_percentage, 0.0))
+                    ).group_by(source.c.user_id, bucket)
+                    columns = ['user_id', 'period', 'bucket_start', 'sessions',
+                               'study_minutes', 'engagement_sum', 'completion_sum']
+                connection.execute(rollup.insert().from_select(columns, query.where(and_(*source_filter))))
+        db.commit()
+
+async def load_emotion_buckets(db: AsyncSession, user_id: int, lower: datetime, upper: datetime,
+                               period: str = 'day') -> List[EmotionBucket]:
+    """Per-emotion rollup buckets starting in [lower, upper), oldest first"""
+    rows = (await db.execute(
+        select(EmotionRollup).where(and_(
+            EmotionRollup.user_id == user_id,
+            EmotionRollup.period == period,
+            between(EmotionRollup.bucket_start, lower, upper)
+        )).order_by(EmotionRollup.bucket_start)
+    )).scalars().all()
+    return [
+        EmotionBucket(r.bucket_start, r.primary_emotion, r.frames, r.confidence_sum, r.engagement_sum)
+        for r in rows
+    ]
+
+async def emotion_frame_counts(db: AsyncSession, user_id: int, lower: datetime, upper: datetime,
+                               period: str = 'hour') -> Dict[str, int]:
+    """Frames per primary emotion over the buckets starting in [lower, upper)"""
+    rows = (await db.execute(
+        select(EmotionRollup.primary_emotion, func.sum(EmotionRollup.frames))
+        .where(and_(
+            EmotionRollup.user_id == user_id,
+            EmotionRollup.period == period,
+            between(EmotionRollup.bucket_start, floor_datetime(lower, period), upper)
+        ))
+        .group_by(EmotionRollup.primary_emotion)
+    )).all()
+    return {emotion: int(frames) for emotion, frames in rows}
+
+def _session_sums(where=True):
+    """Session count and sums of daily rollups, optionally only rows matching where"""
+    return [
+        func.coalesce(func.sum(case((where, column), else_=0)), 0)
+        for column in (SessionRollup.sessions, SessionRollup.study_minutes,
+                       SessionRollup.engagement_sum, SessionRollup.completion_sum)
+    ]
+
+def _session_totals_dict(row) -> Dict[str, float]:
+    return {
+        'sessions': int(row[0]),
+        'study_minutes': float(row[1]),
+        'engagement_sum': float(row[2]),
+        'completion_sum': float(row[3])
+    }
+
+async def session_totals(db: AsyncSession, user_id: int,
+                         ranges: List[Tuple[date, date]]) -> List[Dict[str, float]]:
+    """Session count and sums for each (start, end) day range inclusive, from daily rollups in one query"""
+    bounds = [day_bounds(start, end) for start, end in ranges]
+    columns = []
+    for lower, upper in bounds:
+        columns.extend(_session_sums(between(SessionRollup.bucket_start, lower, upper)))
+    row = (await db.execute(
+        select(*columns).where(and_(
+            SessionRollup.user_id == user_id,
+            SessionRollup.period == 'day',
+            between(SessionRollup.bucket_start, min(b[0] for b in bounds), max(b[1] for b in bounds))
+        ))
+    )).one()
+    return [_session_totals_dict(row[i:i + 4]) for i in range(0, len(row), 4)]
+
+async def session_buckets(db: AsyncSession, user_id: int, start: date, end: date,
+                          unit: str = 'day') -> Dict[datetime, Dict[str, float]]:
+    """Session count and sums per day, month or year over the days start..end, from daily rollups in one query"""
+    bucket = truncate(SessionRollup.bucket_start, unit, db.bind.dialect.name)
+    rows = (await db.execute(
+        select(bucket, *_session_sums()).where(and_(
+            SessionRollup.user_id == user_id,
+            SessionRollup.period == 'day',
+            between(SessionRollup.bucket_start, *day_bounds(start, end))
+        )).group_by(bucket)
+    )).all()
+    return {row[0]: _session_totals_dict(row[1:]) for row in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild hourly and daily rollups from the raw tables")
+    parser.add_argument("--user", type=int, help="only this user's rollups")
+    parser.add_argument("--since", type=date.fromisoformat, help="only buckets from this day on (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.models.database import Base, engine
+    Base.metadata.create_all(bind=engine, tables=[SessionRollup.__table__, EmotionRollup.__table__])
+    rebuild(args.user, args.since)
+    logger.info("Rollups rebuilt")
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,9 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.models.database import get_db, User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.database import get_async_db, User
 from app.config.settings import settings
 import logging
 
@@ -56,17 +57,17 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
     
-    def authenticate_user(self, db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate_user(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
-        user = db.query(User).filter(User.email == email).first()
+        user = await self._user_by_email(db, email)
         if not user:
             return None
         if not self.verify_password(password, user.hashed_password):
             return None
         return user
     
-    def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security), 
-                        db: Session = Depends(get_db)) -> User:
+    async def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security), 
+                              db: AsyncSession = Depends(get_async_db)) -> User:
         """Get current authenticated user"""
         token = credentials.credentials
         payload = self.verify_token(token)
@@ -77,12 +78,26 @@ class AuthService:
                 detail="Could not validate credentials"
             )
         
-        user = db.query(User).filter(User.email == email).first()
+        user = await self._user_by_email(db, email)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found"
             )
         return user
+    
+    async def get_current_admin(self, credentials: HTTPAuthorizationCredentials = Depends(security),
+                                db: AsyncSession = Depends(get_async_db)) -> User:
+        """Current user, if their email is listed in ADMIN_EMAILS"""
+        user = await self.get_current_user(credentials, db)
+        if user.email not in settings.ADMIN_EMAILS:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin privileges required"
+            )
+        return user
+    
+    async def _user_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        return (await db.execute(select(User).where(User.email == email))).scalars().first()
 
 auth_service = AuthService()
\ No newline at end of file
@@ -0,0 +1,326 @@
+# services/emotion_compaction.py
+"""Run-length compaction of EmotionLog rows into EmotionSegment records.
+
+    python -m app.services.emotion_compaction [--chunk-size N] [--restart]
+
+Rows are folded in id order, chunk by chunk: a row extends its session's
+latest segment when the primary emotion is unchanged and it follows within
+max_gap seconds, and starts a new segment otherwise. The job's watermark
+(highest folded id) lives in the checkpoint table and is committed with each
+chunk, under a row lock so several workers can run the job at once.
+
+Each worker's writer commits its own batches, so ids can become visible out
+of order: ids 200-299 may be committed while 100-199 are still in flight.
+The watermark therefore only advances over contiguous ids. A gap holds it
+back until the missing ids show up, or for gap_timeout seconds, after which
+they are taken to be rolled back inserts and skipped.
+
+Readers use load_emotion_spans(): segments for rows up to the watermark and
+raw rows after it, so results cost one span per emotional transition plus a
+short uncompacted tail, and still include the latest frames.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config.settings import settings
+from app.models.database import EmotionLog, EmotionSegment, RescoringCheckpoint, session_scope
+from app.utils.time_ranges import between
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_JOB = "emotion_compaction"
+
+class EmotionSpan(NamedTuple):
+    """A segment, or a single raw row, as read by timelines and reports"""
+    timestamp: datetime
+    end: datetime
+    primary_emotion: str
+    frames: int
+    confidence: Optional[float]
+    engagement: Optional[float]
+
+def _running_stats(mean: Optional[float], low: Optional[float], high: Optional[float],
+                   count: int, value: Optional[float]) -> Tuple:
+    """(mean, min, max) after adding value to count earlier values; None values are skipped"""
+    if value is None:
+        return mean, low, high
+    if mean is None:
+        return value, value, value
+    return (mean * count + value) / (count + 1), min(low, value), max(high, value)
+
+def _holds(segment, log):
+    """The segment covers the row: same user and session, timestamp within the segment"""
+    return and_(
+        log.user_id == segment.user_id,
+        log.session_id.is_not_distinct_from(segment.session_id),
+        log.timestamp >= segment.start_time,
+        log.timestamp <= segment.end_time
+    )
+
+def _holds_rows_after(segment, watermark: int):
+    log = aliased(EmotionLog)
+    return exists().where(log.id > watermark, _holds(segment, log))
+
+class EmotionCompactionJob:
+    """Folds new EmotionLog rows into per-session runs of the same primary emotion"""
+
+    def __init__(self, chunk_size: int = 5000, max_gap_seconds: float = 30.0,
+                 check_interval: float = 60.0, gap_timeout: float = 300.0,
+                 job_name: str = COMPACTION_JOB):
+        self.chunk_size = chunk_size
+        self.max_gap = timedelta(seconds=max_gap_seconds)
+        self.check_interval = check_interval
+        self.gap_timeout = gap_timeout
+        self.job_name = job_name
+        self._task: Optional[asyncio.Task] = None
+        # (first missing id, monotonic time it was first seen missing)
+        self._id_gap: Optional[Tuple[int, float]] = None
+
+    def run(self) -> int:
+        """Fold every row after the watermark; returns the number of rows folded"""
+        total = 0
+        while True:
+            folded = self.run_chunk()
+            if not folded:
+                return total
+            total += folded
+
+    def run_chunk(self) -> int:
+        """Fold the next chunk of rows and advance the watermark in the same transaction"""
+        with session_scope() as db:
+            checkpoint = db.execute(
+                select(RescoringCheckpoint)
+                .where(RescoringCheckpoint.job_name == self.job_name)
+                .with_for_update()
+            ).scalars().first()
+            if checkpoint is None:
+                checkpoint = RescoringCheckpoint(job_name=self.job_name, last_id=0, rows_done=0)
+                db.add(checkpoint)
+                db.flush()
+
+            rows = db.execute(
+                select(EmotionLog.id, EmotionLog.user_id, EmotionLog.session_id, EmotionLog.timestamp,
+                       EmotionLog.primary_emotion, EmotionLog.confidence_score, EmotionLog.engagement_level)
+                .where(EmotionLog.id > checkpoint.last_id)
+                .order_by(EmotionLog.id)
+                .limit(self.chunk_size)
+            ).all()
+            rows = self._contiguous(rows, checkpoint.last_id)
+            if not rows:
+                return 0
+
+            open_segments: Dict[Tuple, Optional[EmotionSegment]] = {}
+            for row in rows:
+                key = (row.user_id, row.session_id)
+                if key not in open_segments:
+                    open_segments[key] = self._latest_segment(db, *key)
+                segment = open_segments[key]
+                if not self._extends(segment, row):
+                    segment = EmotionSegment(
+                        user_id=row.user_id, session_id=row.session_id, primary_emotion=row.primary_emotion,
+                        start_time=row.timestamp, end_time=row.timestamp, frame_count=0
+                    )
+                    db.add(segment)
+                    open_segments[key] = segment
+                self._append(segment, row)
+
+            checkpoint.last_id = rows[-1].id
+            checkpoint.rows_done = (checkpoint.rows_done or 0) + len(rows)
+            db.commit()
+            return len(rows)
+
+    def reset(self):
+        """Delete all segments and the watermark so the next run refolds every row"""
+        with session_scope() as db:
+            # Wait for a chunk in progress, so none of its segments outlive the delete
+            db.execute(
+                select(RescoringCheckpoint)
+                .where(RescoringCheckpoint.job_name == self.job_name)
+                .with_for_update()
+            )
+            db.execute(delete(EmotionSegment))
+            db.execute(delete(RescoringCheckpoint).where(RescoringCheckpoint.job_name == self.job_name))
+            db.commit()
+
+    def refold_from(self, first_id: int) -> int:
+        """Delete the segments holding rows from first_id on and move the watermark back before them.
+
+        Segments that also hold older rows go too, and the watermark moves
+        back to their oldest row, repeatedly, until no segment holds a row
+        above it. Segments of other users and sessions are kept. Returns the
+        new watermark.
+        """
+        with session_scope() as db:
+            checkpoint = db.execute(
+                select(RescoringCheckpoint)
+                .where(RescoringCheckpoint.job_name == self.job_name)
+                .with_for_update()
+            ).scalars().first()
+            if checkpoint is None:
+                return 0
+
+            watermark = min(checkpoint.last_id or 0, first_id - 1)
+            stale = aliased(EmotionSegment)
+            while True:
+                # Oldest row at or below the watermark in a segment that also holds a later row
+                oldest = db.execute(
+                    select(func.min(EmotionLog.id)).where(
+                        EmotionLog.id <= watermark,
+                        exists().where(_holds(stale, EmotionLog), _holds_rows_after(stale, watermark))
+                    )
+                ).scalar()
+                db.execute(delete(EmotionSegment).where(_holds_rows_after(EmotionSegment, watermark)))
+                if oldest is None:
+                    break
+                watermark = oldest - 1
+            logger.info(f"Emotion segments after id {watermark} deleted for refolding")
+
+            checkpoint.last_id = watermark
+            db.commit()
+            return watermark
+
+    def start(self):
+        """Run the job every check_interval seconds on the running event loop"""
+        if self._task is None and self.check_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                folded = await asyncio.to_thread(self.run)
+                if folded:
+                    logger.info(f"Compacted {folded} emotion logs into segments")
+            except Exception as e:
+                logger.error(f"Error compacting emotion logs: {e}")
+
+    def _contiguous(self, rows: List, last_id: int) -> List:
+        """Leading rows that continue the id sequence after last_id, skipping gaps older than gap_timeout"""
+        contiguous = []
+        expected = last_id + 1
+        for row in rows:
+            if row.id != expected and not self._gap_expired(expected):
+                break
+            contiguous.append(row)
+            expected = row.id + 1
+        return contiguous
+
+    def _gap_expired(self, missing_id: int) -> bool:
+        now = time.monotonic()
+        if self._id_gap is None or self._id_gap[0] != missing_id:
+            self._id_gap = (missing_id, now)
+        expired = now - self._id_gap[1] >= self.gap_timeout
+        if expired:
+            logger.warning(f"Emotion log ids from {missing_id} missing for {self.gap_timeout}s; "
+                           f"compacting past them as rolled back inserts")
+        return expired
+
+    def _latest_segment(self, db, user_id: Optional[int], session_id: Optional[int]) -> Optional[EmotionSegment]:
+        return db.execute(
+            select(EmotionSegment)
+            .where(EmotionSegment.user_id == user_id, EmotionSegment.session_id == session_id)
+            .order_by(EmotionSegment.end_time.desc())
+            .limit(1)
+        ).scalars().first()
+
+    def _extends(self, segment: Optional[EmotionSegment], row) -> bool:
+        return (
+            segment is not None
+            and segment.primary_emotion == row.primary_emotion
+            and timedelta(0) <= row.timestamp - segment.end_time <= self.max_gap
+        )
+
+    def _append(self, segment: EmotionSegment, row):
+        count = segment.frame_count or 0
+        segment.confidence_mean, segment.confidence_min, segment.confidence_max = _running_stats(
+            segment.confidence_mean, segment.confidence_min, segment.confidence_max, count, row.confidence_score
+        )
+        segment.engagement_mean, segment.engagement_min, segment.engagement_max = _running_stats(
+            segment.engagement_mean, segment.engagement_min, segment.engagement_max, count, row.engagement_level
+        )
+        segment.end_time = row.timestamp
+        segment.frame_count = count + 1
+
+async def load_emotion_spans(db: AsyncSession, user_id: int, lower: datetime, upper: datetime,
+                             job_name: str = COMPACTION_JOB) -> List[EmotionSpan]:
+    """A user's emotions overlapping [lower, upper), oldest first: segments up to the watermark, raw rows after.
+
+    A segment that started before lower but runs into the range is included
+    whole, so its frames are not lost to the range that covers its end.
+
+    Every id up to the watermark has been folded, except ids that were still
+    uncommitted gap_timeout seconds after a later id was seen.
+    """
+    watermark = (await db.execute(
+        select(RescoringCheckpoint.last_id).where(RescoringCheckpoint.job_name == job_name)
+    )).scalar() or 0
+
+    segments = (await db.execute(
+        select(EmotionSegment).where(and_(
+            EmotionSegment.user_id == user_id,
+            EmotionSegment.start_time < upper,
+            EmotionSegment.end_time >= lower
+        )).order_by(EmotionSegment.start_time)
+    )).scalars().all() if watermark else []
+
+    tail = (await db.execute(
+        select(EmotionLog.timestamp, EmotionLog.primary_emotion,
+               EmotionLog.confidence_score, EmotionLog.engagement_level)
+        .where(and_(
+            EmotionLog.user_id == user_id,
+            between(EmotionLog.timestamp, lower, upper),
+            EmotionLog.id > watermark
+        )).order_by(EmotionLog.timestamp)
+    )).all()
+
+    spans = [
+        EmotionSpan(s.start_time, s.end_time, s.primary_emotion, s.frame_count, s.confidence_mean, s.engagement_mean)
+        for s in segments
+    ]
+    spans.extend(
+        EmotionSpan(r.timestamp, r.timestamp, r.primary_emotion, 1, r.confidence_score, r.engagement_level)
+        for r in tail
+    )
+    return spans
+
+emotion_compaction = EmotionCompactionJob(
+    chunk_size=settings.EMOTION_COMPACTION_CHUNK_SIZE,
+    max_gap_seconds=settings.EMOTION_SEGMENT_MAX_GAP_SECONDS,
+    check_interval=settings.EMOTION_COMPACTION_SECONDS,
+    gap_timeout=settings.EMOTION_COMPACTION_GAP_TIMEOUT_SECONDS
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold EmotionLog rows into EmotionSegment runs")
+    parser.add_argument("--chunk-size", type=int, default=settings.EMOTION_COMPACTION_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="delete all segments and refold every row")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.models.database import Base, engine
+    Base.metadata.create_all(bind=engine, tables=[RescoringCheckpoint.__table__, EmotionSegment.__table__])
+
+    emotion_compaction.chunk_size = args.chunk_size
+    if args.restart:
+        emotion_compaction.reset()
+    logger.info(f"Folded {emotion_compaction.run()} emotion logs into segments")
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,139 @@
-import base64
+import asyncio
 import numpy as np
 import cv2
-import librosa
-from typing import Dict, Optional
+from typing import Dict, Hashable, List, Optional, Tuple
+from app.config.settings import settings
+from app.models.audio_stream import StreamingAudioFeatures
 from app.models.emotion_models import emotion_models
 from app.models.schemas import EmotionData, EmotionResponse
+from app.services.emotion_fusion import DEFAULT_EMOTION_WEIGHTS, EmotionFusion
+from app.services.face_tracker import FaceTracker, crop_face, detect_face
+from app.services.frame_gate import FACIAL_ABSENT, FACIAL_INFERRED, FACIAL_REUSED, FrameGate
+from app.services.inference_executor import inference_executor
+from app.services.prediction_batcher import prediction_batcher
+from app.services.voice_activity import VOICE_INFERRED, VOICE_SILENT, voice_activity_detector
+from app.utils.audio_io import load_audio, resample
+from app.utils.constants import AUDIO_CONFIG
+from app.utils.frame_protocol import EmotionFrame
 import logging
 
 logger = logging.getLogger(__name__)
 
+# cv2.imdecode flags that decode straight to grayscale, with JPEG DCT downscaling
+_GRAYSCALE_DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+}
+
+async def _resolved(value):
+    """Awaitable placeholder for a modality that was not sent"""
+    return value
+
+def _frame_version(versions, fallback: Optional[str]) -> Optional[str]:
+    """Model version behind a frame's scores: the versions its predictions
+    reported (joined if a swap landed between modalities), else fallback"""
+    used = list(dict.fromkeys(version for version in versions if version is not None))
+    if not used:
+        return fallback
+    return '+'.join(used)
+
+class ConnectionState:
+    """Inference state carried between frames of one live connection"""
+    
+    def __init__(self):
+        self.audio_stream = None
+        if settings.VOICE_STREAMING:
+            self.audio_stream = StreamingAudioFeatures(
+                sr=AUDIO_CONFIG['SAMPLE_RATE'],
+                window_seconds=settings.VOICE_STREAM_WINDOW_SECONDS,
+                profile=settings.VOICE_FEATURE_PROFILE
+            )
+        self.frame_gate = None
+        if settings.FRAME_GATE_ENABLED:
+            self.frame_gate = FrameGate(
+                diff_threshold=settings.FRAME_GATE_DIFF_THRESHOLD,
+                min_std=settings.FRAME_GATE_MIN_STD,
+                max_reuse=settings.FRAME_GATE_MAX_REUSE
+            )
+        self.face_tracker = None
+        if settings.FACE_TRACKING_ENABLED:
+            self.face_tracker = FaceTracker(
+                detect_interval=settings.FACE_DETECT_INTERVAL,
+                min_score=settings.FACE_TRACK_MIN_SCORE
+            )
+        self.last_facial_emotions: Dict[str, float] = {}
+        self.last_facial_version: Optional[str] = None
+
 class EmotionDetectionService:
     def __init__(self):
-        self.emotion_weights = {
-            'facial': 0.4,
-            'voice': 0.35,
-            'interaction': 0.25
-        }
+        self.emotion_weights = dict(DEFAULT_EMOTION_WEIGHTS)
+        self.connections: Dict[Hashable, ConnectionState] = {}
+        self.fusion = EmotionFusion(self.emotion_weights)
     
-    async def process_emotion_data(self, data: EmotionData) -> EmotionResponse:
-        """Process multimodal emotion data and return combined analysis"""
-        
-        facial_emotions = {}
-        voice_emotions = {}
-        interaction_score = 0.5
+    def close_connection(self, connection_id: Hashable):
+        """Drop the per-connection state of a closed stream"""
+        self.connections.pop(connection_id, None)
+    
+    async def buffer_audio(self, frames: List[EmotionFrame], connection_id: Hashable):
+        """Add the audio of frames that are not analyzed to the connection's rolling window.
         
-        # Process facial data
-        if data.facial_frame:
-            try:
-                image_data = self._decode_image(data.facial_frame)
-                facial_emotions = emotion_models.predict_facial_emotion(image_data)
-            except Exception as e:
-                logger.error(f"Error processing facial data: {e}")
+        Frames dropped under backpressure still carry audio the window needs
+        to stay continuous; without a streaming window there is nothing to keep.
+        """
+        state = self.connections.setdefault(connection_id, ConnectionState())
+        frames = [frame for frame in frames if frame.has_audio]
+        if state.audio_stream is None or not frames:
+            return
+        try:
+            await inference_executor.run_local(self._buffer_voice_stream, state.audio_stream, frames)
+        except Exception as e:
+            logger.error(f"Error buffering audio data: {e}")
+    
+    async def process_emotion_data(self, data: EmotionData,
+                                   connection_id: Optional[Hashable] = None) -> EmotionResponse:
+        """Process multimodal emotion data and return combined analysis"""
+        return await self.process_frame(EmotionFrame.from_emotion_data(data), connection_id)
+    
+    async def process_frame(self, frame: EmotionFrame,
+                            connection_id: Optional[Hashable] = None) -> EmotionResponse:
+        """Process one decoded frame (JSON or binary protocol).
         
-        # Process voice data
-        if data.audio_chunk:
-            try:
-                audio_data = self._decode_audio(data.audio_chunk)
-                voice_emotions = emotion_models.predict_voice_emotion(audio_data)
-            except Exception as e:
-                logger.error(f"Error processing voice data: {e}")
+        Passing a connection_id (live WebSocket streams) keeps state such as
+        the rolling audio window between calls; one-off requests omit it.
+        """
+        state = None
+        if connection_id is not None:
+            state = self.connections.setdefault(connection_id, ConnectionState())
+        # Stamped on frames that run no model; predictions report their own version
+        active_version = emotion_models.version
         
-        # Process interaction data
-        if data.interaction_data:
-            try:
-                interaction_score = emotion_models.predict_interaction_engagement(data.interaction_data)
-            except Exception as e:
-                logger.error(f"Error processing interaction data: {e}")
+        # Run the three modalities concurrently; preprocessing happens in the
+        # inference pool and model calls are batched across connections
+        if frame.image is not None:
+            facial_task = self._facial_emotions(frame.image, state)
+        else:
+            facial_task = _resolved(({}, None, None))
+
+        if frame.has_audio:
+            voice_task = self._voice_emotions(frame, state)
+        else:
+            voice_task = _resolved(({}, None, None))
+
+        if frame.interaction_data:
+            interaction_task = self._interaction_score(frame.interaction_data)
+        else:
+            interaction_task = _resolved((0.5, None))
+
+        (facial_emotions, facial_status, facial_version), (voice_emotions, voice_status, voice_version), \
+            (interaction_score, interaction_version) = await asyncio.gather(facial_task, voice_task, interaction_task)
+        model_version = _frame_version((facial_version, voice_version, interaction_version), active_version)
         
         # Combine emotions
         combined_analysis = self._combine_emotions(
-            facial_emotions, voice_emotions, interaction_score
+            facial_emotions, voice_emotions, interaction_score,
+            voice_silent=voice_status == VOICE_SILENT
         )
         
         return EmotionResponse(
@@ -59,79 +143,164 @@ class EmotionDetectionService:
             facial_emotions=facial_emotions,
             voice_emotions=voice_emotions,
             interaction_score=interaction_score,
-            needs_intervention=combined_analysis['needs_intervention']
+            needs_intervention=combined_analysis['needs_intervention'],
+            facial_status=facial_status,
+            voice_status=voice_status,
+            model_version=model_version
         )
     
-    def _decode_image(self, base64_image: str) -> np.ndarray:
-        """Decode base64 image to numpy array"""
-        image_bytes = base64.b64decode(base64_image.split(',')[1] if ',' in base64_image else base64_image)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        return image
-    
-    def _decode_audio(self, base64_audio: str) -> np.ndarray:
-        """Decode base64 audio to numpy array"""
-        audio_bytes = base64.b64decode(base64_audio.split(',')[1] if ',' in base64_audio else base64_audio)
-        # Assuming audio is in wav format
-        audio_data, _ = librosa.load(audio_bytes, sr=22050)
-        return audio_data
-    
-    def _combine_emotions(self, facial: Dict, voice: Dict, interaction: float) -> Dict:
-        """Combine multimodal emotion predictions"""
-        
-        # Map emotions to common categories
-        emotion_mapping = {
-            'confused': ['confused', 'fear', 'surprise'],
-            'frustrated': ['angry', 'disgust', 'fearful'],
-            'bored': ['sad', 'neutral', 'calm'],
-            'engaged': ['happy', 'surprise']
-        }
-        
-        combined_scores = {
-            'confused': 0.0,
-            'frustrated': 0.0,
-            'bored': 0.0,
-            'engaged': 0.0
-        }
+    async def _facial_emotions(self, image: np.ndarray, state: Optional[ConnectionState] = None
+                               ) -> Tuple[Dict[str, float], Optional[str], Optional[str]]:
+        """Predict facial emotions for one encoded frame.
         
-        # Process facial emotions
-        if facial:
-            for category, emotions in emotion_mapping.items():
-                score = sum(facial.get(emotion, 0) for emotion in emotions)
-                combined_scores[category] += score * self.emotion_weights['facial']
-        
-        # Process voice emotions
-        if voice:
-            for category, emotions in emotion_mapping.items():
-                score = sum(voice.get(emotion, 0) for emotion in emotions)
-                combined_scores[category] += score * self.emotion_weights['voice']
-        
-        # Factor in interaction score
-        if interaction < 0.3:
-            combined_scores['bored'] += 0.3 * self.emotion_weights['interaction']
-        elif interaction > 0.7:
-            combined_scores['engaged'] += 0.3 * self.emotion_weights['interaction']
-        
-        # Determine primary emotion
-        primary_emotion = max(combined_scores, key=combined_scores.get)
-        confidence = combined_scores[primary_emotion]
-        
-        # Calculate overall engagement
-        engagement = combined_scores['engaged'] - combined_scores['bored']
-        engagement = max(0, min(1, engagement + 0.5))  # Normalize to 0-1
+        Returns the emotions, the gate decision and the model version. On
+        live connections unchanged frames reuse the last result (and its
+        version), empty frames skip the model and the face box is tracked
+        between frames.
+        """
+        try:
+            if state is not None and (state.frame_gate is not None or state.face_tracker is not None):
+                status, features = await inference_executor.run_local(
+                    self._prepare_facial_gated, state.frame_gate, state.face_tracker, image
+                )
+                if status == FACIAL_REUSED:
+                    return state.last_facial_emotions, status, state.last_facial_version
+                if status == FACIAL_ABSENT:
+                    return {}, status, None
+            else:
+                features = await inference_executor.run(self._prepare_facial, image)
+            
+            facial_emotions, version = await prediction_batcher.predict('facial', features)
+            if state is not None:
+                state.last_facial_emotions = facial_emotions
+                state.last_facial_version = version
+            return facial_emotions, FACIAL_INFERRED, version
+        except Exception as e:
+            logger.error(f"Error processing facial data: {e}")
+            return {}, None, None
+    
+    async def _voice_emotions(self, frame: EmotionFrame, state: Optional[ConnectionState] = None
+                              ) -> Tuple[Dict[str, float], Optional[str], Optional[str]]:
+        """Predict voice emotions for one audio chunk.
         
-        # Determine if intervention is needed
-        needs_intervention = (
-            combined_scores['confused'] > 0.6 or
-            combined_scores['frustrated'] > 0.5 or
-            combined_scores['bored'] > 0.6
-        )
+        Returns the emotions, the voice activity decision and the model
+        version; chunks without speech skip feature extraction and the model
+        entirely.
+        """
+        try:
+            if state is not None and state.audio_stream is not None:
+                status, features = await inference_executor.run_local(
+                    self._prepare_voice_stream, state.audio_stream,
+                    frame.audio_bytes, frame.pcm, frame.sample_rate
+                )
+                if status == VOICE_INFERRED and features is None:
+                    # Not a single full analysis frame buffered yet
+                    return {}, None, None
+            else:
+                status, features = await inference_executor.run(
+                    self._prepare_voice, frame.audio_bytes, frame.pcm, frame.sample_rate
+                )
+            if status == VOICE_SILENT:
+                return {}, status, None
+            voice_emotions, version = await prediction_batcher.predict('voice', features)
+            return voice_emotions, status, version
+        except Exception as e:
+            logger.error(f"Error processing voice data: {e}")
+            return {}, None, None
+    
+    async def _interaction_score(self, interaction_data: Dict) -> Tuple[float, Optional[str]]:
+        """Predict engagement from interaction data, with the model version"""
+        try:
+            features = emotion_models.preprocess_interaction_data(interaction_data)
+            return await prediction_batcher.predict('interaction', features)
+        except Exception as e:
+            logger.error(f"Error processing interaction data: {e}")
+            return 0.5, None
+    
+    # Feature preparation runs inside the inference pool, so these are static
+    # and only touch module level state to stay picklable in process mode.
+    @staticmethod
+    def _prepare_facial(image: np.ndarray) -> np.ndarray:
+        """Decode a frame into a facial model input row"""
+        image_data = EmotionDetectionService._decode_image(image)
+        if settings.FACE_TRACKING_ENABLED:
+            image_data = crop_face(image_data, detect_face(image_data))
+        return emotion_models.preprocess_facial_data(image_data)
+    
+    @staticmethod
+    def _prepare_facial_gated(frame_gate: Optional[FrameGate], face_tracker: Optional[FaceTracker],
+                              image: np.ndarray) -> Tuple[str, Optional[np.ndarray]]:
+        """Run the frame gate and only build a model input row (cropped to the tracked face) when it says to infer"""
+        if frame_gate is not None:
+            status = frame_gate.check_encoded(image)
+            if status is not None:
+                return status, None
+        image_data = EmotionDetectionService._decode_image(image)
+        if frame_gate is not None:
+            status = frame_gate.check(image_data)
+            if status != FACIAL_INFERRED:
+                return status, None
+        if face_tracker is not None:
+            image_data = face_tracker.crop(image_data)
+        return FACIAL_INFERRED, emotion_models.preprocess_facial_data(image_data)
+    
+    @staticmethod
+    def _prepare_voice(audio_bytes, pcm: Optional[np.ndarray],
+                       sample_rate: Optional[int]) -> Tuple[str, Optional[np.ndarray]]:
+        """Decode an audio chunk and build a voice model input row if it has speech"""
+        audio_data = EmotionDetectionService._load_audio(audio_bytes, pcm, sample_rate)
+        if not EmotionDetectionService._has_speech(audio_data):
+            return VOICE_SILENT, None
+        return VOICE_INFERRED, emotion_models.preprocess_audio_data(audio_data)
+    
+    @staticmethod
+    def _prepare_voice_stream(audio_stream: StreamingAudioFeatures, audio_bytes, pcm: Optional[np.ndarray],
+                              sample_rate: Optional[int]) -> Tuple[str, Optional[np.ndarray]]:
+        """Append a speech chunk to a connection's stream and return the window's voice row.
         
-        return {
-            'primary_emotion': primary_emotion,
-            'confidence': confidence,
-            'engagement': engagement,
-            'needs_intervention': needs_intervention
-        }
+        Silent chunks are left out of the window so it only averages over speech.
+        """
+        audio_data = EmotionDetectionService._load_audio(audio_bytes, pcm, sample_rate)
+        if not EmotionDetectionService._has_speech(audio_data):
+            return VOICE_SILENT, None
+        return VOICE_INFERRED, audio_stream.push(audio_data)
+    
+    @staticmethod
+    def _buffer_voice_stream(audio_stream: StreamingAudioFeatures, frames: List[EmotionFrame]):
+        """Append the speech of several chunks to a connection's stream, oldest first, without building a vector"""
+        for frame in frames:
+            audio_data = EmotionDetectionService._load_audio(frame.audio_bytes, frame.pcm, frame.sample_rate)
+            if EmotionDetectionService._has_speech(audio_data):
+                audio_stream.add(audio_data)
+    
+    @staticmethod
+    def _has_speech(audio_data: np.ndarray) -> bool:
+        """Voice activity check at the model sample rate (always True when the gate is off)"""
+        if not settings.VAD_ENABLED:
+            return True
+        return voice_activity_detector.has_speech(audio_data, AUDIO_CONFIG['SAMPLE_RATE'])
+    
+    @staticmethod
+    def _decode_image(image: np.ndarray) -> np.ndarray:
+        """Decode an encoded image buffer straight to reduced-resolution grayscale"""
+        flags = _GRAYSCALE_DECODE_FLAGS.get(settings.FACIAL_DECODE_SCALE, cv2.IMREAD_GRAYSCALE)
+        return cv2.imdecode(image, flags)
+    
+    @staticmethod
+    def _load_audio(audio_bytes, pcm: Optional[np.ndarray], sample_rate: Optional[int]) -> np.ndarray:
+        """Return mono float32 audio at the model sample rate"""
+        if pcm is None:
+            return EmotionDetectionService._decode_audio(audio_bytes)
+        return resample(pcm, sample_rate, AUDIO_CONFIG['SAMPLE_RATE'])
+    
+    @staticmethod
+    def _decode_audio(audio_bytes) -> np.ndarray:
+        """Decode an in-memory audio file (WAV/PCM) to a numpy array"""
+        return load_audio(audio_bytes, AUDIO_CONFIG['SAMPLE_RATE'])
+    
+    def _combine_emotions(self, facial: Dict, voice: Dict, interaction: float,
+                          voice_silent: bool = False) -> Dict:
+        """Combine multimodal emotion predictions"""
+        return self.fusion.fuse_dicts([facial], [voice], [interaction], [voice_silent])[0]
 
 emotion_service = EmotionDetectionService()
\ No newline at end of file
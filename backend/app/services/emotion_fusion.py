@@ -0,0 +1,115 @@
+# services/emotion_fusion.py
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# Order matters: ties go to the first category, as with max() over the old dict
+FUSION_CATEGORIES = ('confused', 'frustrated', 'bored', 'engaged')
+
+EMOTION_CATEGORY_MAPPING = {
+    'confused': ['confused', 'fear', 'surprise'],
+    'frustrated': ['angry', 'disgust', 'fearful'],
+    'bored': ['sad', 'neutral', 'calm'],
+    'engaged': ['happy', 'surprise']
+}
+
+# Every label that feeds some category; other labels never affect fusion
+MAPPED_LABELS = sorted({label for labels in EMOTION_CATEGORY_MAPPING.values() for label in labels})
+
+DEFAULT_EMOTION_WEIGHTS = {'facial': 0.4, 'voice': 0.35, 'interaction': 0.25}
+
+DEFAULT_INTERVENTION_THRESHOLDS = {'confused': 0.6, 'frustrated': 0.5, 'bored': 0.6}
+
+def category_matrix(labels: Sequence[str]) -> np.ndarray:
+    """(len(labels), n_categories) 0/1 matrix summing label scores into categories"""
+    matrix = np.zeros((len(labels), len(FUSION_CATEGORIES)))
+    for j, category in enumerate(FUSION_CATEGORIES):
+        for i, label in enumerate(labels):
+            if label in EMOTION_CATEGORY_MAPPING[category]:
+                matrix[i, j] = 1.0
+    return matrix
+
+def label_vectors(emotions: Sequence[Optional[Dict[str, float]]], labels: Sequence[str] = MAPPED_LABELS) -> np.ndarray:
+    """Stack emotion dicts into an (n, len(labels)) array; missing labels and dicts are 0"""
+    return np.array([
+        [scores.get(label, 0) for label in labels] if scores else [0.0] * len(labels)
+        for scores in emotions
+    ], dtype=np.float64).reshape(len(emotions), len(labels))
+
+class EmotionFusion:
+    """Weighted fusion of facial, voice and interaction scores into learning states.
+
+    Label scores are mapped to the four categories with precomputed 0/1
+    matrices, so a batch of frames is two small matrix products and a few
+    elementwise operations. Facial and voice inputs are either emotion
+    dicts (fuse_dicts) or probability arrays in a model's label order
+    (fuse with the matching matrices from category_matrix).
+    """
+
+    BORED = FUSION_CATEGORIES.index('bored')
+    ENGAGED = FUSION_CATEGORIES.index('engaged')
+
+    def __init__(self, weights: Dict[str, float],
+                 intervention_thresholds: Optional[Dict[str, float]] = None):
+        # Kept by reference so the owner's weight changes apply immediately
+        self.weights = weights
+        thresholds = intervention_thresholds or DEFAULT_INTERVENTION_THRESHOLDS
+        self.thresholds = np.array([thresholds.get(c, np.inf) for c in FUSION_CATEGORIES])
+        self.mapped_matrix = category_matrix(MAPPED_LABELS)
+
+    def category_scores(self, facial: np.ndarray, voice: np.ndarray, interaction: np.ndarray,
+                        voice_silent: Optional[np.ndarray] = None,
+                        facial_matrix: Optional[np.ndarray] = None,
+                        voice_matrix: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n, n_categories) weighted scores for a batch"""
+        weights = np.array([self.weights['facial'], self.weights['voice'], self.weights['interaction']])
+        # (n, 3) per-frame modality weights; silent chunks carry no voice
+        # evidence, so their voice weight is spread over the other modalities
+        frame_weights = np.broadcast_to(weights, (len(interaction), 3))
+        if voice_silent is not None and voice_silent.any():
+            silent_weights = weights * (weights.sum() / (weights[0] + weights[2]))
+            silent_weights[1] = 0.0
+            frame_weights = np.where(voice_silent[:, None], silent_weights, weights)
+
+        facial_matrix = self.mapped_matrix if facial_matrix is None else facial_matrix
+        voice_matrix = self.mapped_matrix if voice_matrix is None else voice_matrix
+        scores = (facial @ facial_matrix) * frame_weights[:, 0:1] + (voice @ voice_matrix) * frame_weights[:, 1:2]
+
+        interaction_bonus = 0.3 * frame_weights[:, 2]
+        scores[:, self.BORED] += (interaction < 0.3) * interaction_bonus
+        scores[:, self.ENGAGED] += (interaction > 0.7) * interaction_bonus
+        return scores
+
+    def fuse(self, facial: np.ndarray, voice: np.ndarray, interaction: np.ndarray,
+             voice_silent: Optional[np.ndarray] = None,
+             facial_matrix: Optional[np.ndarray] = None,
+             voice_matrix: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Fuse a batch; returns arrays of primary category index, confidence, engagement and intervention flags"""
+        scores = self.category_scores(facial, voice, interaction, voice_silent, facial_matrix, voice_matrix)
+        primary = np.argmax(scores, axis=1)
+        engagement = scores[:, self.ENGAGED] - scores[:, self.BORED]
+        return {
+            'primary': primary,
+            'confidence': np.take_along_axis(scores, primary[:, None], axis=1)[:, 0],
+            'engagement': np.clip(engagement + 0.5, 0.0, 1.0),
+            'needs_intervention': np.any(scores > self.thresholds, axis=1)
+        }
+
+    def fuse_dicts(self, facial: Sequence[Optional[Dict[str, float]]], voice: Sequence[Optional[Dict[str, float]]],
+                   interaction: Sequence[float], voice_silent: Optional[Sequence[bool]] = None) -> List[Dict]:
+        """Fuse a batch of emotion dicts (live responses or stored EmotionLog rows)"""
+        fused = self.fuse(
+            label_vectors(facial), label_vectors(voice), np.asarray(interaction, dtype=np.float64),
+            None if voice_silent is None else np.asarray(voice_silent, dtype=bool)
+        )
+        return [
+            {
+                'primary_emotion': FUSION_CATEGORIES[primary],
+                'confidence': confidence,
+                'engagement': engagement,
+                'needs_intervention': needs_intervention
+            }
+            for primary, confidence, engagement, needs_intervention in zip(
+                fused['primary'].tolist(), fused['confidence'].tolist(),
+                fused['engagement'].tolist(), fused['needs_intervention'].tolist()
+            )
+        ]
@@ -0,0 +1,161 @@
+# services/emotion_log_conversion.py
+"""One-off conversion of emotion_logs created before packed scores and emotion codes.
+
+    python -m app.services.emotion_log_conversion [--chunk-size N]
+
+Tables created before the EmotionScores/EmotionCode column types hold JSON
+scores and label strings, and create_all does not alter existing tables.
+For each legacy column a replacement column of the new type is added and
+filled chunk by chunk in id order, each chunk in its own transaction, so an
+interrupted run resumes where it stopped. The last step locks the table,
+fills rows written in the meantime, drops the legacy columns and renames
+the new ones into their place.
+"""
+import argparse
+import json
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import Integer, LargeBinary, SmallInteger, bindparam, inspect, text
+
+from app.models.database import EmotionLog, engine
+from app.models.emotion_codes import PRIMARY_EMOTION_CODES, pack_scores
+
+logger = logging.getLogger(__name__)
+
+TABLE = EmotionLog.__tablename__
+
+# Column -> score modality (None for the primary emotion code)
+CONVERTED_COLUMNS = {'facial_emotions': 'facial', 'voice_emotions': 'voice', 'primary_emotion': None}
+
+def _new_column(name: str) -> str:
+    return f"{name}_converted"
+
+def _packed(value, modality: str) -> Optional[bytes]:
+    """Packed scores from a legacy JSON value, or one already written packed"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, str):
+        value = json.loads(value)
+    return pack_scores(value, modality) if value is not None else None
+
+def _code(value, row_id: int) -> Optional[int]:
+    """Emotion code from a legacy label, or one already written as a code"""
+    if value is None:
+        return None
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    try:
+        return PRIMARY_EMOTION_CODES[value]
+    except KeyError:
+        raise ValueError(f"emotion_logs row {row_id} has unknown emotion {value!r}; "
+                         f"add it to PRIMARY_EMOTIONS and rerun") from None
+
+def legacy_columns(bind=engine) -> List[str]:
+    """emotion_logs columns still stored in the pre-conversion JSON/text types"""
+    inspector = inspect(bind)
+    if not inspector.has_table(TABLE):
+        return []
+    types = {column['name']: column['type'] for column in inspector.get_columns(TABLE)}
+    legacy = []
+    for name, modality in CONVERTED_COLUMNS.items():
+        converted_type = LargeBinary if modality else Integer
+        if name in types and not isinstance(types[name], converted_type):
+            legacy.append(name)
+    return legacy
+
+def require_converted(bind=engine):
+    """Refuse to serve while emotion_logs has legacy columns new rows cannot be written to.
+
+    PostgreSQL rejects packed scores and codes in JSON/text columns. SQLite
+    stores them as written, and reads handle both formats, so there the
+    legacy columns only log a warning.
+    """
+    columns = legacy_columns(bind)
+    if not columns:
+        return
+    message = (f"emotion_logs columns {columns} are still in the JSON/text format; "
+               f"run python -m app.services.emotion_log_conversion")
+    if bind.dialect.name == 'postgresql':
+        raise RuntimeError(message)
+    logger.warning(message)
+
+def _fill(conn, columns: List[str], chunk_size: int, after_id: int = 0) -> int:
+    """Copy legacy values of rows after after_id into the new columns; returns the last id seen"""
+    pending = " OR ".join(f"({name} IS NOT NULL AND {_new_column(name)} IS NULL)" for name in columns)
+    select_rows = text(
+        f"SELECT id, {', '.join(columns)} FROM {TABLE} WHERE id > :after AND ({pending}) ORDER BY id LIMIT :limit"
+    )
+    update_rows = text(
+        f"UPDATE {TABLE} SET " + ", ".join(f"{_new_column(name)} = :{name}" for name in columns) + " WHERE id = :row_id"
+    ).bindparams(*(bindparam(name, type_=LargeBinary if CONVERTED_COLUMNS[name] else SmallInteger)
+                   for name in columns))
+    rows = conn.execute(select_rows, {"after": after_id, "limit": chunk_size}).all()
+    if not rows:
+        return after_id
+    values: List[Dict] = []
+    for row in rows:
+        converted = {"row_id": row.id}
+        for name in columns:
+            modality = CONVERTED_COLUMNS[name]
+            value = getattr(row, name)
+            converted[name] = _packed(value, modality) if modality else _code(value, row.id)
+        values.append(converted)
+    conn.execute(update_rows, values)
+    return rows[-1].id
+
+def convert(chunk_size: int = 5000) -> List[str]:
+    """Convert every legacy emotion_logs column; returns the converted column names"""
+    columns = legacy_columns()
+    if not columns:
+        return []
+
+    with engine.begin() as conn:
+        existing = {column['name'] for column in inspect(conn).get_columns(TABLE)}
+        for name in columns:
+            if _new_column(name) not in existing:
+                column_type = LargeBinary() if CONVERTED_COLUMNS[name] else SmallInteger()
+                conn.execute(text(
+                    f"ALTER TABLE {TABLE} ADD COLUMN {_new_column(name)} {column_type.compile(dialect=conn.dialect)}"
+                ))
+
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            next_id = _fill(conn, columns, chunk_size, last_id)
+        if next_id == last_id:
+            break
+        last_id = next_id
+        logger.info(f"Converted emotion_logs up to id {last_id}")
+
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        # Rows committed since the chunked pass, including late commits of lower ids
+        after_id = 0
+        while True:
+            next_id = _fill(conn, columns, chunk_size, after_id)
+            if next_id == after_id:
+                break
+            after_id = next_id
+        for name in columns:
+            conn.execute(text(f"ALTER TABLE {TABLE} DROP COLUMN {name}"))
+            conn.execute(text(f"ALTER TABLE {TABLE} RENAME COLUMN {_new_column(name)} TO {name}"))
+    return columns
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy JSON/text emotion_logs columns to packed scores and codes")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    columns = convert(args.chunk_size)
+    if columns:
+        logger.info(f"Converted emotion_logs columns {columns}")
+    else:
+        logger.info("emotion_logs is already in the packed format")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# services/emotion_log_partitions.py
+"""Partition management for the range-partitioned emotion_logs table.
+
+    python -m app.services.emotion_log_partitions
+
+Each partition covers one month or one ISO week of timestamps and is named
+after its first day (emotion_logs_p2026_10, emotion_logs_p2026w42). Upcoming
+partitions are created ahead of time; a DEFAULT partition catches anything
+outside them so inserts never fail. Report and timeline queries filter on
+the bare timestamp column, so the planner prunes to the partitions in range,
+and expiring old data is a DETACH (or DROP) per partition instead of a DELETE.
+
+If maintenance fell behind and the DEFAULT partition already holds rows of
+a period, that period's partition is built as a plain table, the rows are
+moved into it and it is then attached. Every partition is created or
+retired in its own transaction, so one that fails does not hold back the
+rest; it is logged and retried on the next run.
+"""
+import asyncio
+import logging
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config.settings import settings
+from app.models.database import EMOTION_LOG_PARTITIONED, EmotionLog, engine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = EmotionLog.__tablename__
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_INTERVALS = ('month', 'week')
+
+# Serializes partition DDL across workers running maintenance at the same time
+ADVISORY_LOCK_KEY = 0x656D6F6C  # "emol"
+
+_MONTH_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$")
+_WEEK_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})w(\d{{2}})$")
+
+def partition_start(day: date, interval: str) -> date:
+    """First day of the partition containing day"""
+    if interval == 'month':
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+def next_partition_start(start: date, interval: str) -> date:
+    """First day of the partition after the one starting at start"""
+    if interval == 'month':
+        return date(start.year + (start.month == 12), start.month % 12 + 1, 1)
+    return start + timedelta(days=7)
+
+def partition_name(start: date, interval: str) -> str:
+    if interval == 'month':
+        return f"{PARENT_TABLE}_p{start.year:04d}_{start.month:02d}"
+    iso_year, iso_week, _ = start.isocalendar()
+    return f"{PARENT_TABLE}_p{iso_year:04d}w{iso_week:02d}"
+
+def parse_partition_name(name: str) -> Optional[Tuple[date, str]]:
+    """(first day, interval) of a partition created by this module, else None"""
+    match = _MONTH_NAME.match(name)
+    if match:
+        return date(int(match.group(1)), int(match.group(2)), 1), 'month'
+    match = _WEEK_NAME.match(name)
+    if match:
+        return date.fromisocalendar(int(match.group(1)), int(match.group(2)), 1), 'week'
+    return None
+
+class EmotionLogPartitionManager:
+    """Creates upcoming emotion_logs partitions and retires expired ones"""
+
+    def __init__(self, interval: str = "month", ahead: int = 2, retention: int = 0,
+                 drop_expired: bool = False, check_interval: float = 3600.0):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Partition interval must be one of {PARTITION_INTERVALS}, got {interval!r}")
+        self.interval = interval
+        self.ahead = max(0, ahead)
+        self.retention = max(0, retention)
+        self.drop_expired = drop_expired
+        self.check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return EMOTION_LOG_PARTITIONED
+
+    def run_maintenance(self, today: Optional[date] = None) -> dict:
+        """Create missing partitions up to `ahead` periods out and retire expired ones"""
+        today = today or datetime.utcnow().date()
+        created, retired, failed = [], [], []
+
+        with self._maintenance_transaction() as conn:
+            existing = set(self._partition_names(conn))
+            if DEFAULT_PARTITION not in existing:
+                conn.execute(text(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT'))
+                created.append(DEFAULT_PARTITION)
+
+        start = partition_start(today, self.interval)
+        for _ in range(self.ahead + 1):
+            end = next_partition_start(start, self.interval)
+            name = partition_name(start, self.interval)
+            if name not in existing:
+                try:
+                    with self._maintenance_transaction() as conn:
+                        self._create_partition(conn, name, start, end)
+                    created.append(name)
+                except Exception as e:
+                    logger.error(f"Could not create emotion_logs partition {name}: {e}")
+                    failed.append(name)
+            start = end
+
+        for name in self._expired(existing | set(created), today):
+            try:
+                with self._maintenance_transaction() as conn:
+                    conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"'))
+                    if self.drop_expired:
+                        conn.execute(text(f'DROP TABLE "{name}"'))
+                retired.append(name)
+            except Exception as e:
+                logger.error(f"Could not retire emotion_logs partition {name}: {e}")
+                failed.append(name)
+
+        if created or retired:
+            action = "dropped" if self.drop_expired else "detached"
+            logger.info(f"emotion_logs partitions: created {created or 'none'}, {action} {retired or 'none'}")
+        return {"created": created, "retired": retired, "failed": failed}
+
+    def partitions(self) -> List[str]:
+        """Names of the partitions currently attached to emotion_logs"""
+        with engine.connect() as conn:
+            return self._partition_names(conn)
+
+    def start(self):
+        """Run maintenance every check_interval seconds on the running event loop"""
+        if self.enabled and self._task is None and self.check_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await asyncio.to_thread(self.run_maintenance)
+            except Exception as e:
+                logger.error(f"Error maintaining emotion_logs partitions: {e}")
+
+    @contextmanager
+    def _maintenance_transaction(self):
+        """One transaction holding the advisory lock that serializes partition DDL across workers"""
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            yield conn
+
+    def _create_partition(self, conn, name: str, start: date, end: date):
+        """Create the partition for [start, end), moving in rows the DEFAULT partition took for it"""
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = '"timestamp" >= :start AND "timestamp" < :end'
+        params = {"start": start, "end": end}
+        stray = conn.execute(
+            text(f'SELECT count(*) FROM "{DEFAULT_PARTITION}" WHERE {in_range}'), params
+        ).scalar()
+        if not stray:
+            conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" {bounds}'))
+            return
+
+        # CREATE ... PARTITION OF would fail its check against the DEFAULT partition
+        columns = ", ".join(f'"{column.name}"' for column in EmotionLog.__table__.columns)
+        conn.execute(text(
+            f'CREATE TABLE "{name}" (LIKE "{PARENT_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        ))
+        conn.execute(text(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING {columns}) '
+            f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved'
+        ), params)
+        conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{name}" {bounds}'))
+        logger.info(f"Moved {stray} emotion logs from {DEFAULT_PARTITION} into new partition {name}")
+
+    def _expired(self, existing, today: date) -> List[str]:
+        """Past partitions beyond the newest `retention` ones up to the current period"""
+        if not self.retention:
+            return []
+        current = partition_start(today, self.interval)
+        past = sorted(
+            (parsed[0], name) for name, parsed in ((name, parse_partition_name(name)) for name in existing)
+            if parsed and parsed[0] <= current
+        )
+        return [name for _, name in past[:-self.retention]]
+
+    def _partition_names(self, conn) -> List[str]:
+        rows = conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ), {"parent": PARENT_TABLE})
+        return [row[0] for row in rows]
+
+emotion_log_partitions = EmotionLogPartitionManager(
+    interval=settings.EMOTION_LOG_PARTITION_INTERVAL,
+    ahead=settings.EMOTION_LOG_PARTITIONS_AHEAD,
+    retention=settings.EMOTION_LOG_RETENTION_PARTITIONS,
+    drop_expired=settings.EMOTION_LOG_DROP_EXPIRED,
+    check_interval=settings.EMOTION_LOG_PARTITION_CHECK_SECONDS
+)
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if not emotion_log_partitions.enabled:
+        raise SystemExit("emotion_logs partitioning is off (needs PostgreSQL and EMOTION_LOG_PARTITIONING=true)")
+    result = emotion_log_partitions.run_maintenance()
+    print(f"created: {result['created']}, retired: {result['retired']}, failed: {result['failed']}")
+    print(f"attached: {sorted(emotion_log_partitions.partitions())}")
+
+if __name__ == "__main__":
+    main()
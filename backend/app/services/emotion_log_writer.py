@@ -0,0 +1,155 @@
+# services/emotion_log_writer.py
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import logging
+
+from sqlalchemy import insert
+
+from app.config.settings import settings
+from app.models.database import EmotionLog, session_scope
+from app.models.schemas import EmotionResponse
+from app.services.activity_rollups import add_emotion_logs
+
+logger = logging.getLogger(__name__)
+
+def emotion_log_row(user_id: int, session_id: Optional[int], response: EmotionResponse) -> Dict:
+    """EmotionLog column values for one analyzed frame"""
+    return {
+        'user_id': user_id,
+        'session_id': session_id,
+        # Stamped when the frame is analyzed, not when the batch is flushed
+        'timestamp': datetime.utcnow(),
+        'facial_emotions': response.facial_emotions,
+        'voice_emotions': response.voice_emotions,
+        'interaction_score': response.interaction_score,
+        'primary_emotion': response.primary_emotion,
+        'confidence_score': response.confidence,
+        'engagement_level': response.engagement_level,
+        'model_version': response.model_version
+    }
+
+class EmotionLogWriter:
+    """Write-behind buffer that persists EmotionLog rows in bulk inserts.
+
+    add() only appends to an in-memory buffer. A background task flushes
+    it with one multi-row INSERT whenever max_batch rows are waiting or
+    flush_interval seconds have passed, and stop() flushes what is left on
+    shutdown. If a flush fails the rows go back to the buffer for the next
+    attempt; beyond max_buffer rows the oldest are dropped and counted, so
+    a database outage cannot exhaust memory.
+    """
+
+    def __init__(self, max_batch: int = 500, flush_interval: float = 1.0, max_buffer: int = 50000):
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.max_batch, max_buffer)
+        self._buffer: Deque[Dict] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def add(self, row: Dict):
+        """Queue one EmotionLog row for the next flush"""
+        self._buffer.append(row)
+        if len(self._buffer) > self.max_buffer:
+            self._buffer.popleft()
+            self.rows_dropped += 1
+        if self._task is None:
+            # Not started (scripts, tests): write through
+            self._write([self._buffer.popleft() for _ in range(len(self._buffer))])
+        elif len(self._buffer) >= self.max_batch:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write everything still buffered"""
+        if self._task is not None:
+            # Let the task finish its current flush instead of cancelling it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+        while self._buffer:
+            if not await self.flush():
+                logger.error(f"Discarding {len(self._buffer)} emotion logs that could not be written at shutdown")
+                self.rows_dropped += len(self._buffer)
+                self._buffer.clear()
+        self._task = None
+
+    async def flush(self) -> bool:
+        """Write up to max_batch buffered rows; returns False if the write failed"""
+        if not self._buffer:
+            return True
+        async with self._flush_lock:
+            rows = [self._buffer.popleft() for _ in range(min(self.max_batch, len(self._buffer)))]
+            try:
+                await asyncio.to_thread(self._write, rows)
+                return True
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Error writing {len(rows)} emotion logs, will retry: {e}")
+                self._buffer.extendleft(reversed(rows))
+                return False
+
+    def stats(self) -> Dict:
+        """Buffer depth, throughput and flush latency"""
+        return {
+            'buffered': len(self._buffer),
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Drain in max_batch sized inserts; back off for a tick if the database fails
+            while self._buffer:
+                if not await self.flush():
+                    if not self._stopping:
+                        await asyncio.sleep(self.flush_interval)
+                    break
+
+    def _write(self, rows: List[Dict]):
+        if not rows:
+            return
+        started = time.perf_counter()
+        # One pooled connection per flush, however many sockets produced the rows
+        with session_scope() as db:
+            db.execute(insert(EmotionLog.__table__), rows)
+            # Rollups move in the same transaction, so they never count a row twice or miss one
+            add_emotion_logs(db.connection(), rows)
+            db.commit()
+        self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.flushes += 1
+        self.rows_written += len(rows)
+
+emotion_log_writer = EmotionLogWriter(
+    max_batch=settings.EMOTION_LOG_BATCH_SIZE,
+    flush_interval=settings.EMOTION_LOG_FLUSH_SECONDS,
+    max_buffer=settings.EMOTION_LOG_MAX_BUFFER
+)
@@ -0,0 +1,201 @@
+# services/emotion_rescoring.py
+"""Offline rescoring of stored EmotionLog rows with the current fusion logic.
+
+    python -m app.services.emotion_rescoring [--job NAME] [--chunk-size N] [--workers N] [--restart]
+        [--weight facial=0.5 ...] [--threshold confused=0.7 ...]
+
+Rows are read in keyset-paginated chunks (id > last id, ordered by id),
+fused on a process pool and written back with one executemany UPDATE per
+chunk. The checkpoint row and the emotion rollup buckets of the chunk's
+rows are updated in the same transaction as each chunk, so an interrupted
+job resumes after the last committed chunk. At most workers + 1 chunks are
+in memory at a time, whatever the table size. Emotion segments fold the old
+labels, so when a pass finishes the segments holding its rows are deleted
+and the compaction watermark moves back before them; readers use raw rows
+for that range until they are refolded. The pass's first id is kept in the
+checkpoint, so a resumed pass refolds the rows of its interrupted runs too.
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+
+from app.models.database import EmotionLog, RescoringCheckpoint, SessionLocal
+from app.services.activity_rollups import refresh_emotion_buckets
+from app.services.emotion_compaction import emotion_compaction
+from app.services.emotion_fusion import (
+    DEFAULT_EMOTION_WEIGHTS, DEFAULT_INTERVENTION_THRESHOLDS, FUSION_CATEGORIES, EmotionFusion
+)
+
+logger = logging.getLogger(__name__)
+
+emotion_logs = EmotionLog.__table__
+
+def _rescore_chunk(rows: List[Tuple], weights: Dict[str, float],
+                   thresholds: Dict[str, float]) -> List[Dict]:
+    """Fuse one chunk of (id, facial, voice, interaction) rows into UPDATE parameters.
+
+    Runs in the pool. Stored rows do not record whether voice was gated as
+    silence, so they are fused without voice renormalization.
+    """
+    fusion = EmotionFusion(weights, thresholds)
+    ids, facial, voice, interaction = zip(*rows)
+    interaction = [0.5 if score is None else score for score in interaction]
+    results = fusion.fuse_dicts(facial, voice, interaction)
+    return [
+        {
+            '_id': row_id,
+            'primary_emotion': result['primary_emotion'],
+            'confidence_score': result['confidence'],
+            'engagement_level': result['engagement']
+        }
+        for row_id, result in zip(ids, results)
+    ]
+
+class EmotionRescoringJob:
+    """Resumable rescoring of primary_emotion, confidence_score and engagement_level"""
+
+    def __init__(self, job_name: str = "default", chunk_size: int = 5000, workers: int = 4,
+                 weights: Optional[Dict[str, float]] = None,
+                 thresholds: Optional[Dict[str, float]] = None):
+        self.job_name = job_name
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.weights = dict(weights or DEFAULT_EMOTION_WEIGHTS)
+        self.thresholds = dict(thresholds or DEFAULT_INTERVENTION_THRESHOLDS)
+        # SET columns come from the parameter keys of each executemany row
+        self._update = update(emotion_logs).where(emotion_logs.c.id == bindparam('_id'))
+
+    def reset(self):
+        """Forget the checkpoint so the next run starts from the first row"""
+        db = SessionLocal()
+        try:
+            db.query(RescoringCheckpoint).filter(RescoringCheckpoint.job_name == self.job_name).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def run(self) -> int:
+        """Rescore every row after the checkpoint; returns the number of rows updated in this run"""
+        db = SessionLocal()
+        try:
+            checkpoint = db.get(RescoringCheckpoint, self.job_name)
+            if checkpoint is None:
+                checkpoint = RescoringCheckpoint(job_name=self.job_name, last_id=0, rows_done=0)
+                db.add(checkpoint)
+            # A finished job run again only picks up rows added since; an
+            # interrupted one keeps the first id of the pass it resumes
+            if checkpoint.completed or checkpoint.first_id is None:
+                checkpoint.first_id = (checkpoint.last_id or 0) + 1
+            checkpoint.completed = False
+            db.commit()
+
+            max_id = db.execute(select(func.max(emotion_logs.c.id))).scalar() or 0
+            last_read = checkpoint.last_id
+            logger.info(f"Rescoring job {self.job_name}: resuming after id {last_read}, max id {max_id}")
+
+            rows_this_run = 0
+            started = time.monotonic()
+            pending: Deque[Tuple[int, Set[Tuple[int, datetime]], Future]] = deque()
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                while True:
+                    # Keep the pool busy while bounding how many chunks are held
+                    while len(pending) <= self.workers:
+                        rows = self._read_chunk(db, last_read)
+                        if not rows:
+                            break
+                        last_read = rows[-1][0]
+                        buckets = {(user_id, timestamp) for _, user_id, timestamp, *_ in rows}
+                        inputs = [(row_id, *scores) for row_id, _, _, *scores in rows]
+                        pending.append((last_read, buckets,
+                                        pool.submit(_rescore_chunk, inputs, self.weights, self.thresholds)))
+                    if not pending:
+                        break
+
+                    # Write back in id order so the checkpoint never skips a chunk
+                    chunk_last_id, buckets, future = pending.popleft()
+                    params = future.result()
+                    db.execute(self._update, params)
+                    refresh_emotion_buckets(db.connection(), buckets)
+                    checkpoint.last_id = chunk_last_id
+                    checkpoint.rows_done = (checkpoint.rows_done or 0) + len(params)
+                    db.commit()
+
+                    rows_this_run += len(params)
+                    self._report(rows_this_run, chunk_last_id, max_id, started)
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+            checkpoint.completed = True
+            db.commit()
+            if checkpoint.last_id >= checkpoint.first_id:
+                emotion_compaction.refold_from(checkpoint.first_id)
+            logger.info(f"Rescoring job {self.job_name} finished: {rows_this_run} rows in this run, "
+                        f"{checkpoint.rows_done} in total")
+            return rows_this_run
+        finally:
+            db.close()
+
+    def _read_chunk(self, db, after_id: int) -> List[Tuple]:
+        """Next chunk of (id, user_id, timestamp, fusion inputs...) by primary key, as plain tuples"""
+        query = (
+            select(emotion_logs.c.id, emotion_logs.c.user_id, emotion_logs.c.timestamp, emotion_logs.c.facial_emotions,
+                   emotion_logs.c.voice_emotions, emotion_logs.c.interaction_score)
+            .where(emotion_logs.c.id > after_id)
+            .order_by(emotion_logs.c.id)
+            .limit(self.chunk_size)
+        )
+        return [tuple(row) for row in db.execute(query)]
+
+    def _report(self, rows: int, last_id: int, max_id: int, started: float):
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        progress = 100.0 * last_id / max_id if max_id else 100.0
+        logger.info(f"Rescoring {self.job_name}: {rows} rows, id {last_id}/{max_id} "
+                    f"({progress:.1f}%), {rate:.0f} rows/s")
+
+def _setting(names):
+    """argparse type for NAME=VALUE, with NAME one of names"""
+    def parse(value: str) -> Tuple[str, float]:
+        name, _, number = value.partition('=')
+        if name not in names:
+            raise argparse.ArgumentTypeError(f"unknown name {name!r}; expected one of {', '.join(names)}")
+        try:
+            return name, float(number)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"{value!r} is not NAME=NUMBER") from None
+    return parse
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore stored EmotionLog rows with the current fusion logic")
+    parser.add_argument("--job", default="default", help="checkpoint name; reruns of the same job resume")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and start from the first row")
+    parser.add_argument("--weight", action="append", default=[], type=_setting(tuple(DEFAULT_EMOTION_WEIGHTS)),
+                        metavar="MODALITY=W", help="fusion weight to rescore with; repeat per modality")
+    parser.add_argument("--threshold", action="append", default=[], type=_setting(FUSION_CATEGORIES),
+                        metavar="CATEGORY=T", help="intervention threshold to rescore with; repeat per category")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.models.database import Base, create_missing_columns, engine
+    Base.metadata.create_all(bind=engine, tables=[RescoringCheckpoint.__table__])
+    create_missing_columns(engine)
+
+    job = EmotionRescoringJob(args.job, chunk_size=args.chunk_size, workers=args.workers,
+                              weights={**DEFAULT_EMOTION_WEIGHTS, **dict(args.weight)},
+                              thresholds={**DEFAULT_INTERVENTION_THRESHOLDS, **dict(args.threshold)})
+    if args.restart:
+        job.reset()
+    job.run()
+
+if __name__ == "__main__":
+    main()
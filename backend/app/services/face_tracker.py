@@ -0,0 +1,98 @@
+# services/face_tracker.py
+import logging
+from functools import lru_cache
+from typing import Optional, Tuple
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # x, y, width, height
+
+@lru_cache(maxsize=1)
+def _face_cascade() -> Optional["cv2.CascadeClassifier"]:
+    """Load the frontal face Haar cascade once per process"""
+    try:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        if cascade.empty():
+            raise ValueError("cascade file is empty or missing")
+        return cascade
+    except Exception as e:
+        logger.warning(f"Face detection unavailable, using whole frames: {e}")
+        return None
+
+def detect_face(gray: np.ndarray) -> Optional[Box]:
+    """Return the largest frontal face in a grayscale frame, if any"""
+    cascade = _face_cascade()
+    if cascade is None:
+        return None
+    faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+    return int(x), int(y), int(w), int(h)
+
+def crop_face(gray: np.ndarray, box: Optional[Box], margin: float = 0.1) -> np.ndarray:
+    """Crop a face box plus a small margin; the whole frame when there is no box"""
+    if box is None:
+        return gray
+    x, y, w, h = box
+    pad_x, pad_y = int(w * margin), int(h * margin)
+    height, width = gray.shape[:2]
+    x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+    x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+    return gray[y0:y1, x0:x1]
+
+class FaceTracker:
+    """Per-connection face box that avoids running the detector on every frame.
+
+    The Haar detector runs on the first frame, every detect_interval frames
+    and whenever tracking is lost. In between, the last face patch is
+    template-matched inside a window around the previous box, which costs a
+    fraction of a millisecond on reduced-resolution frames.
+    """
+
+    def __init__(self, detect_interval: int = 10, min_score: float = 0.6, search_margin: float = 0.5):
+        self.detect_interval = detect_interval
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self._box: Optional[Box] = None
+        self._template: Optional[np.ndarray] = None
+        self._frames_since_detect = 0
+
+    def locate(self, gray: np.ndarray) -> Optional[Box]:
+        """Return the face box for this frame (None when no face is found)"""
+        box = None
+        if self._box is not None and self._frames_since_detect < self.detect_interval:
+            box = self._track(gray)
+        if box is None:
+            box = detect_face(gray)
+            self._frames_since_detect = 0
+        else:
+            self._frames_since_detect += 1
+
+        self._box = box
+        self._template = gray[box[1]:box[1] + box[3], box[0]:box[0] + box[2]].copy() if box else None
+        return box
+
+    def crop(self, gray: np.ndarray) -> np.ndarray:
+        """Crop this frame to the tracked face"""
+        return crop_face(gray, self.locate(gray))
+
+    def _track(self, gray: np.ndarray) -> Optional[Box]:
+        x, y, w, h = self._box
+        if self._template is None or self._template.shape != (h, w):
+            return None
+        pad_x, pad_y = int(w * self.search_margin), int(h * self.search_margin)
+        height, width = gray.shape[:2]
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            return None
+
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return None
+        return x0 + dx, y0 + dy, w, h
@@ -0,0 +1,72 @@
+# services/frame_gate.py
+import zlib
+import numpy as np
+import cv2
+from typing import Optional
+
+# Gate decisions, reported to clients as EmotionResponse.facial_status
+FACIAL_INFERRED = 'inferred'
+FACIAL_REUSED = 'reused'
+FACIAL_ABSENT = 'absent'
+
+class FrameGate:
+    """Cheap per-connection check that decides whether a frame needs facial inference.
+
+    A frame is "absent" when its thumbnail is nearly flat (covered camera,
+    dark room), "reused" when it is byte-identical or its thumbnail barely
+    differs from the last frame that was actually inferred, and "inferred"
+    otherwise. At most max_reuse frames in a row are reused so slow drift
+    still gets re-scored.
+    """
+
+    THUMBNAIL_SIZE = (16, 16)
+
+    def __init__(self, diff_threshold: float = 4.0, min_std: float = 8.0, max_reuse: int = 10):
+        self.diff_threshold = diff_threshold
+        self.min_std = min_std
+        self.max_reuse = max_reuse
+        self._reference: Optional[np.ndarray] = None
+        self._last_checksum: Optional[int] = None
+        self._last_decision: Optional[str] = None
+        self._reused = 0
+
+    def check_encoded(self, image: np.ndarray) -> Optional[str]:
+        """Pre-decode check: decides byte-identical frames without decoding them.
+
+        Returns None when the frame has to be decoded and passed to check().
+        """
+        checksum = zlib.crc32(image)
+        duplicate = checksum == self._last_checksum
+        self._last_checksum = checksum
+        if not duplicate:
+            return None
+        if self._last_decision == FACIAL_ABSENT:
+            return FACIAL_ABSENT
+        if self._reference is not None and self._reused < self.max_reuse:
+            self._reused += 1
+            self._last_decision = FACIAL_REUSED
+            return FACIAL_REUSED
+        return None
+
+    def check(self, image: np.ndarray) -> str:
+        """Classify a decoded (BGR or grayscale) frame"""
+        self._last_decision = self._classify(image)
+        return self._last_decision
+
+    def _classify(self, image: np.ndarray) -> str:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        thumbnail = cv2.resize(gray, self.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        if float(thumbnail.std()) < self.min_std:
+            self._reference = None
+            self._reused = 0
+            return FACIAL_ABSENT
+
+        if (self._reference is not None and self._reused < self.max_reuse
+                and float(np.mean(np.abs(thumbnail - self._reference))) < self.diff_threshold):
+            self._reused += 1
+            return FACIAL_REUSED
+
+        self._reference = thumbnail
+        self._reused = 0
+        return FACIAL_INFERRED
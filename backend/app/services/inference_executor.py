@@ -0,0 +1,76 @@
+# services/inference_executor.py
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import logging
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class InferenceExecutor:
+    """Runs blocking decode, feature extraction and model calls off the event loop"""
+
+    def __init__(self, mode: str = "thread", max_workers: int = 4):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self._pool: Optional[Executor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> Executor:
+        # Created on first use so importing the app never spawns threads or processes
+        if self._pool is None:
+            if self.mode == "process":
+                # spawn avoids forking a process that already runs an event loop and threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = self._get_thread_pool()
+            logger.info(f"Started {self.mode} inference pool with {self.max_workers} workers")
+        return self._pool
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+        return self._thread_pool
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool and await its result.
+
+        In process mode func and its arguments must be picklable, i.e. module
+        level functions or static methods.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_pool(), functools.partial(func, *args, **kwargs)
+        )
+
+    async def run_local(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a call that works on in-process state (e.g. per-connection
+        buffers) on a thread of this process, whatever the pool mode.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_thread_pool(), functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pools"""
+        for pool in {self._pool, self._thread_pool} - {None}:
+            pool.shutdown(wait=wait)
+        self._pool = None
+        self._thread_pool = None
+
+inference_executor = InferenceExecutor(
+    mode=settings.INFERENCE_EXECUTOR,
+    max_workers=settings.INFERENCE_WORKERS
+)
@@ -3,11 +3,11 @@ import json
 import asyncio
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
 from fastapi import WebSocket
 import logging
 
-from app.models.database import get_db, User, Notification, NotificationPreference
+from app.models.database import async_session_scope, User, LearningSession, Notification, NotificationPreference
 # from app.services.email_service import email_service
 import requests
 
@@ -45,26 +45,26 @@ class NotificationService:
         return False
     
     async def send_push_notification(self, user_id: int, title: str, body: str, 
-                                   data: Dict = None, db: Session = None):
+                                   data: Dict = None):
         """Send push notification via FCM"""
         try:
-            if not db:
-                db = next(get_db())
-            
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user or not user.fcm_token:
-                return False
-            
-            # Check user preferences
-            prefs = db.query(NotificationPreference).filter(
-                NotificationPreference.user_id == user_id
-            ).first()
-            
-            if prefs and not prefs.push_notifications_enabled:
-                return False
+            # Read what the push needs, then give the connection back before calling FCM
+            async with async_session_scope() as db:
+                user = await db.get(User, user_id)
+                if not user or not user.fcm_token:
+                    return False
+                
+                # Check user preferences
+                prefs = (await db.execute(select(NotificationPreference).where(
+                    NotificationPreference.user_id == user_id
+                ))).scalars().first()
+                
+                if prefs and not prefs.push_notifications_enabled:
+                    return False
+                fcm_token = user.fcm_token
             
             payload = {
-                "to": user.fcm_token,
+                "to": fcm_token,
                 "notification": {
                     "title": title,
                     "body": body,
@@ -79,22 +79,23 @@ class NotificationService:
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(self.fcm_url, 
-                                   data=json.dumps(payload), 
-                                   headers=headers)
+            response = await asyncio.to_thread(requests.post, self.fcm_url,
+                                               data=json.dumps(payload),
+                                               headers=headers)
             
             if response.status_code == 200:
                 # Store notification in database
-                notification = Notification(
-                    user_id=user_id,
-                    title=title,
-                    message=body,
-                    notification_type="push",
-                    data=data,
-                    sent_at=datetime.utcnow()
-                )
-                db.add(notification)
-                db.commit()
+                async with async_session_scope() as db:
+                    notification = Notification(
+                        user_id=user_id,
+                        title=title,
+                        message=body,
+                        notification_type="push",
+                        data=data,
+                        sent_at=datetime.utcnow()
+                    )
+                    db.add(notification)
+                    await db.commit()
                 return True
             else:
                 logger.error(f"FCM error: {response.text}")
@@ -105,7 +106,7 @@ class NotificationService:
             return False
     
     async def send_feedback_notification(self, user_id: int, feedback_type: str, 
-                                       resource_url: str, db: Session):
+                                       resource_url: str):
         """Send feedback-specific notification"""
         messages = {
             "confused": {
@@ -143,67 +144,62 @@ class NotificationService:
                 user_id, 
                 message_config["title"], 
                 message_config["body"],
-                {"resource_url": resource_url, "type": "feedback"},
-                db
+                {"resource_url": resource_url, "type": "feedback"}
             )
     
-    async def send_progress_notification(self, user_id: int, achievement: str, db: Session):
+    async def send_progress_notification(self, user_id: int, achievement: str):
         """Send progress/achievement notification"""
         await self.send_push_notification(
             user_id,
             "Achievement Unlocked! 🎉",
             f"Congratulations! You've {achievement}",
-            {"type": "achievement", "achievement": achievement},
-            db
+            {"type": "achievement", "achievement": achievement}
         )
     
-    async def send_reminder_notification(self, user_id: int, message: str, db: Session):
+    async def send_reminder_notification(self, user_id: int, message: str):
         """Send reminder notification"""
         await self.send_push_notification(
             user_id,
             "Learning Reminder",
             message,
-            {"type": "reminder"},
-            db
+            {"type": "reminder"}
         )
     
     async def schedule_daily_reminders(self):
         """Schedule daily learning reminders"""
         try:
-            db = next(get_db())
-            
-            # Get users who want daily reminders
-            users_with_reminders = db.query(User).join(NotificationPreference).filter(
-                NotificationPreference.daily_reminders == True,
-                User.is_active == True
-            ).all()
+            # One query for every opted-in user's last session, then release the connection
+            async with async_session_scope() as db:
+                last_start = func.max(LearningSession.start_time)
+                users_with_reminders = (await db.execute(
+                    select(User.id, last_start)
+                    .join(NotificationPreference, NotificationPreference.user_id == User.id)
+                    .outerjoin(LearningSession, LearningSession.user_id == User.id)
+                    .where(
+                        NotificationPreference.daily_reminders == True,
+                        User.is_active == True
+                    )
+                    .group_by(User.id)
+                )).all()
             
-            for user in users_with_reminders:
+            for user_id, last_session_start in users_with_reminders:
                 # Check if user has been inactive for more than 24 hours
-                last_session = db.query(LearningSession).filter(
-                    LearningSession.user_id == user.id
-                ).order_by(LearningSession.start_time.desc()).first()
-                
-                if not last_session or \
-                   (datetime.utcnow() - last_session.start_time) > timedelta(hours=24):
+                if last_session_start is None or \
+                   (datetime.utcnow() - last_session_start) > timedelta(hours=24):
                     await self.send_reminder_notification(
-                        user.id,
-                        "Ready to learn something new today? 📚",
-                        db
+                        user_id,
+                        "Ready to learn something new today? 📚"
                     )
             
         except Exception as e:
             logger.error(f"Error scheduling daily reminders: {e}")
     
-    async def get_user_notifications(self, user_id: int, limit: int = 50, 
-                                   db: Session = None) -> List[Dict]:
+    async def get_user_notifications(self, user_id: int, limit: int = 50) -> List[Dict]:
         """Get user notifications"""
-        if not db:
-            db = next(get_db())
-        
-        notifications = db.query(Notification).filter(
-            Notification.user_id == user_id
-        ).order_by(Notification.created_at.desc()).limit(limit).all()
+        async with async_session_scope() as db:
+            notifications = (await db.execute(select(Notification).where(
+                Notification.user_id == user_id
+            ).order_by(Notification.created_at.desc()).limit(limit))).scalars().all()
         
         return [
             {
@@ -219,20 +215,17 @@ class NotificationService:
             for n in notifications
         ]
     
-    async def mark_notification_read(self, notification_id: int, user_id: int, 
-                                   db: Session = None):
+    async def mark_notification_read(self, notification_id: int, user_id: int):
         """Mark notification as read"""
-        if not db:
-            db = next(get_db())
-        
-        notification = db.query(Notification).filter(
-            Notification.id == notification_id,
-            Notification.user_id == user_id
-        ).first()
-        
-        if notification:
-            notification.read = True
-            notification.read_at = datetime.utcnow()
-            db.commit()
+        async with async_session_scope() as db:
+            notification = (await db.execute(select(Notification).where(
+                Notification.id == notification_id,
+                Notification.user_id == user_id
+            ))).scalars().first()
+            
+            if notification:
+                notification.read = True
+                notification.read_at = datetime.utcnow()
+                await db.commit()
 
 notification_service = NotificationService()
\ No newline at end of file
@@ -0,0 +1,95 @@
+# services/prediction_batcher.py
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+import logging
+
+from app.config.settings import settings
+from app.models.emotion_models import emotion_models
+from app.services.inference_executor import inference_executor
+
+logger = logging.getLogger(__name__)
+
+def _predict_batch(model: str, features: np.ndarray) -> Tuple[Optional[str], List[Any]]:
+    """Run one vectorized prediction for a model (module level so it pickles).
+
+    Returns the version of the model set that ran it, as seen by the
+    thread or inference process it ran in, with the predictions.
+    """
+    if model not in PredictionBatcher.MODELS:
+        raise ValueError(f"Unknown model: {model}")
+    return emotion_models.predict_versioned(model, features)
+
+class PredictionBatcher:
+    """Collects single-row predictions across connections into vectorized batches.
+
+    A batch for a model is flushed when it reaches max_batch_size rows or when
+    its oldest row has waited max_wait_ms, whichever comes first.
+    """
+
+    MODELS = ('facial', 'voice', 'interaction')
+
+    def __init__(self, enabled: bool = True, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.enabled = enabled
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: Dict[str, List[Tuple[np.ndarray, asyncio.Future]]] = {m: [] for m in self.MODELS}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # The event loop only holds weak references to tasks; keep running batches alive
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {m: {'batches': 0, 'rows': 0} for m in self.MODELS}
+
+    async def predict(self, model: str, features: np.ndarray) -> Tuple[Any, Optional[str]]:
+        """Queue a 1xN feature row and await its prediction and the model version that made it"""
+        if not self.enabled:
+            version, predictions = await inference_executor.run(_predict_batch, model, features)
+            return predictions[0], version
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending[model]
+        pending.append((features, future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.max_wait, self._flush, model)
+
+        return await future
+
+    def _flush(self, model: str):
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending[model]
+        if not batch:
+            return
+        self._pending[model] = []
+        task = asyncio.ensure_future(self._run_batch(model, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, model: str, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        try:
+            features = np.vstack([row for row, _ in batch])
+            version, results = await inference_executor.run(_predict_batch, model, features)
+        except Exception as e:
+            logger.error(f"Error in batched {model} prediction: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats[model]['batches'] += 1
+        self.stats[model]['rows'] += len(batch)
+        for (_, future), result in zip(batch, results):
+            # The caller may have gone away (e.g. socket closed) while we ran
+            if not future.done():
+                future.set_result((result, version))
+
+prediction_batcher = PredictionBatcher(
+    enabled=settings.PREDICTION_BATCHING,
+    max_batch_size=settings.PREDICTION_BATCH_MAX_SIZE,
+    max_wait_ms=settings.PREDICTION_BATCH_MAX_WAIT_MS
+)
@@ -1,11 +1,13 @@
 # app/services/report_service.py
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional
 import pandas as pd
-from app.models.database import EmotionLog, LearningSession, Intervention, User
+from app.models.database import LearningSession, Intervention, User
 from app.models.schemas import WeeklyReport, MonthlyReport, YearlyReport
+from app.services.activity_rollups import load_emotion_buckets, session_buckets, session_totals
+from app.utils.time_ranges import day_bounds, in_days, in_year
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +21,7 @@ class ReportService:
             'learning_specific': ['confused', 'bored', 'focused']
         }
     
-    async def generate_weekly_report(self, user_id: int, db: Session, week_offset: int = 0) -> Dict:
+    async def generate_weekly_report(self, user_id: int, db: AsyncSession, week_offset: int = 0) -> Dict:
         """Generate weekly report for user"""
         try:
             # Calculate date range for the week
@@ -28,33 +30,25 @@ class ReportService:
             end_of_week = start_of_week + timedelta(days=6)
             
             # Get sessions for the week
-            sessions = db.query(LearningSession).filter(
+            sessions = (await db.execute(select(LearningSession).where(
                 and_(
                     LearningSession.user_id == user_id,
-                    func.date(LearningSession.start_time) >= start_of_week,
-                    func.date(LearningSession.start_time) <= end_of_week
+                    in_days(LearningSession.start_time, start_of_week, end_of_week)
                 )
-            ).all()
+            ))).scalars().all()
             
-            # Get emotions for the week
-            emotions = db.query(EmotionLog).filter(
-                and_(
-                    EmotionLog.user_id == user_id,
-                    func.date(EmotionLog.timestamp) >= start_of_week,
-                    func.date(EmotionLog.timestamp) <= end_of_week
-                )
-            ).all()
+            # Get emotions for the week (daily per-emotion rollups)
+            emotions = await load_emotion_buckets(db, user_id, *day_bounds(start_of_week, end_of_week))
             
             # Get interventions for the week
-            interventions = db.query(Intervention).join(
+            interventions = (await db.execute(select(Intervention).join(
                 Intervention.session
-            ).filter(
+            ).where(
                 and_(
-                    Intervention.session.has(user_id=user_id),
-                    func.date(Intervention.timestamp) >= start_of_week,
-                    func.date(Intervention.timestamp) <= end_of_week
+                    LearningSession.user_id == user_id,
+                    in_days(Intervention.timestamp, start_of_week, end_of_week)
                 )
-            ).all()
+            ))).scalars().all()
             
             # Calculate metrics
             total_sessions = len(sessions)
@@ -105,7 +99,7 @@ class ReportService:
             logger.error(f"Error generating weekly report: {e}")
             raise
     
-    async def generate_monthly_report(self, user_id: int, db: Session, month_offset: int = 0) -> Dict:
+    async def generate_monthly_report(self, user_id: int, db: AsyncSession, month_offset: int = 0) -> Dict:
         """Generate monthly report for user"""
         try:
             # Calculate date range for the month
@@ -130,21 +124,14 @@ class ReportService:
                     end_of_month = datetime(target_year, target_month + 1, 1).date() - timedelta(days=1)
             
             # Get data for the month
-            sessions = db.query(LearningSession).filter(
+            sessions = (await db.execute(select(LearningSession).where(
                 and_(
                     LearningSession.user_id == user_id,
-                    func.date(LearningSession.start_time) >= start_of_month,
-                    func.date(LearningSession.start_time) <= end_of_month
+                    in_days(LearningSession.start_time, start_of_month, end_of_month)
                 )
-            ).all()
+            ))).scalars().all()
             
-            emotions = db.query(EmotionLog).filter(
-                and_(
-                    EmotionLog.user_id == user_id,
-                    func.date(EmotionLog.timestamp) >= start_of_month,
-                    func.date(EmotionLog.timestamp) <= end_of_month
-                )
-            ).all()
+            emotions = await load_emotion_buckets(db, user_id, *day_bounds(start_of_month, end_of_month))
             
             # Weekly breakdown
             weekly_data = await self._calculate_weekly_breakdown(user_id, db, start_of_month, end_of_month)
@@ -178,7 +165,7 @@ class ReportService:
             logger.error(f"Error generating monthly report: {e}")
             raise
     
-    async def generate_yearly_report(self, user_id: int, db: Session, year: Optional[int] = None) -> Dict:
+    async def generate_yearly_report(self, user_id: int, db: AsyncSession, year: Optional[int] = None) -> Dict:
         """Generate yearly report for user"""
         try:
             if year is None:
@@ -188,21 +175,14 @@ class ReportService:
             end_of_year = datetime(year, 12, 31).date()
             
             # Get all data for the year
-            sessions = db.query(LearningSession).filter(
+            sessions = (await db.execute(select(LearningSession).where(
                 and_(
                     LearningSession.user_id == user_id,
-                    func.date(LearningSession.start_time) >= start_of_year,
-                    func.date(LearningSession.start_time) <= end_of_year
+                    in_days(LearningSession.start_time, start_of_year, end_of_year)
                 )
-            ).all()
+            ))).scalars().all()
             
-            emotions = db.query(EmotionLog).filter(
-                and_(
-                    EmotionLog.user_id == user_id,
-                    func.date(EmotionLog.timestamp) >= start_of_year,
-                    func.date(EmotionLog.timestamp) <= end_of_year
-                )
-            ).all()
+            emotions = await load_emotion_buckets(db, user_id, *day_bounds(start_of_year, end_of_year))
             
             # Monthly breakdown
             monthly_data = await self._calculate_monthly_breakdown(user_id, db, start_of_year, end_of_year)
@@ -243,11 +223,11 @@ class ReportService:
             return {}
         
         emotion_counts = {}
-        total_emotions = len(emotions)
+        total_emotions = sum(emotion.frames for emotion in emotions)
         
         for emotion in emotions:
             primary = emotion.primary_emotion
-            emotion_counts[primary] = emotion_counts.get(primary, 0) + 1
+            emotion_counts[primary] = emotion_counts.get(primary, 0) + emotion.frames
         
         return {k: v / total_emotions for k, v in emotion_counts.items()}
     
@@ -264,7 +244,7 @@ class ReportService:
             date_key = emotion.timestamp.date().isoformat()
             if date_key in daily_emotions:
                 primary = emotion.primary_emotion
-                daily_emotions[date_key][primary] = daily_emotions[date_key].get(primary, 0) + 1
+                daily_emotions[date_key][primary] = daily_emotions[date_key].get(primary, 0) + emotion.frames
         
         return daily_emotions
     
@@ -293,39 +273,25 @@ class ReportService:
             "success_rate": len([i for i in interventions if i.user_response == 'completed']) / total_interventions
         }
     
-    async def _calculate_progress_metrics(self, user_id: int, db: Session, start_date, end_date) -> Dict:
+    async def _calculate_progress_metrics(self, user_id: int, db: AsyncSession, start_date, end_date) -> Dict:
         """Calculate progress metrics"""
         # Get previous period for comparison
         period_length = (end_date - start_date).days
         prev_start = start_date - timedelta(days=period_length)
         prev_end = start_date - timedelta(days=1)
         
-        current_sessions = db.query(LearningSession).filter(
-            and_(
-                LearningSession.user_id == user_id,
-                func.date(LearningSession.start_time) >= start_date,
-                func.date(LearningSession.start_time) <= end_date
-            )
-        ).all()
-        
-        prev_sessions = db.query(LearningSession).filter(
-            and_(
-                LearningSession.user_id == user_id,
-                func.date(LearningSession.start_time) >= prev_start,
-                func.date(LearningSession.start_time) <= prev_end
-            )
-        ).all()
+        current, prev = await session_totals(db, user_id, [(start_date, end_date), (prev_start, prev_end)])
         
-        current_engagement = sum(s.average_engagement or 0 for s in current_sessions) / max(len(current_sessions), 1)
-        prev_engagement = sum(s.average_engagement or 0 for s in prev_sessions) / max(len(prev_sessions), 1)
+        current_engagement = current['engagement_sum'] / max(current['sessions'], 1)
+        prev_engagement = prev['engagement_sum'] / max(prev['sessions'], 1)
         
         engagement_change = current_engagement - prev_engagement
         
         return {
             "engagement_change": round(engagement_change, 3),
             "engagement_trend": "improving" if engagement_change > 0 else "declining",
-            "session_count_change": len(current_sessions) - len(prev_sessions),
-            "completion_rate": sum(s.completion_percentage or 0 for s in current_sessions) / max(len(current_sessions), 1)
+            "session_count_change": current['sessions'] - prev['sessions'],
+            "completion_rate": current['completion_sum'] / max(current['sessions'], 1)
         }
     
     def _analyze_weekly_patterns(self, sessions: List, emotions: List) -> Dict:
@@ -356,7 +322,7 @@ class ReportService:
             "average_session_length": sum(s.duration_minutes or 0 for s in sessions) / len(sessions)
         }
     
-    async def _check_weekly_achievements(self, user_id: int, db: Session, sessions: List, emotions: List) -> List[Dict]:
+    async def _check_weekly_achievements(self, user_id: int, db: AsyncSession, sessions: List, emotions: List) -> List[Dict]:
         """Check for weekly achievements"""
         achievements = []
         
@@ -392,7 +358,7 @@ class ReportService:
         
         return achievements
     
-    async def _check_monthly_achievements(self, user_id: int, db: Session, sessions: List, emotions: List) -> List[Dict]:
+    async def _check_monthly_achievements(self, user_id: int, db: AsyncSession, sessions: List, emotions: List) -> List[Dict]:
         """Check for monthly achievements"""
         achievements = []
         
@@ -418,7 +384,7 @@ class ReportService:
         
         return achievements
     
-    async def _check_yearly_achievements(self, user_id: int, db: Session, sessions: List, emotions: List) -> List[Dict]:
+    async def _check_yearly_achievements(self, user_id: int, db: AsyncSession, sessions: List, emotions: List) -> List[Dict]:
         """Check for yearly achievements"""
         achievements = []
         
@@ -451,33 +417,27 @@ class ReportService:
         
         return recommendations
     
-    async def _calculate_weekly_breakdown(self, user_id: int, db: Session, start_date, end_date) -> Dict:
+    async def _calculate_weekly_breakdown(self, user_id: int, db: AsyncSession, start_date, end_date) -> Dict:
         """Calculate weekly breakdown for monthly report"""
-        weekly_data = {}
-        current_date = start_date
-        week_num = 1
+        # One grouped query for every day, folded into 7-day weeks from start_date
+        days = await session_buckets(db, user_id, start_date, end_date, 'day')
+        weeks = [
+            {"sessions": 0, "study_minutes": 0.0, "engagement_sum": 0.0}
+            for _ in range((end_date - start_date).days // 7 + 1)
+        ]
+        for day, totals in days.items():
+            week = weeks[(day.date() - start_date).days // 7]
+            for key in week:
+                week[key] += totals[key]
         
-        while current_date <= end_date:
-            week_end = min(current_date + timedelta(days=6), end_date)
-            
-            week_sessions = db.query(LearningSession).filter(
-                and_(
-                    LearningSession.user_id == user_id,
-                    func.date(LearningSession.start_time) >= current_date,
-                    func.date(LearningSession.start_time) <= week_end
-                )
-            ).all()
-            
-            weekly_data[f"week_{week_num}"] = {
-                "sessions": len(week_sessions),
-                "study_time": sum(s.duration_minutes or 0 for s in week_sessions),
-                "avg_engagement": sum(s.average_engagement or 0 for s in week_sessions) / max(len(week_sessions), 1)
+        return {
+            f"week_{week_num}": {
+                "sessions": week["sessions"],
+                "study_time": week["study_minutes"],
+                "avg_engagement": week["engagement_sum"] / max(week["sessions"], 1)
             }
-            
-            current_date = week_end + timedelta(days=1)
-            week_num += 1
-        
-        return weekly_data
+            for week_num, week in enumerate(weeks, start=1)
+        }
     
     def _calculate_emotion_trends(self, emotions: List) -> Dict:
         """Calculate emotion trends over time"""
@@ -490,14 +450,15 @@ class ReportService:
             week_key = emotion.timestamp.strftime('%Y-W%U')
             if week_key not in weekly_emotions:
                 weekly_emotions[week_key] = []
-            weekly_emotions[week_key].append(emotion.primary_emotion)
+            weekly_emotions[week_key].append(emotion)
         
         # Calculate trends
         trends = {}
         for week, week_emotions in weekly_emotions.items():
             emotion_counts = {}
             for emotion in week_emotions:
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+                primary = emotion.primary_emotion
+                emotion_counts[primary] = emotion_counts.get(primary, 0) + emotion.frames
             
             dominant_emotion = max(emotion_counts, key=emotion_counts.get)
             trends[week] = {
@@ -507,7 +468,7 @@ class ReportService:
         
         return trends
     
-    async def _calculate_monthly_trends(self, user_id: int, db: Session, start_date, end_date) -> Dict:
+    async def _calculate_monthly_trends(self, user_id: int, db: AsyncSession, start_date, end_date) -> Dict:
         """Calculate monthly learning trends"""
         # Implementation for monthly trends
         return {
@@ -516,7 +477,7 @@ class ReportService:
             "consistency_trend": "improving"
         }
     
-    async def _calculate_goal_progress(self, user_id: int, db: Session, start_date, end_date) -> Dict:
+    async def _calculate_goal_progress(self, user_id: int, db: AsyncSession, start_date, end_date) -> Dict:
         """Calculate goal progress"""
         # This would integrate with a goals system
         return {
@@ -524,53 +485,36 @@ class ReportService:
             "session_goal": {"target": 20, "achieved": 18, "percentage": 90.0}
         }
     
-    async def _calculate_monthly_breakdown(self, user_id: int, db: Session, start_date, end_date) -> Dict:
+    async def _calculate_monthly_breakdown(self, user_id: int, db: AsyncSession, start_date, end_date) -> Dict:
         """Calculate monthly breakdown for yearly report"""
+        # One query grouped by month; months without sessions still get an entry
+        months = await session_buckets(db, user_id, start_date, end_date, 'month')
+        empty = {"sessions": 0, "study_minutes": 0.0, "engagement_sum": 0.0}
         monthly_data = {}
-        current_date = start_date
+        current_date = start_date.replace(day=1)
         
         while current_date <= end_date:
-            month_end = min(
-                datetime(current_date.year, current_date.month + 1, 1).date() - timedelta(days=1),
-                end_date
-            ) if current_date.month < 12 else min(
-                datetime(current_date.year + 1, 1, 1).date() - timedelta(days=1),
-                end_date
-            )
-            
-            month_sessions = db.query(LearningSession).filter(
-                and_(
-                    LearningSession.user_id == user_id,
-                    func.date(LearningSession.start_time) >= current_date,
-                    func.date(LearningSession.start_time) <= month_end
-                )
-            ).all()
-            
-            month_key = current_date.strftime('%B')
-            monthly_data[month_key] = {
-                "sessions": len(month_sessions),
-                "study_hours": sum(s.duration_minutes or 0 for s in month_sessions) / 60,
-                "avg_engagement": sum(s.average_engagement or 0 for s in month_sessions) / max(len(month_sessions), 1)
+            totals = months.get(datetime.combine(current_date, datetime.min.time()), empty)
+            monthly_data[current_date.strftime('%B')] = {
+                "sessions": totals["sessions"],
+                "study_hours": totals["study_minutes"] / 60,
+                "avg_engagement": totals["engagement_sum"] / max(totals["sessions"], 1)
             }
-            
-            if current_date.month == 12:
-                current_date = datetime(current_date.year + 1, 1, 1).date()
-            else:
-                current_date = datetime(current_date.year, current_date.month + 1, 1).date()
+            current_date = date(current_date.year + current_date.month // 12, current_date.month % 12 + 1, 1)
         
         return monthly_data
     
-    async def _calculate_learning_milestones(self, user_id: int, db: Session, year: int) -> List[Dict]:
+    async def _calculate_learning_milestones(self, user_id: int, db: AsyncSession, year: int) -> List[Dict]:
         """Calculate learning milestones for the year"""
         milestones = []
         
         # First session milestone
-        first_session = db.query(LearningSession).filter(
+        first_session = (await db.execute(select(LearningSession).where(
             and_(
                 LearningSession.user_id == user_id,
-                extract('year', LearningSession.start_time) == year
+                in_year(LearningSession.start_time, year)
             )
-        ).order_by(LearningSession.start_time).first()
+        ).order_by(LearningSession.start_time))).scalars().first()
         
         if first_session:
             milestones.append({
@@ -582,31 +526,19 @@ class ReportService:
         # Add more milestone logic here
         return milestones
     
-    async def _calculate_yoy_comparison(self, user_id: int, db: Session, year: int) -> Dict:
+    async def _calculate_yoy_comparison(self, user_id: int, db: AsyncSession, year: int) -> Dict:
         """Calculate year-over-year comparison"""
-        # Get previous year data
-        prev_year_sessions = db.query(LearningSession).filter(
-            and_(
-                LearningSession.user_id == user_id,
-                extract('year', LearningSession.start_time) == year - 1
-            )
-        ).all()
-        
-        current_year_sessions = db.query(LearningSession).filter(
-            and_(
-                LearningSession.user_id == user_id,
-                extract('year', LearningSession.start_time) == year
-            )
-        ).all()
-        
-        prev_study_time = sum(s.duration_minutes or 0 for s in prev_year_sessions)
-        current_study_time = sum(s.duration_minutes or 0 for s in current_year_sessions)
+        # Previous and current year from daily session rollups
+        prev_year, current_year = await session_totals(db, user_id, [
+            (date(year - 1, 1, 1), date(year - 1, 12, 31)),
+            (date(year, 1, 1), date(year, 12, 31))
+        ])
         
         return {
-            "sessions_change": len(current_year_sessions) - len(prev_year_sessions),
-            "study_time_change": current_study_time - prev_study_time,
-            "engagement_change": (sum(s.average_engagement or 0 for s in current_year_sessions) / max(len(current_year_sessions), 1)) - 
-                               (sum(s.average_engagement or 0 for s in prev_year_sessions) / max(len(prev_year_sessions), 1))
+            "sessions_change": current_year['sessions'] - prev_year['sessions'],
+            "study_time_change": current_year['study_minutes'] - prev_year['study_minutes'],
+            "engagement_change": (current_year['engagement_sum'] / max(current_year['sessions'], 1)) - 
+                               (prev_year['engagement_sum'] / max(prev_year['sessions'], 1))
         }
     
     def _calculate_emotion_journey(self, emotions: List) -> Dict:
@@ -620,14 +552,15 @@ class ReportService:
             month_key = emotion.timestamp.strftime('%B')
             if month_key not in monthly_emotions:
                 monthly_emotions[month_key] = []
-            monthly_emotions[month_key].append(emotion.primary_emotion)
+            monthly_emotions[month_key].append(emotion)
         
         # Calculate dominant emotion per month
         journey = {}
         for month, month_emotions in monthly_emotions.items():
             emotion_counts = {}
             for emotion in month_emotions:
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+                primary = emotion.primary_emotion
+                emotion_counts[primary] = emotion_counts.get(primary, 0) + emotion.frames
             
             journey[month] = max(emotion_counts, key=emotion_counts.get)
         
@@ -0,0 +1,70 @@
+# services/schema_migration.py
+"""Schema setup for a deploy: tables, added columns and indexes, partitions and rollups.
+
+    python -m app.services.schema_migration
+
+Runs once per deploy before the app serves traffic: gunicorn.conf.py runs it
+in the master before any worker forks, and a single-process server runs it on
+import unless MIGRATE_ON_STARTUP is off. Every step is idempotent, and on
+PostgreSQL the whole migration holds an advisory lock, so processes started
+together wait for the first one instead of racing on DDL or the rebuild.
+
+Rollups are rebuilt from the raw tables when both are empty while the raw
+tables are not, i.e. on the first deploy that has them.
+"""
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from app.models.database import Base, create_missing_columns, create_missing_indexes, engine
+from app.services import activity_rollups
+from app.services.emotion_log_conversion import legacy_columns
+from app.services.emotion_log_partitions import emotion_log_partitions
+
+logger = logging.getLogger(__name__)
+
+ADVISORY_LOCK_KEY = 0x73636D61  # "scma"
+
+@contextmanager
+def _migration_lock():
+    """Hold a session advisory lock on PostgreSQL; SQLite serializes DDL itself"""
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            conn.commit()
+
+def migrate() -> bool:
+    """Bring the schema up to date; returns True if the rollups were rebuilt"""
+    with _migration_lock():
+        Base.metadata.create_all(bind=engine)
+        create_missing_columns(engine)
+        create_missing_indexes(engine)
+        if emotion_log_partitions.enabled:
+            emotion_log_partitions.run_maintenance()
+
+        if not activity_rollups.needs_rebuild(engine):
+            return False
+        if legacy_columns():
+            logger.warning("Rollup tables are empty; they are rebuilt by the first migration "
+                           "after python -m app.services.emotion_log_conversion")
+            return False
+        # Reports read rollups only, so fill them with the history already in the raw tables
+        activity_rollups.rebuild()
+        logger.info("Rollups rebuilt from the raw tables")
+        return True
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    migrate()
+    logger.info("Schema is up to date")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# services/voice_activity.py
+import numpy as np
+from app.config.settings import settings
+
+# Gate decisions, reported to clients as EmotionResponse.voice_status
+VOICE_INFERRED = 'inferred'
+VOICE_SILENT = 'silent'
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing voice activity check for an audio chunk.
+
+    The chunk is cut into short frames; a frame counts as speech when its
+    RMS level is above energy_threshold_db (dBFS) and its zero-crossing rate
+    is below max_zcr (broadband hiss crosses zero far more often than voiced
+    speech). The chunk has speech when at least min_speech_ratio of its
+    frames do. Everything is a handful of vectorized numpy reductions, so a
+    one second chunk costs tens of microseconds.
+    """
+
+    def __init__(self, energy_threshold_db: float = -45.0, max_zcr: float = 0.35,
+                 min_speech_ratio: float = 0.1, frame_ms: float = 20.0):
+        self.energy_threshold = 10.0 ** (energy_threshold_db / 20.0)
+        self.max_zcr = max_zcr
+        self.min_speech_ratio = min_speech_ratio
+        self.frame_ms = frame_ms
+
+    def has_speech(self, audio_data: np.ndarray, sr: int) -> bool:
+        """Return True when the chunk contains enough speech-like frames"""
+        frame_length = max(1, int(sr * self.frame_ms / 1000.0))
+        n_frames = len(audio_data) // frame_length
+        if n_frames == 0:
+            return False
+
+        frames = audio_data[:n_frames * frame_length].reshape(n_frames, frame_length)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_length)
+
+        speech_frames = np.count_nonzero((rms > self.energy_threshold) & (zcr < self.max_zcr))
+        return speech_frames >= self.min_speech_ratio * n_frames
+
+voice_activity_detector = VoiceActivityDetector(
+    energy_threshold_db=settings.VAD_ENERGY_THRESHOLD_DB,
+    max_zcr=settings.VAD_MAX_ZCR,
+    min_speech_ratio=settings.VAD_MIN_SPEECH_RATIO
+)
@@ -0,0 +1,118 @@
+import io
+import struct
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+import numpy as np
+from scipy.signal import firwin, resample_poly
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Largest reduced up/down factor resample() designs a filter for. Standard
+# rates (8-96 kHz) to 22050 Hz stay within it; a rate coprime with the
+# target would otherwise need a filter with ~20 taps per Hz.
+MAX_RESAMPLE_FACTOR = 640
+
+class AudioDecodeError(ValueError):
+    """Raised when an audio buffer cannot be decoded"""
+
+def is_wav(data) -> bool:
+    """Check for a RIFF/WAVE header"""
+    header = bytes(memoryview(data)[:12])
+    return len(header) == 12 and header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+def decode_wav(data) -> Tuple[np.ndarray, int]:
+    """Decode an in-memory WAV file to mono float32 samples and its sample rate.
+
+    Handles integer PCM (8/16/24/32-bit) and IEEE float, plain or
+    WAVE_FORMAT_EXTENSIBLE. The data chunk is read with np.frombuffer,
+    so the only copies are the float conversion and downmix.
+    """
+    view = memoryview(data)
+    if not is_wav(view):
+        raise AudioDecodeError("Not a RIFF/WAVE buffer")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", view, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            format_tag, channels, sample_rate = struct.unpack_from("<HHI", view, body)
+            bits = struct.unpack_from("<H", view, body + 14)[0]
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # First two bytes of the SubFormat GUID carry the real format tag
+                format_tag = struct.unpack_from("<H", view, body + 24)[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioDecodeError("WAV data chunk before fmt chunk")
+            # Streaming writers often leave the size unset; take what is there
+            size = min(chunk_size, len(view) - body)
+            return _pcm_to_float(view[body:body + size], *fmt)
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise AudioDecodeError("WAV buffer has no data chunk")
+
+def _pcm_to_float(data: memoryview, format_tag: int, channels: int,
+                  sample_rate: int, bits: int) -> Tuple[np.ndarray, int]:
+    sample_width = bits // 8
+    usable = len(data) - len(data) % (sample_width * max(channels, 1))
+
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(data, "<f%d" % sample_width, count=usable // sample_width)
+        samples = samples.astype(np.float32, copy=False)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(data, np.uint8, count=usable).astype(np.float32) - 128.0) / 128.0
+    elif format_tag == WAVE_FORMAT_PCM and bits in (16, 32):
+        samples = np.frombuffer(data, "<i%d" % sample_width, count=usable // sample_width)
+        samples = samples.astype(np.float32) / float(2 ** (bits - 1))
+    elif format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(data, np.uint8, count=usable).reshape(-1, 3)
+        packed = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                  | (raw[:, 2].astype(np.int32) << 16))
+        samples = (np.where(packed & 0x800000, packed - 0x1000000, packed)).astype(np.float32) / 8388608.0
+    else:
+        raise AudioDecodeError(f"Unsupported WAV encoding: format {format_tag}, {bits} bits")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+@lru_cache(maxsize=16)
+def _resample_filter(up: int, down: int) -> np.ndarray:
+    """Anti-aliasing FIR for a rate ratio, designed once per ratio"""
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    taps.setflags(write=False)
+    return taps
+
+def resample(samples: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """Polyphase resample to target_sr; a no-op when the rates already match.
+
+    Raises AudioDecodeError for rates whose reduced ratio exceeds MAX_RESAMPLE_FACTOR.
+    """
+    if orig_sr == target_sr or len(samples) == 0:
+        return samples
+    if orig_sr <= 0:
+        raise AudioDecodeError(f"Invalid sample rate {orig_sr} Hz")
+    divisor = gcd(int(orig_sr), int(target_sr))
+    up, down = int(target_sr) // divisor, int(orig_sr) // divisor
+    if max(up, down) > MAX_RESAMPLE_FACTOR:
+        raise AudioDecodeError(f"Unsupported sample rate {orig_sr} Hz: resampling to {target_sr} Hz "
+                               f"needs a {up}/{down} ratio")
+    resampled = resample_poly(samples, up, down, window=_resample_filter(up, down))
+    return resampled.astype(np.float32, copy=False)
+
+def load_audio(data, target_sr: int) -> np.ndarray:
+    """Decode an in-memory audio file to mono float32 at target_sr"""
+    if is_wav(data):
+        samples, sample_rate = decode_wav(data)
+    else:
+        # Compressed containers (webm/ogg/mp3) still go through librosa's readers
+        import librosa
+        samples, sample_rate = librosa.load(io.BytesIO(bytes(data)), sr=None, mono=True)
+    return resample(samples, sample_rate, target_sr)
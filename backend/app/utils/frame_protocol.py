@@ -0,0 +1,161 @@
+"""Binary WebSocket frame protocol for /emotions/ws/{user_id}.
+
+Layout (little-endian), version 1:
+
+    offset  size  field
+    0       2     magic b"SB"
+    2       1     version
+    3       1     audio format (see AUDIO_FORMATS)
+    4       8     client timestamp, ms since epoch (float64)
+    12      4     audio sample rate in Hz (0 if no audio, else 8000-96000)
+    16      4     image section length
+    20      4     audio section length
+    24      4     interaction section length
+    28      ...   image (encoded JPEG/PNG), audio, interaction (UTF-8 JSON)
+
+Sections are exposed as views on the received message, so the image is
+handed to cv2.imdecode and float32 PCM to the feature code without copying.
+"""
+import base64
+import json
+import math
+import struct
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.models.schemas import EmotionData
+
+MAGIC = b"SB"
+PROTOCOL_VERSION = 1
+
+HEADER = struct.Struct("<2sBBdIIII")
+
+AUDIO_NONE = 0
+AUDIO_PCM_S16LE = 1
+AUDIO_PCM_F32LE = 2
+AUDIO_WAV = 3
+AUDIO_FORMATS = {AUDIO_NONE, AUDIO_PCM_S16LE, AUDIO_PCM_F32LE, AUDIO_WAV}
+
+# Client sample rates accepted in the header; resampling cost grows with the rate
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 96000
+
+# Client timestamps must fall in [epoch, year 10000) to convert to a datetime
+MAX_TIMESTAMP_MS = 253402300800000.0
+
+class FrameProtocolError(ValueError):
+    """Raised for malformed or unsupported binary frames"""
+
+class EmotionFrame:
+    """One decoded client frame, whichever wire format it arrived in.
+
+    image and audio_bytes hold encoded media (JPEG, WAV) as bytes-like
+    objects; pcm holds raw mono float32 samples at sample_rate when the
+    client streamed PCM.
+    """
+
+    def __init__(self, interaction_data: Dict, timestamp: datetime,
+                 image: Optional[np.ndarray] = None, audio_bytes: Optional[bytes] = None,
+                 pcm: Optional[np.ndarray] = None, sample_rate: Optional[int] = None):
+        self.interaction_data = interaction_data
+        self.timestamp = timestamp
+        self.image = image
+        self.audio_bytes = audio_bytes
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+
+    @property
+    def has_audio(self) -> bool:
+        return self.pcm is not None or self.audio_bytes is not None
+
+    @classmethod
+    def from_emotion_data(cls, data: EmotionData) -> "EmotionFrame":
+        """Build a frame from the legacy JSON payload with base64 media"""
+        image = None
+        if data.facial_frame:
+            image = np.frombuffer(_b64decode(data.facial_frame), np.uint8)
+        audio_bytes = _b64decode(data.audio_chunk) if data.audio_chunk else None
+        return cls(
+            interaction_data=data.interaction_data,
+            timestamp=data.timestamp,
+            image=image,
+            audio_bytes=audio_bytes
+        )
+
+def _b64decode(payload: str) -> bytes:
+    """Decode base64 media, with or without a data URL prefix"""
+    return base64.b64decode(payload.split(',')[1] if ',' in payload else payload)
+
+def decode_frame(message: bytes) -> EmotionFrame:
+    """Decode a binary frame message"""
+    view = memoryview(message)
+    if len(view) < HEADER.size:
+        raise FrameProtocolError("Frame shorter than header")
+
+    magic, version, audio_format, timestamp_ms, sample_rate, image_len, audio_len, interaction_len = \
+        HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise FrameProtocolError("Bad frame magic")
+    if version != PROTOCOL_VERSION:
+        raise FrameProtocolError(f"Unsupported frame version {version}")
+    if audio_format not in AUDIO_FORMATS:
+        raise FrameProtocolError(f"Unknown audio format {audio_format}")
+    if HEADER.size + image_len + audio_len + interaction_len != len(view):
+        raise FrameProtocolError("Section lengths do not match frame size")
+    if not math.isfinite(timestamp_ms) or not 0 <= timestamp_ms < MAX_TIMESTAMP_MS:
+        raise FrameProtocolError(f"Frame timestamp {timestamp_ms} out of range")
+
+    offset = HEADER.size
+    image = None
+    if image_len:
+        image = np.frombuffer(view, np.uint8, count=image_len, offset=offset)
+    offset += image_len
+
+    pcm = None
+    audio_bytes = None
+    if audio_len and audio_format != AUDIO_NONE:
+        if audio_format == AUDIO_PCM_F32LE:
+            pcm = np.frombuffer(view, "<f4", count=audio_len // 4, offset=offset)
+        elif audio_format == AUDIO_PCM_S16LE:
+            # Scaling to float is the one unavoidable copy
+            pcm = np.frombuffer(view, "<i2", count=audio_len // 2, offset=offset) \
+                .astype(np.float32) / 32768.0
+        else:
+            audio_bytes = np.frombuffer(view, np.uint8, count=audio_len, offset=offset)
+        if pcm is not None and not sample_rate:
+            raise FrameProtocolError("PCM audio without a sample rate")
+        if sample_rate and not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise FrameProtocolError(
+                f"Sample rate {sample_rate} Hz outside {MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} Hz"
+            )
+    offset += audio_len
+
+    interaction_data = {}
+    if interaction_len:
+        try:
+            interaction_data = json.loads(bytes(view[offset:offset + interaction_len]))
+        except ValueError as e:
+            # JSONDecodeError and UnicodeDecodeError
+            raise FrameProtocolError(f"Malformed interaction JSON: {e}") from None
+        if not isinstance(interaction_data, dict):
+            raise FrameProtocolError("Interaction data must be a JSON object")
+
+    return EmotionFrame(
+        interaction_data=interaction_data,
+        timestamp=datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc),
+        image=image,
+        audio_bytes=audio_bytes,
+        pcm=pcm,
+        sample_rate=sample_rate or None
+    )
+
+def encode_frame(interaction_data: Dict, timestamp: datetime, image: bytes = b"",
+                 audio: bytes = b"", audio_format: int = AUDIO_NONE, sample_rate: int = 0) -> bytes:
+    """Encode a binary frame (mirror of the client encoder, for tools and tests)"""
+    interaction = json.dumps(interaction_data).encode("utf-8")
+    header = HEADER.pack(
+        MAGIC, PROTOCOL_VERSION, audio_format, timestamp.timestamp() * 1000.0,
+        sample_rate, len(image), len(audio), len(interaction)
+    )
+    return b"".join([header, image, audio, interaction])
@@ -0,0 +1,49 @@
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+class LatestFrameQueue:
+    """Bounded single-consumer queue where new frames push out stale ones.
+
+    put() never blocks: when the queue is full the oldest frame is dropped
+    and counted, so the consumer always works on the newest input and the
+    backlog (and with it the result latency) stays bounded. on_drop is
+    called with each dropped frame, oldest first.
+    """
+
+    def __init__(self, maxsize: int = 1, on_drop: Optional[Callable[[Any], None]] = None):
+        self.maxsize = max(1, maxsize)
+        self.on_drop = on_drop
+        self._frames: Deque[Any] = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame: Any):
+        """Enqueue a frame, dropping the oldest one if the queue is full"""
+        self.received += 1
+        if len(self._frames) >= self.maxsize:
+            dropped = self._frames.popleft()
+            self.dropped += 1
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+        self._frames.append(frame)
+        self._ready.set()
+
+    def close(self):
+        """Wake the consumer; get() returns None from now on and pending frames are discarded"""
+        self._closed = True
+        self._ready.set()
+
+    async def get(self) -> Optional[Any]:
+        """Next frame, or None once the queue is closed"""
+        while not self._closed:
+            if self._frames:
+                return self._frames.popleft()
+            self._ready.clear()
+            await self._ready.wait()
+        return None
+
+    def __len__(self) -> int:
+        return len(self._frames)
@@ -0,0 +1,66 @@
+"""Per-worker memory report for a gunicorn master and its workers (Linux).
+
+    python -m app.utils.memory_report <master pid>
+
+RSS counts shared pages in full for every process; PSS splits them between
+the processes that share them, so the PSS total is what the box actually
+pays. Run it once with GUNICORN_PRELOAD=0 and once with the default preload
+to see how much of each worker's RSS the preloaded models account for.
+"""
+import os
+import sys
+from typing import Dict, List
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """Memory counters of one process in kB, from /proc/<pid>/smaps_rollup"""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in SMAPS_FIELDS:
+                memory[key] = int(value.split()[0])
+    return memory
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process"""
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children.extend(int(child) for child in f.read().split())
+    return sorted(children)
+
+def memory_report(master_pid: int) -> List[Dict]:
+    """Memory of the master and each worker"""
+    rows = [{'pid': master_pid, 'role': 'master', **process_memory(master_pid)}]
+    for pid in child_pids(master_pid):
+        rows.append({'pid': pid, 'role': 'worker', **process_memory(pid)})
+    return rows
+
+def _shared(row: Dict) -> int:
+    return row.get('Shared_Clean', 0) + row.get('Shared_Dirty', 0)
+
+def _private(row: Dict) -> int:
+    return row.get('Private_Clean', 0) + row.get('Private_Dirty', 0)
+
+def format_report(rows: List[Dict]) -> str:
+    """Render a report as a table in MB"""
+    lines = [f"{'pid':>8} {'role':<7} {'rss':>9} {'pss':>9} {'shared':>9} {'private':>9}"]
+    for row in rows:
+        lines.append(
+            f"{row['pid']:>8} {row['role']:<7} {row.get('Rss', 0) / 1024:>8.1f}M "
+            f"{row.get('Pss', 0) / 1024:>8.1f}M {_shared(row) / 1024:>8.1f}M {_private(row) / 1024:>8.1f}M"
+        )
+    workers = [row for row in rows if row['role'] == 'worker']
+    if workers:
+        lines.append(
+            f"{len(workers)} workers: mean rss {sum(r.get('Rss', 0) for r in workers) / len(workers) / 1024:.1f}M, "
+            f"total pss {sum(r.get('Pss', 0) for r in rows) / 1024:.1f}M"
+        )
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m app.utils.memory_report <master pid>")
+    print(format_report(memory_report(int(sys.argv[1]))))
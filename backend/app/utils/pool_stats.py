@@ -0,0 +1,75 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+class PoolStats:
+    """Checkout counters and wait times for one engine's connection pool.
+
+    Counts come from pool events. Wait times are measured by timed_checkout()
+    around the first connection() call of each session scope, so they cover
+    waiting for a free connection plus opening a new one when the pool grows.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.peak_checked_out = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+
+    @property
+    def pool(self):
+        # Read on every use: engine.dispose() (e.g. in gunicorn's master) swaps in a new pool
+        return self.engine.pool
+
+    @contextmanager
+    def timed_checkout(self):
+        """Time a connection checkout; pool timeouts are counted and re-raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - started) * 1000.0
+            self.waits += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def stats(self) -> Dict:
+        """Pool occupancy, checkout totals and checkout wait times"""
+        stats = {
+            'pool': type(self.pool).__name__,
+            'connections_opened': self.connections_opened,
+            'checkouts': self.checkouts,
+            'peak_checked_out': self.peak_checked_out,
+            'timeouts': self.timeouts,
+            'avg_wait_ms': round(self.total_wait_ms / self.waits, 3) if self.waits else 0.0,
+            'max_wait_ms': round(self.max_wait_ms, 3)
+        }
+        if isinstance(self.pool, QueuePool):
+            stats.update({
+                'size': self.pool.size(),
+                'checked_out': self.pool.checkedout(),
+                'overflow': self.pool.overflow()
+            })
+        return stats
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connections_opened += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+        if isinstance(self.pool, QueuePool):
+            self.peak_checked_out = max(self.peak_checked_out, self.pool.checkedout())
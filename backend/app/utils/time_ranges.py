@@ -0,0 +1,59 @@
+"""Index-friendly time range predicates.
+
+Wrapping a column in a function, as in func.date(EmotionLog.timestamp) >= day
+or extract('year', ...) == year, hides it from its index and forces a full
+scan. These helpers turn calendar ranges into half-open comparisons on the
+bare column, [start 00:00, day after end 00:00), which select the same rows
+and can use the (user_id, timestamp) style composite indexes.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Tuple
+
+from sqlalchemy import DateTime, and_, func
+
+# SQLite has no date_trunc; strftime to the same text format SQLAlchemy stores datetimes in
+SQLITE_TRUNCATE_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00.000000',
+    'day': '%Y-%m-%d 00:00:00.000000',
+    'month': '%Y-%m-01 00:00:00.000000',
+    'year': '%Y-01-01 00:00:00.000000'
+}
+
+def day_bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    """Half-open datetime bounds covering the whole days start..end inclusive"""
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+def year_bounds(year: int) -> Tuple[datetime, datetime]:
+    """Half-open datetime bounds of a calendar year"""
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+def between(column, lower: datetime, upper: datetime):
+    """lower <= column < upper"""
+    return and_(column >= lower, column < upper)
+
+def in_days(column, start: date, end: date):
+    """column falls on any day from start to end inclusive"""
+    return between(column, *day_bounds(start, end))
+
+def in_year(column, year: int):
+    """column falls in the given calendar year"""
+    return between(column, *year_bounds(year))
+
+def truncate(column, unit: str, dialect_name: str):
+    """SQL expression for the start of the hour, day, month or year containing column"""
+    if dialect_name == 'postgresql':
+        return func.date_trunc(unit, column, type_=DateTime)
+    if dialect_name == 'sqlite':
+        return func.strftime(SQLITE_TRUNCATE_FORMATS[unit], column, type_=DateTime)
+    raise ValueError(f"No date truncation for {dialect_name} databases")
+
+def floor_datetime(value: datetime, unit: str) -> datetime:
+    """Python counterpart of truncate()"""
+    if unit == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    value = datetime.combine(value.date(), time.min)
+    if unit == 'month':
+        return value.replace(day=1)
+    if unit == 'year':
+        return value.replace(month=1, day=1)
+    return value
@@ -0,0 +1,48 @@
+# gunicorn.conf.py
+# Multi-worker launch: gunicorn -c gunicorn.conf.py app.main:app
+#
+# With preload_app the app is imported once in the master and the emotion
+# models are loaded and warmed up there before any worker is forked, so all
+# workers share the model memory copy-on-write. Compare per-worker memory
+# with GUNICORN_PRELOAD=0 using: python -m app.utils.memory_report <master pid>
+#
+# The schema migration runs once in the master (on_starting), before any
+# worker forks, instead of in every process that imports the app.
+import gc
+import os
+
+# Read by app.config.settings, which is first imported after this file
+os.environ.setdefault("MIGRATE_ON_STARTUP", "false")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") not in ("0", "false", "False")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+def on_starting(server):
+    """Set up the schema once, before the first workers fork"""
+    from app.models.database import engine
+    from app.services.schema_migration import migrate
+
+    migrate()
+    engine.dispose()
+
+def when_ready(server):
+    """Load shared state in the master, just before the first workers fork"""
+    if not preload_app:
+        return
+
+    from app.models.database import engine
+    from app.models.emotion_models import emotion_models
+
+    emotion_models.load_and_warmup()
+    # Connections opened while creating tables must not be shared by workers
+    engine.dispose()
+
+    # Move everything allocated so far out of the collector's reach; otherwise
+    # the first GC pass in each worker writes to every object header and
+    # un-shares the pages the models live on
+    gc.collect()
+    gc.freeze()
+    server.log.info("Emotion models preloaded in master (pid %s)", os.getpid())
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+# Settings and engines are created on import: point them at a scratch SQLite file first
+_db_dir = tempfile.mkdtemp(prefix="studybuddy-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import pytest
+
+@pytest.fixture
+def db_schema():
+    """Fresh tables and indexes for each test"""
+    from app.models.database import Base, create_missing_indexes, engine
+    import app.services.activity_rollups  # noqa: F401 (registers the session rollup hook)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes(engine)
+    yield engine
+    engine.dispose()
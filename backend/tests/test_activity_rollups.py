@@ -0,0 +1,232 @@
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.models.database import (
+    AsyncSessionLocal, EmotionLog, EmotionRollup, EmotionSegment, LearningSession, SessionRollup,
+    User, async_engine, session_scope
+)
+from app.services import activity_rollups
+from app.services.emotion_log_writer import EmotionLogWriter
+from app.utils.time_ranges import floor_datetime
+
+START = datetime(2026, 3, 1, 9, 0)
+
+def _add_users(db):
+    db.add_all([User(id=1, email="a@example.com", username="a"), User(id=2, email="b@example.com", username="b")])
+    db.commit()
+
+def _write_emotions(count: int):
+    """Frames for two users over a few hours and days, through the write-behind writer"""
+    writer = EmotionLogWriter()
+    emotions = ['neutral', 'engaged', 'confused']
+    for i in range(count):
+        writer.add({
+            'user_id': 1 + i % 2, 'session_id': None,
+            'timestamp': START + timedelta(minutes=37 * i),
+            'facial_emotions': {'happy': 0.9, 'neutral': 0.1} if i % 3 else {'sad': 0.8, 'neutral': 0.2},
+            'voice_emotions': None, 'interaction_score': 0.5,
+            'primary_emotion': emotions[i % 3], 'confidence_score': 0.1 * (i % 10),
+            'engagement_level': 0.05 * (i % 20)
+        })
+    while writer._buffer:
+        assert asyncio.run(writer.flush())
+
+def _raw_emotion_rollups(db):
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    for log in db.query(EmotionLog):
+        for period in activity_rollups.ROLLUP_PERIODS:
+            total = totals[(log.user_id, period, floor_datetime(log.timestamp, period), log.primary_emotion)]
+            total[0] += 1
+            total[1] += log.confidence_score
+            total[2] += log.engagement_level
+    return {key: pytest.approx(value) for key, value in totals.items()}
+
+def _emotion_rollups(db):
+    return {
+        (r.user_id, r.period, r.bucket_start, r.primary_emotion): [r.frames, r.confidence_sum, r.engagement_sum]
+        for r in db.query(EmotionRollup)
+    }
+
+def _raw_session_rollups(db):
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for s in db.query(LearningSession):
+        for period in activity_rollups.ROLLUP_PERIODS:
+            total = totals[(s.user_id, period, floor_datetime(s.start_time, period))]
+            total[0] += 1
+            total[1] += s.duration_minutes or 0.0
+            total[2] += s.average_engagement or 0.0
+            total[3] += s.completion_percentage or 0.0
+    return {key: pytest.approx(value) for key, value in totals.items()}
+
+def _session_rollups(db):
+    return {
+        (r.user_id, r.period, r.bucket_start): [r.sessions, r.study_minutes, r.engagement_sum, r.completion_sum]
+        for r in db.query(SessionRollup)
+    }
+
+def _add_sessions(db, days: int):
+    for i in range(days):
+        db.add(LearningSession(
+            user_id=1, start_time=datetime(2025, 1, 1, 10) + timedelta(days=i, hours=i % 5),
+            duration_minutes=20.0 + i % 40, average_engagement=0.3 + 0.01 * (i % 50),
+            completion_percentage=float(i % 100)
+        ))
+    db.commit()
+
+def test_writer_rollups_match_raw_rows_and_rebuild(db_schema):
+    with session_scope() as db:
+        _add_users(db)
+    _write_emotions(120)
+    with session_scope() as db:
+        raw = _raw_emotion_rollups(db)
+        assert _emotion_rollups(db) == raw
+    activity_rollups.rebuild()
+    with session_scope() as db:
+        assert _emotion_rollups(db) == raw
+
+def test_session_hook_rollups_match_raw_rows(db_schema):
+    with session_scope() as db:
+        _add_users(db)
+        _add_sessions(db, 30)
+        moved = db.query(LearningSession).order_by(LearningSession.id).first()
+        moved.start_time += timedelta(days=3, hours=2)
+        moved.duration_minutes = 90.0
+        db.delete(db.query(LearningSession).order_by(LearningSession.id.desc()).first())
+        db.commit()
+        assert _session_rollups(db) == _raw_session_rollups(db)
+
+def test_rescoring_refreshes_emotion_rollups_and_segments(db_schema):
+    from app.services.emotion_compaction import emotion_compaction
+    from app.services.emotion_rescoring import EmotionRescoringJob
+
+    with session_scope() as db:
+        _add_users(db)
+    _write_emotions(60)
+    emotion_compaction.run()
+    with session_scope() as db:
+        before = db.query(EmotionLog.primary_emotion).all()
+        assert db.query(EmotionSegment).count()
+
+    EmotionRescoringJob("test", chunk_size=25, workers=1).run()
+    with session_scope() as db:
+        assert db.query(EmotionLog.primary_emotion).all() != before
+        assert _emotion_rollups(db) == _raw_emotion_rollups(db)
+        assert db.query(EmotionSegment).count() == 0
+
+def test_resumed_rescoring_refolds_rows_of_the_interrupted_run(db_schema, monkeypatch):
+    from app.models.database import RescoringCheckpoint
+    from app.services import emotion_rescoring
+
+    with session_scope() as db:
+        _add_users(db)
+    _write_emotions(60)
+    with session_scope() as db:
+        first_id = db.query(EmotionLog.id).order_by(EmotionLog.id).first()[0]
+        # A pass interrupted after its first 30 rows
+        db.add(RescoringCheckpoint(job_name="test", last_id=first_id + 29, first_id=first_id, rows_done=30))
+        db.commit()
+
+    refolded = []
+    monkeypatch.setattr(emotion_rescoring.emotion_compaction, 'refold_from', refolded.append)
+    assert emotion_rescoring.EmotionRescoringJob("test", chunk_size=25, workers=1).run() == 30
+    assert refolded == [first_id]
+
+def test_rescoring_cli_options_override_fusion_settings(db_schema, monkeypatch):
+    from app.services import emotion_rescoring
+
+    jobs = []
+    monkeypatch.setattr(emotion_rescoring.EmotionRescoringJob, 'run', lambda job: jobs.append(job))
+    monkeypatch.setattr('sys.argv', ['rescore', '--weight', 'voice=0.1', '--threshold', 'bored=0.9'])
+    emotion_rescoring.main()
+    assert jobs[0].weights == {'facial': 0.4, 'voice': 0.1, 'interaction': 0.25}
+    assert jobs[0].thresholds['bored'] == 0.9
+
+    monkeypatch.setattr('sys.argv', ['rescore', '--weight', 'gaze=0.1'])
+    with pytest.raises(SystemExit):
+        emotion_rescoring.main()
+
+def test_refresh_moves_frames_between_emotions(db_schema):
+    with session_scope() as db:
+        _add_users(db)
+    _write_emotions(40)
+    with session_scope() as db:
+        keys = {(log.user_id, log.timestamp) for log in db.query(EmotionLog).filter(EmotionLog.user_id == 1)}
+        db.execute(update(EmotionLog).where(EmotionLog.user_id == 1).values(primary_emotion='bored'))
+        activity_rollups.refresh_emotion_buckets(db.connection(), keys)
+        db.commit()
+        assert _emotion_rollups(db) == _raw_emotion_rollups(db)
+
+def test_migration_rebuilds_empty_rollups_once(db_schema):
+    from app.services.schema_migration import migrate
+
+    assert not migrate()
+    with session_scope() as db:
+        _add_users(db)
+    _write_emotions(30)
+    with session_scope() as db:
+        raw = _raw_emotion_rollups(db)
+        db.query(EmotionRollup).delete()
+        db.commit()
+    assert migrate()
+    assert not migrate()
+    with session_scope() as db:
+        assert _emotion_rollups(db) == raw
+
+def _run_async(call):
+    async def run():
+        try:
+            async with AsyncSessionLocal() as db:
+                return await call(db)
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run())
+
+def _raw_totals(db, start: date, end: date):
+    sessions = [s for s in db.query(LearningSession).filter(LearningSession.user_id == 1)
+                if start <= s.start_time.date() <= end]
+    return {
+        'sessions': len(sessions),
+        'study_minutes': sum(s.duration_minutes for s in sessions),
+        'engagement_sum': sum(s.average_engagement for s in sessions)
+    }
+
+def test_report_breakdowns_match_raw_sessions(db_schema):
+    from app.services.report_service import report_service
+
+    with session_scope() as db:
+        _add_users(db)
+        _add_sessions(db, 500)
+
+    monthly = _run_async(lambda db: report_service._calculate_monthly_breakdown(
+        1, db, date(2025, 1, 1), date(2025, 12, 31)))
+    weekly = _run_async(lambda db: report_service._calculate_weekly_breakdown(
+        1, db, date(2026, 2, 1), date(2026, 2, 28)))
+    yoy = _run_async(lambda db: report_service._calculate_yoy_comparison(1, db, 2026))
+
+    with session_scope() as db:
+        assert len(monthly) == 12
+        for month in range(1, 13):
+            end = date(2025 + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+            raw = _raw_totals(db, date(2025, month, 1), end)
+            entry = monthly[date(2025, month, 1).strftime('%B')]
+            assert entry['sessions'] == raw['sessions']
+            assert entry['study_hours'] == pytest.approx(raw['study_minutes'] / 60)
+            assert entry['avg_engagement'] == pytest.approx(raw['engagement_sum'] / max(raw['sessions'], 1))
+
+        for week in range(4):
+            start = date(2026, 2, 1) + timedelta(days=7 * week)
+            raw = _raw_totals(db, start, start + timedelta(days=6))
+            entry = weekly[f"week_{week + 1}"]
+            assert entry['sessions'] == raw['sessions']
+            assert entry['study_time'] == pytest.approx(raw['study_minutes'])
+
+        current = _raw_totals(db, date(2026, 1, 1), date(2026, 12, 31))
+        previous = _raw_totals(db, date(2025, 1, 1), date(2025, 12, 31))
+        assert yoy['sessions_change'] == current['sessions'] - previous['sessions']
+        assert yoy['study_time_change'] == pytest.approx(current['study_minutes'] - previous['study_minutes'])
+        assert yoy['engagement_change'] == pytest.approx(
+            current['engagement_sum'] / current['sessions'] - previous['engagement_sum'] / previous['sessions'])
@@ -0,0 +1,20 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.utils.audio_io import AudioDecodeError, _resample_filter, resample
+
+@pytest.mark.parametrize('rate', [8000, 11025, 16000, 24000, 32000, 44100, 48000, 88200, 96000])
+def test_standard_rates_resample_to_the_model_rate(rate):
+    samples = np.zeros(rate // 10, dtype=np.float32)
+    assert len(resample(samples, rate, 22050)) == pytest.approx(2205, abs=1)
+
+@pytest.mark.parametrize('rate', [48001, 1_000_003, 0, -16000])
+def test_rates_needing_a_large_filter_are_rejected_without_designing_it(rate):
+    _resample_filter.cache_clear()
+    started = time.perf_counter()
+    with pytest.raises(AudioDecodeError):
+        resample(np.zeros(4800, dtype=np.float32), rate, 22050)
+    assert time.perf_counter() - started < 0.05
+    assert _resample_filter.cache_info().currsize == 0
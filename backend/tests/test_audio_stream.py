@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from app.models.audio_features import SKIPPED_FEATURE_FILL, VOICE_FEATURE_LAYOUT, AudioFeatureExtractor
+from app.models.audio_stream import StreamingAudioFeatures
+
+SR = 22050
+
+def _speech_like(seconds: float) -> np.ndarray:
+    """Detuned harmonic syllables separated by near silence"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SR * seconds)) / SR
+    f0 = 180.0 * 2 ** (np.floor(t * 3) % 4 / 12 + 0.3 / 12)
+    phase = 2 * np.pi * np.cumsum(f0) / SR
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 10))
+    envelope = np.clip(np.sin(np.pi * (t * 3 % 1)) * 1.6 - 0.3, 0.0, 1.0)
+    return (0.3 * voiced * envelope + 1e-4 * rng.standard_normal(len(t))).astype(np.float32)
+
+def _blocks(vector: np.ndarray):
+    offset = 0
+    for name, size in VOICE_FEATURE_LAYOUT:
+        yield name, vector[0, offset:offset + size]
+        offset += size
+
+@pytest.mark.parametrize('profile', ['full', 'fast'])
+def test_streaming_features_match_the_extractor_on_the_window(profile):
+    stream = StreamingAudioFeatures(sr=SR, window_seconds=3.0, profile=profile)
+    # A length the STFT hop divides, so the stream has analysed every sample it was given
+    span = (stream.window_frames - 1) * stream.hop_length + stream.n_fft
+    audio = _speech_like(6.0)[:span * 2 - stream.n_fft]
+    for start in range(0, len(audio), 4410):
+        vector = stream.push(audio[start:start + 4410])
+
+    expected = AudioFeatureExtractor(profile).extract(audio[-span:], SR)
+    for (name, streamed), (_, batch) in zip(_blocks(vector), _blocks(expected)):
+        if name == 'tonnetz':
+            assert np.all(streamed == SKIPPED_FEATURE_FILL['tonnetz'])
+            continue
+        # Only the extractor's centre-padded edge frames differ
+        scale = max(np.abs(batch).max(), 1e-6)
+        assert np.abs(streamed - batch).max() <= 0.05 * scale, name
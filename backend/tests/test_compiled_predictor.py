@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from app.models.compiled_predictor import CompiledPredictor, compile_estimator
+
+N_FEATURES = 10
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0.0, 100.0, (400, N_FEATURES))
+    y = np.where(X[:, 0] + 0.5 * X[:, 3] + rng.normal(0.0, 10.0, 400) > 75.0, 'engaged', 'distracted')
+    probe = rng.uniform(-10.0, 110.0, (1000, N_FEATURES))
+    return X, y, probe
+
+def _engaged_proba(estimator, X):
+    return estimator.predict_proba(X)[:, list(estimator.classes_).index('engaged')]
+
+def test_random_forest_matches_predict_proba(data):
+    X, y, probe = data
+    forest = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+    assert np.allclose(compile_estimator(forest).predict(probe), _engaged_proba(forest, probe))
+
+def test_logistic_regression_with_scaler_matches_predict_proba(data):
+    X, y, probe = data
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression().fit(scaler.transform(X), y)
+    compiled = compile_estimator({'model': model, 'scaler': scaler})
+    assert np.allclose(compiled.predict(probe), _engaged_proba(model, scaler.transform(probe)))
+
+def test_linear_regression_matches_predict(data):
+    X, _, probe = data
+    model = LinearRegression().fit(X, X[:, 1] * 0.3 - X[:, 2])
+    assert np.allclose(compile_estimator(model).predict(probe), model.predict(probe))
+
+def test_boosted_trees_are_not_compiled(data):
+    X, _, _ = data
+    # Boosting sums scaled trees; only plain tree ensembles compile
+    model = GradientBoostingRegressor(n_estimators=5, random_state=0).fit(X, X[:, 0])
+    with pytest.raises(TypeError):
+        compile_estimator(model)
+
+def test_saved_arrays_round_trip(data, tmp_path):
+    X, y, probe = data
+    forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    compiled = compile_estimator(forest)
+    path = str(tmp_path / 'model.compiled.npz')
+    compiled.save(path)
+    assert np.array_equal(CompiledPredictor.load(path).predict(probe), compiled.predict(probe))
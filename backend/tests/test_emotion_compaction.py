@@ -0,0 +1,104 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from app.models.database import AsyncSessionLocal, EmotionLog, EmotionSegment, async_engine, session_scope
+from app.services.emotion_compaction import EmotionCompactionJob, load_emotion_spans
+
+def _rows(first_id, count, start):
+    emotions = ['engaged', 'confused', 'bored']
+    return [
+        {
+            'id': first_id + i, 'user_id': 1, 'session_id': 1,
+            'timestamp': start + timedelta(seconds=first_id + i),
+            'primary_emotion': emotions[(first_id + i) // 40 % 3],
+            'confidence_score': 0.5, 'engagement_level': 0.5
+        }
+        for i in range(count)
+    ]
+
+def _commit(rows):
+    with session_scope() as db:
+        db.execute(insert(EmotionLog.__table__), rows)
+        db.commit()
+
+def _spans(lower, upper):
+    async def load():
+        async with AsyncSessionLocal() as db:
+            spans = await load_emotion_spans(db, 1, lower, upper)
+        await async_engine.dispose()
+        return spans
+    return asyncio.run(load())
+
+def test_batches_committed_out_of_order_are_not_skipped(db_schema):
+    start = datetime(2026, 1, 5, 9)
+    first, second, third = _rows(1, 100, start), _rows(101, 100, start), _rows(201, 100, start)
+    job = EmotionCompactionJob(chunk_size=1000, gap_timeout=3600)
+
+    # Ids 101-200 are still in flight when the later batch commits
+    _commit(first)
+    _commit(third)
+    assert job.run() == 100
+
+    _commit(second)
+    assert job.run() == 200
+
+    spans = _spans(start, start + timedelta(hours=1))
+    folded = Counter()
+    for span in spans:
+        folded[span.primary_emotion] += span.frames
+    assert folded == Counter(row['primary_emotion'] for row in first + second + third)
+    assert sum(span.frames for span in spans) == 300
+
+def test_gap_is_skipped_after_timeout(db_schema):
+    start = datetime(2026, 1, 5, 9)
+    job = EmotionCompactionJob(chunk_size=1000, gap_timeout=0)
+
+    # Ids 11-20 were rolled back and never appear
+    _commit(_rows(1, 10, start))
+    _commit(_rows(21, 10, start))
+    assert job.run() == 20
+
+def test_segment_crossing_the_lower_bound_is_kept(db_schema):
+    start = datetime(2026, 1, 5, 9)
+    job = EmotionCompactionJob(chunk_size=1000, gap_timeout=0)
+    _commit(_rows(1, 119, start))
+    assert job.run() == 119
+
+    # Ids 1-39 fold into one segment running from 09:00:01 to 09:00:39
+    lower = start + timedelta(seconds=20)
+    spans = _spans(lower, start + timedelta(seconds=60))
+    assert spans[0].timestamp < lower <= spans[0].end
+    assert [(span.primary_emotion, span.frames) for span in spans] == [('engaged', 39), ('confused', 40)]
+
+def _segments():
+    with session_scope() as db:
+        return sorted(
+            (s.user_id, s.session_id, s.primary_emotion, s.start_time, s.end_time, s.frame_count)
+            for s in db.query(EmotionSegment)
+        )
+
+def test_refold_replaces_only_segments_holding_rescored_rows(db_schema):
+    start = datetime(2026, 1, 5, 9)
+    rows = _rows(1, 240, start)
+    for row in rows:
+        row['user_id'] = row['session_id'] = 1 + row['id'] % 2
+    _commit(rows)
+    job = EmotionCompactionJob(chunk_size=1000, gap_timeout=0)
+    job.run()
+
+    # Rescoring relabels rows from id 150 on; the segment holding ids 120-149 starts before them
+    with session_scope() as db:
+        db.execute(update(EmotionLog).where(EmotionLog.id >= 150).values(primary_emotion='bored'))
+        db.commit()
+    assert job.refold_from(150) == 119
+    kept = _segments()
+    assert kept and all(segment[4] < start + timedelta(seconds=120) for segment in kept)
+    job.run()
+    refolded = _segments()
+
+    job.reset()
+    job.run()
+    assert refolded == _segments()
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, MetaData, String, Table, create_engine, select
+
+from app.models.database import Base, EmotionLog, session_scope
+from app.services.emotion_log_conversion import convert, legacy_columns, require_converted
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+def _legacy_table(engine):
+    """emotion_logs as created before packed scores and emotion codes"""
+    Base.metadata.drop_all(bind=engine, tables=[EmotionLog.__table__])
+    legacy = Table(
+        "emotion_logs", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer), Column("session_id", Integer), Column("timestamp", DateTime),
+        Column("facial_emotions", JSON), Column("voice_emotions", JSON), Column("interaction_score", Float),
+        Column("primary_emotion", String), Column("confidence_score", Float), Column("engagement_level", Float),
+        Column("model_version", String)
+    )
+    legacy.create(bind=engine)
+    return legacy
+
+def test_legacy_rows_read_and_convert(db_schema):
+    legacy = _legacy_table(db_schema)
+    with db_schema.begin() as conn:
+        conn.execute(legacy.insert(), [
+            {"user_id": 1, "timestamp": datetime(2026, 1, 1), "facial_emotions": {"happy": 0.75, "sad": 0.25},
+             "voice_emotions": None, "primary_emotion": "engaged"},
+            {"user_id": 1, "timestamp": datetime(2026, 1, 2), "facial_emotions": None,
+             "voice_emotions": {"calm": 0.5}, "primary_emotion": "confused"}
+        ])
+    # A row written by the new code before the table was converted
+    with session_scope() as db:
+        db.add(EmotionLog(user_id=1, timestamp=datetime(2026, 1, 3), facial_emotions={"angry": 1.0},
+                          primary_emotion="bored"))
+        db.commit()
+
+    def read():
+        with session_scope() as db:
+            logs = db.execute(select(EmotionLog).order_by(EmotionLog.id)).scalars().all()
+            return [(log.primary_emotion, log.facial_emotions, log.voice_emotions) for log in logs]
+
+    before = read()
+    assert [emotion for emotion, _, _ in before] == ["engaged", "confused", "bored"]
+    assert before[0][1] == {"happy": 0.75, "sad": 0.25}
+
+    assert sorted(legacy_columns()) == ["facial_emotions", "primary_emotion", "voice_emotions"]
+    convert(chunk_size=1)
+    assert legacy_columns() == []
+
+    after = read()
+    assert [emotion for emotion, _, _ in after] == ["engaged", "confused", "bored"]
+    assert after[0][1]["happy"] == 0.75 and after[0][1]["neutral"] == 0.0
+    assert after[1][2]["calm"] == 0.5
+    assert after[2][1]["angry"] == 1.0
+
+def test_legacy_columns_refuse_startup_on_postgres():
+    if not POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(POSTGRES_URL)
+    legacy = _legacy_table(engine)
+    try:
+        with pytest.raises(RuntimeError, match="emotion_log_conversion"):
+            require_converted(engine)
+    finally:
+        legacy.drop(bind=engine)
+        engine.dispose()
+
+def test_legacy_columns_only_warn_on_sqlite(db_schema, caplog):
+    _legacy_table(db_schema)
+    require_converted(db_schema)
+    assert "emotion_log_conversion" in caplog.text
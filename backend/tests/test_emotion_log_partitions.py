@@ -0,0 +1,88 @@
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from app.models.database import EmotionLog
+from app.services import emotion_log_partitions
+from app.services.emotion_log_partitions import (
+    DEFAULT_PARTITION, EmotionLogPartitionManager, parse_partition_name, partition_name
+)
+
+# Partition DDL needs PostgreSQL, e.g. TEST_POSTGRES_URL=postgresql+psycopg2://postgres@localhost/test
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+def test_partition_names_round_trip():
+    assert partition_name(date(2026, 10, 1), 'month') == 'emotion_logs_p2026_10'
+    assert parse_partition_name('emotion_logs_p2026w42') == (date(2026, 10, 12), 'week')
+    assert parse_partition_name(DEFAULT_PARTITION) is None
+
+def _drop_emotion_log_tables(engine):
+    """The parent with its partitions, plus partitions detached by earlier runs"""
+    with engine.begin() as conn:
+        names = conn.execute(text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename LIKE 'emotion_logs%'"
+        )).scalars().all()
+        for name in names:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{name}" CASCADE'))
+
+@pytest.fixture
+def pg_engine(monkeypatch):
+    if not POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(POSTGRES_URL)
+    dialect = postgresql.dialect()
+    columns = ", ".join(
+        f'"{column.name}" {"BIGSERIAL" if column.name == "id" else column.type.compile(dialect=dialect)}'
+        for column in EmotionLog.__table__.columns
+    )
+    _drop_emotion_log_tables(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f'CREATE TABLE emotion_logs ({columns}, PRIMARY KEY (id, "timestamp")) PARTITION BY RANGE ("timestamp")'
+        ))
+    monkeypatch.setattr(emotion_log_partitions, "engine", engine)
+    yield engine
+    _drop_emotion_log_tables(engine)
+    engine.dispose()
+
+def _insert(engine, *timestamps):
+    with engine.begin() as conn:
+        for timestamp in timestamps:
+            conn.execute(text('INSERT INTO emotion_logs (user_id, "timestamp") VALUES (1, :t)'), {"t": timestamp})
+
+def _count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f'SELECT count(*) FROM "{table}"')).scalar()
+
+def test_rows_in_default_move_into_their_new_partition(pg_engine):
+    manager = EmotionLogPartitionManager(interval="month", ahead=1, retention=2)
+    manager.run_maintenance(date(2026, 8, 3))
+    assert set(manager.partitions()) == {DEFAULT_PARTITION, 'emotion_logs_p2026_08', 'emotion_logs_p2026_09'}
+
+    # Maintenance was down: November rows landed in the DEFAULT partition
+    _insert(pg_engine, datetime(2026, 9, 30), datetime(2026, 11, 2), datetime(2026, 11, 20, 8))
+    assert _count(pg_engine, DEFAULT_PARTITION) == 2
+
+    result = manager.run_maintenance(date(2026, 11, 5))
+    assert result["created"] == ['emotion_logs_p2026_11', 'emotion_logs_p2026_12']
+    assert result["retired"] == ['emotion_logs_p2026_08']
+    assert result["failed"] == []
+    assert _count(pg_engine, DEFAULT_PARTITION) == 0
+    assert _count(pg_engine, 'emotion_logs_p2026_11') == 2
+    assert _count(pg_engine, 'emotion_logs') == 3
+
+def test_one_failing_partition_does_not_block_the_others(pg_engine):
+    manager = EmotionLogPartitionManager(interval="month", ahead=2, retention=1)
+    manager.run_maintenance(date(2026, 9, 1))
+    with pg_engine.begin() as conn:
+        conn.execute(text('DROP TABLE emotion_logs_p2026_11'))
+        # A stray table with the name of a partition still to be created
+        conn.execute(text('CREATE TABLE emotion_logs_p2026_12 (id integer)'))
+
+    result = manager.run_maintenance(date(2026, 10, 1))
+    assert result["created"] == ['emotion_logs_p2026_11']
+    assert result["failed"] == ['emotion_logs_p2026_12']
+    assert result["retired"] == ['emotion_logs_p2026_09']
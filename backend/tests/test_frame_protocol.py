@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.utils.frame_protocol import (
+    AUDIO_PCM_S16LE, HEADER, FrameProtocolError, decode_frame, encode_frame
+)
+
+TIMESTAMP = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+def _with_interaction(payload: bytes) -> bytes:
+    """A valid frame whose interaction section is replaced by payload"""
+    frame = encode_frame({}, TIMESTAMP)
+    fields = list(HEADER.unpack_from(frame))
+    fields[-1] = len(payload)
+    return HEADER.pack(*fields) + payload
+
+def test_round_trip():
+    pcm = (np.arange(160, dtype=np.int16) * 100).tobytes()
+    frame = decode_frame(encode_frame({'idle_time_seconds': 4}, TIMESTAMP, image=b'\xff\xd8jpeg',
+                                      audio=pcm, audio_format=AUDIO_PCM_S16LE, sample_rate=16000))
+    assert frame.interaction_data == {'idle_time_seconds': 4}
+    assert frame.timestamp == TIMESTAMP
+    assert bytes(frame.image) == b'\xff\xd8jpeg'
+    assert frame.sample_rate == 16000 and np.allclose(frame.pcm * 32768.0, np.arange(160) * 100)
+
+@pytest.mark.parametrize('payload', [b'{"idle_time_seconds": ', b'\xff\xfe', b'[1, 2]', b'"text"', b'null'])
+def test_bad_interaction_json_is_a_protocol_error(payload):
+    with pytest.raises(FrameProtocolError):
+        decode_frame(_with_interaction(payload))
+
+def test_truncated_frame_is_a_protocol_error():
+    with pytest.raises(FrameProtocolError):
+        decode_frame(encode_frame({'a': 1}, TIMESTAMP)[:-1])
+
+@pytest.mark.parametrize('sample_rate', [1, 7999, 96001, 1_000_003, 2**32 - 1])
+def test_sample_rate_outside_supported_range_is_a_protocol_error(sample_rate):
+    pcm = np.zeros(160, dtype=np.int16).tobytes()
+    with pytest.raises(FrameProtocolError):
+        decode_frame(encode_frame({}, TIMESTAMP, audio=pcm, audio_format=AUDIO_PCM_S16LE, sample_rate=sample_rate))
+
+@pytest.mark.parametrize('timestamp_ms', [float('nan'), float('inf'), -float('inf'), -1.0, 1e300])
+def test_bad_timestamp_is_a_protocol_error(timestamp_ms):
+    frame = encode_frame({}, TIMESTAMP)
+    fields = list(HEADER.unpack_from(frame))
+    fields[3] = timestamp_ms
+    with pytest.raises(FrameProtocolError):
+        decode_frame(HEADER.pack(*fields) + frame[HEADER.size:])
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect
+
+from app.models.database import Base, EmotionLog, create_missing_columns
+from app.services import emotion_detection, prediction_batcher
+from app.services.emotion_detection import EmotionDetectionService, _frame_version
+from app.utils.frame_protocol import EmotionFrame
+
+def test_frame_version_prefers_reported_versions():
+    assert _frame_version((None, None, None), 'v1') == 'v1'
+    assert _frame_version(('v2', None, 'v2'), 'v1') == 'v2'
+    assert _frame_version(('v1', 'v2', 'v2'), 'v2') == 'v1+v2'
+
+def test_frame_is_stamped_with_the_version_that_scored_it(monkeypatch):
+    # A swap lands while the frame is being scored: the worker ran v1, v2 is active after
+    class Models:
+        version = 'v1'
+
+        def preprocess_interaction_data(self, data):
+            return np.zeros((1, 10))
+
+        def predict_versioned(self, name, features):
+            ran = self.version
+            self.version = 'v2'
+            return ran, [0.9]
+
+    models = Models()
+    monkeypatch.setattr(prediction_batcher, 'emotion_models', models)
+    monkeypatch.setattr(emotion_detection, 'emotion_models', models)
+    batcher = prediction_batcher.PredictionBatcher(enabled=True, max_batch_size=1)
+    monkeypatch.setattr(emotion_detection, 'prediction_batcher', batcher)
+
+    async def score():
+        frame = EmotionFrame(interaction_data={'idle_time_seconds': 3}, timestamp=datetime.utcnow())
+        return await EmotionDetectionService().process_frame(frame)
+
+    response = asyncio.run(score())
+    assert response.interaction_score == 0.9
+    assert response.model_version == 'v1'
+    assert models.version == 'v2'
+
+def test_missing_columns_are_added(db_schema):
+    Base.metadata.drop_all(bind=db_schema, tables=[EmotionLog.__table__])
+    Table("emotion_logs", MetaData(), Column("id", Integer, primary_key=True),
+          Column("user_id", Integer), Column("timestamp", DateTime), Column("primary_emotion", String)
+          ).create(bind=db_schema)
+    create_missing_columns(db_schema)
+    columns = {column['name'] for column in inspect(db_schema).get_columns("emotion_logs")}
+    assert {'model_version', 'facial_emotions', 'engagement_level'} <= columns
+
+def _registry(tmp_path, monkeypatch, *versions):
+    from app.models import emotion_models as models_module
+
+    monkeypatch.setattr(models_module.settings, 'MODEL_REGISTRY_DIR', str(tmp_path))
+    monkeypatch.setattr(models_module.settings, 'MODEL_RELOAD_CHECK_SECONDS', 0.001)
+    for version in versions:
+        (tmp_path / version).mkdir()
+
+    def load_version(self, paths=None, version=None):
+        # Stands in for loading and warming up real model files
+        self.active = models_module.ModelSet(paths, version)
+        return self.active
+
+    monkeypatch.setattr(models_module.EmotionModelManager, 'load_version', load_version)
+    return models_module
+
+def _checked(manager):
+    """Active version after one periodic check and any switch it started"""
+    manager._next_update_check = 0.0
+    manager.version  # runs the periodic check
+    if manager._reload_thread is not None:
+        manager._reload_thread.join()
+    return manager.active.version
+
+def test_activated_version_reaches_other_processes(tmp_path, monkeypatch):
+    models_module = _registry(tmp_path, monkeypatch, 'v1', 'v2')
+    admin_worker, other_worker = models_module.EmotionModelManager(), models_module.EmotionModelManager()
+
+    admin_worker.activate('v2')
+    assert models_module.read_active_version() == 'v2'
+    assert admin_worker.active.version == 'v2'
+    assert _checked(other_worker) == 'v2'
+    # A process started after the switch serves the pointed version right away
+    assert models_module.EmotionModelManager().active.version == 'v2'
+
+def test_unusable_pointer_keeps_the_active_version(tmp_path, monkeypatch):
+    models_module = _registry(tmp_path, monkeypatch, 'v1')
+    worker = models_module.EmotionModelManager()
+    worker.activate('v1')
+    (tmp_path / models_module.ACTIVE_POINTER).write_text('../v1')
+    assert _checked(worker) == 'v1'
+
+def test_failed_pointer_write_rolls_back(tmp_path, monkeypatch):
+    models_module = _registry(tmp_path, monkeypatch, 'v1', 'v2')
+    worker = models_module.EmotionModelManager()
+    worker.activate('v1')
+
+    def fail(version):
+        raise OSError("read-only registry")
+
+    monkeypatch.setattr(models_module, 'write_active_version', fail)
+    with pytest.raises(OSError):
+        worker.activate('v2')
+    assert worker.active.version == 'v1'
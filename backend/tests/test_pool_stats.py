@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app.utils.pool_stats import PoolStats
+
+def test_stats_follow_the_pool_after_dispose(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=QueuePool, pool_size=2)
+    stats = PoolStats(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    # gunicorn's master disposes the engine before forking workers
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with stats.timed_checkout():
+            second = engine.connect()
+        assert stats.stats()['checked_out'] == 2
+        second.close()
+
+    result = stats.stats()
+    assert result['checkouts'] == 3
+    assert result['connections_opened'] == 3
+    assert result['peak_checked_out'] == 2
+    assert result['checked_out'] == 0
+    assert stats.waits == 1
@@ -0,0 +1,28 @@
+import asyncio
+
+import numpy as np
+
+from app.services import prediction_batcher
+from app.services.prediction_batcher import PredictionBatcher
+
+def test_running_batches_are_referenced_until_done(monkeypatch):
+    release = asyncio.Event()
+
+    async def run(fn, model, features):
+        await release.wait()
+        return 'v1', [0.7] * len(features)
+
+    monkeypatch.setattr(prediction_batcher.inference_executor, 'run', run)
+    batcher = PredictionBatcher(enabled=True, max_batch_size=2)
+
+    async def predict_pair():
+        pending = asyncio.gather(*(batcher.predict('interaction', np.zeros((1, 10))) for _ in range(2)))
+        await asyncio.sleep(0)
+        assert len(batcher._tasks) == 1
+        release.set()
+        results = await pending
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(predict_pair()) == [(0.7, 'v1'), (0.7, 'v1')]
+    assert not batcher._tasks
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app.models.database import AsyncSessionLocal, async_engine
+from app.utils.time_ranges import day_bounds, floor_datetime, year_bounds
+
+def test_bounds_are_half_open_whole_days():
+    assert day_bounds(date(2026, 2, 27), date(2026, 2, 28)) == (datetime(2026, 2, 27), datetime(2026, 3, 1))
+    assert year_bounds(2026) == (datetime(2026, 1, 1), datetime(2027, 1, 1))
+    assert floor_datetime(datetime(2026, 10, 17, 13, 45, 2), 'month') == datetime(2026, 10, 1)
+
+def _statements(call):
+    """SQL and parameters of every statement the async call runs"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    async def run():
+        event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            async with AsyncSessionLocal() as db:
+                await call(db)
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+            await async_engine.dispose()
+    asyncio.run(run())
+    return statements
+
+def _plans(engine, statements, table):
+    """EXPLAIN QUERY PLAN detail lines of each captured query reading table"""
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement.lstrip().upper().startswith("SELECT") and f"FROM {table}" in statement:
+                rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                plans.append(" | ".join(row[-1] for row in rows))
+    assert plans, f"no query on {table} was captured"
+    return plans
+
+def test_timeline_query_uses_user_timestamp_index(db_schema):
+    from app.api.routes.analytics import get_emotion_timeline
+
+    statements = _statements(lambda db: get_emotion_timeline(1, 24, True, db))
+    for plan in _plans(db_schema, statements, "emotion_logs"):
+        assert "USING INDEX ix_emotion_logs_user_timestamp (user_id=? AND timestamp>? AND timestamp<?)" in plan
+
+def test_yearly_report_queries_use_user_start_index(db_schema):
+    from app.services.report_service import report_service
+
+    statements = _statements(lambda db: report_service.generate_yearly_report(1, db, 2026))
+    for plan in _plans(db_schema, statements, "learning_sessions"):
+        assert "USING INDEX ix_learning_sessions_user_start (user_id=? AND start_time>? AND start_time<?)" in plan
+
+def test_report_intervention_query_uses_session_timestamp_index(db_schema):
+    from app.services.report_service import report_service
+
+    statements = _statements(lambda db: report_service.generate_weekly_report(1, db))
+    plans = _plans(db_schema, statements, "interventions")
+    assert any(
+        "USING INDEX ix_interventions_session_timestamp (session_id=? AND timestamp>? AND timestamp<?)" in plan
+        for plan in plans
+    ), plans
+
+def test_intervention_history_uses_session_timestamp_index(db_schema):
+    from app.api.routes.feedback import get_intervention_history
+
+    statements = _statements(lambda db: get_intervention_history(1, 50, db))
+    for plan in _plans(db_schema, statements, "interventions"):
+        assert "ix_interventions_session_timestamp" in plan
+        assert "ix_learning_sessions_user_start" in plan
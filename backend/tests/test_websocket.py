@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import emotions
+from app.models.schemas import EmotionResponse
+from app.services.emotion_log_writer import emotion_log_writer
+from app.utils.frame_queue import LatestFrameQueue
+
+def _client():
+    app = FastAPI()
+    app.include_router(emotions.router)
+    return TestClient(app)
+
+def _message(n: int) -> str:
+    return json.dumps({
+        'facial_frame': None,
+        'audio_chunk': base64.b64encode(bytes([n]) * 4).decode(),
+        'interaction_data': {'n': n},
+        'timestamp': datetime(2026, 10, 17).isoformat()
+    })
+
+def _response() -> EmotionResponse:
+    return EmotionResponse(
+        primary_emotion='neutral', confidence=0.5, engagement_level=0.5, facial_emotions={},
+        voice_emotions={}, interaction_score=0.5, needs_intervention=False
+    )
+
+def test_queue_reports_dropped_frames_oldest_first():
+    dropped = []
+    queue = LatestFrameQueue(1, on_drop=dropped.append)
+    for frame in (1, 2, 3):
+        queue.put(frame)
+    assert dropped == [1, 2]
+    assert queue.dropped == 2
+
+def test_failed_connection_is_unregistered(monkeypatch):
+    async def fail(frame, connection_id=None):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(emotions.emotion_service, 'process_frame', fail)
+    with _client().websocket_connect("/ws/7") as websocket:
+        websocket.send_text(_message(1))
+        assert websocket.receive()['type'] == 'websocket.close'
+    assert emotions.manager.active_connections == []
+    assert 7 not in emotions.manager.user_connections
+
+def _run_with_backlog(monkeypatch, user_id: int, count: int):
+    """Send count frames while the first is being analyzed; returns the calls made, in order"""
+    calls = []
+    received = asyncio.Event()
+
+    async def process(frame, connection_id=None):
+        calls.append(('process', frame.interaction_data['n']))
+        if frame.interaction_data['n'] == 1:
+            # The other frames arrive while frame 1 is analyzed; only the last one stays queued
+            await received.wait()
+        return _response()
+
+    async def buffer_audio(frames, connection_id):
+        calls.append(('audio', [frame.interaction_data['n'] for frame in frames]))
+
+    original_put = LatestFrameQueue.put
+
+    def put(queue, frame):
+        original_put(queue, frame)
+        if queue.received == count:
+            received.set()
+
+    monkeypatch.setattr(emotions.emotion_service, 'process_frame', process)
+    monkeypatch.setattr(emotions.emotion_service, 'buffer_audio', buffer_audio)
+    monkeypatch.setattr(LatestFrameQueue, 'put', put)
+    monkeypatch.setattr(emotion_log_writer, 'add', lambda row: None)
+    with _client().websocket_connect(f"/ws/{user_id}") as websocket:
+        for n in range(1, count + 1):
+            websocket.send_text(_message(n))
+        websocket.receive_text()
+        websocket.receive_text()
+    assert emotions.manager.active_connections == []
+    return calls
+
+def test_superseded_frames_feed_audio_before_the_next_frame(monkeypatch):
+    calls = _run_with_backlog(monkeypatch, 8, 3)
+    assert calls == [('process', 1), ('audio', [2]), ('process', 3)]
+
+def test_superseded_audio_is_bounded(monkeypatch):
+    count = 100
+    calls = _run_with_backlog(monkeypatch, 9, count)
+    # Frames 2..count-1 are dropped; the newest 64 are kept
+    assert calls == [('process', 1), ('audio', list(range(count - 64, count))), ('process', count)]
+
+def test_superseded_audio_older_than_the_voice_window_is_dropped():
+    clock = iter([0.0, 2.0, 4.0, 5.0])
+    superseded = emotions.SupersededAudio(3.0, clock=lambda: next(clock))
+    for n in range(1, 5):
+        superseded.add(emotions._parse_frame({'text': _message(n)}))
+    assert [frame.interaction_data['n'] for frame in superseded.take()] == [2, 3, 4]
+    assert superseded.take() == []
+
+def test_buffered_audio_reaches_the_stream_without_a_vector(monkeypatch):
+    from app.services.emotion_detection import EmotionDetectionService
+    from app.utils.frame_protocol import EmotionFrame
+
+    monkeypatch.setattr(emotions.settings, 'VAD_ENABLED', False)
+    service = EmotionDetectionService()
+    pcm = (0.1 * np.sin(np.arange(4410) / 5.0)).astype(np.float32)
+    frames = [EmotionFrame({}, datetime(2026, 10, 17), pcm=pcm, sample_rate=22050) for _ in range(3)]
+    asyncio.run(service.buffer_audio(frames, 'connection'))
+    assert service.connections['connection'].audio_stream._pcm.total_written == 3 * 4410
@@ -1,8 +1,9 @@
 import React, { useRef, useEffect, useState } from "react";
 import Webcam from "react-webcam";
+import { encodeFrame, floatToPcm16 } from "@/lib/api/frameProtocol";
 
 const WS_URL = "ws://localhost:8000/ws/1"; // Replace 1 with dynamic user_id as needed
-const INTERVAL_MS = 3000; // Send data every 3 seconds
+const INTERVAL_MS = 3000; // Send data every 3 seconds (slower if the server asks)
 
 const defaultInteraction = {
   idle_time_seconds: 0,
@@ -24,27 +25,32 @@ export default function SessionEmotionDetector() {
   const [emotion, setEmotion] = useState<any>(null);
   const [sessionStart, setSessionStart] = useState<number | null>(null);
   const [isSessionActive, setIsSessionActive] = useState(false);
-  const [mediaRecorder, setMediaRecorder] = useState<MediaRecorder | null>(null);
-  const audioChunksRef = useRef<Blob[]>([]);
+  const audioChunksRef = useRef<Float32Array[]>([]);
+  const sampleRateRef = useRef<number>(0);
   const sendLoopRef = useRef<NodeJS.Timeout | null>(null);
+  const intervalRef = useRef<number>(INTERVAL_MS);
 
-  // --- Audio recording setup ---
+  // --- Audio capture setup (raw PCM, sent as binary) ---
   useEffect(() => {
     if (!isSessionActive) return;
-    let recorder: MediaRecorder;
+    let audioContext: AudioContext;
+    let processor: ScriptProcessorNode;
+    let source: MediaStreamAudioSourceNode;
     let stream: MediaStream;
-    let stopped = false;
 
     const startAudio = async () => {
       try {
         stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        recorder = new MediaRecorder(stream);
-        setMediaRecorder(recorder);
+        audioContext = new AudioContext();
+        sampleRateRef.current = audioContext.sampleRate;
+        source = audioContext.createMediaStreamSource(stream);
+        processor = audioContext.createScriptProcessor(4096, 1, 1);
         audioChunksRef.current = [];
-        recorder.ondataavailable = (e) => {
-          if (e.data.size > 0) audioChunksRef.current.push(e.data);
+        processor.onaudioprocess = (e) => {
+          audioChunksRef.current.push(new Float32Array(e.inputBuffer.getChannelData(0)));
         };
-        recorder.start();
+        source.connect(processor);
+        processor.connect(audioContext.destination);
       } catch (err) {
         console.error("Audio recording error", err);
       }
@@ -52,14 +58,13 @@ export default function SessionEmotionDetector() {
     startAudio();
 
     return () => {
-      stopped = true;
-      if (recorder && recorder.state !== "inactive") {
-        recorder.stop();
-      }
+      processor?.disconnect();
+      source?.disconnect();
+      audioContext?.close();
       if (stream) {
         stream.getTracks().forEach((track) => track.stop());
       }
-      setMediaRecorder(null);
+      audioChunksRef.current = [];
     };
   }, [isSessionActive]);
 
@@ -128,30 +133,41 @@ export default function SessionEmotionDetector() {
   useEffect(() => {
     if (!isSessionActive) return;
     wsRef.current = new WebSocket(WS_URL);
+    wsRef.current.binaryType = "arraybuffer";
     wsRef.current.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
-        if (data.primary_emotion) setEmotion(data);
+        if (data.type === "backpressure") {
+          // Server is dropping frames: send no faster than it can process
+          intervalRef.current = Math.max(INTERVAL_MS, data.suggested_interval_ms);
+        } else if (data.primary_emotion) setEmotion(data);
       } catch {}
     };
     wsRef.current.onerror = (e) => { console.error("WebSocket error", e); };
     wsRef.current.onclose = () => { console.log("WebSocket closed"); };
 
-    sendLoopRef.current = setInterval(async () => {
-      if (!wsRef.current || wsRef.current.readyState !== 1) return;
-      const facial_frame = webcamRef.current?.getScreenshot();
-      const audio_chunk = await getAudioChunkBase64();
-      wsRef.current.send(JSON.stringify({
-        facial_frame,
-        audio_chunk,
-        interaction_data: interaction,
-        timestamp: new Date().toISOString(),
-      }));
-    }, INTERVAL_MS);
+    intervalRef.current = INTERVAL_MS;
+    let stopped = false;
+    const sendFrame = async () => {
+      if (stopped) return;
+      if (wsRef.current && wsRef.current.readyState === 1) {
+        const image = await captureJpeg();
+        const pcm = takeAudioChunk();
+        wsRef.current.send(encodeFrame({
+          image,
+          pcm,
+          sampleRate: sampleRateRef.current,
+          interaction,
+        }));
+      }
+      if (!stopped) sendLoopRef.current = setTimeout(sendFrame, intervalRef.current);
+    };
+    sendLoopRef.current = setTimeout(sendFrame, intervalRef.current);
 
     return () => {
+      stopped = true;
       wsRef.current?.close();
-      if (sendLoopRef.current) clearInterval(sendLoopRef.current);
+      if (sendLoopRef.current) clearTimeout(sendLoopRef.current);
     };
   }, [isSessionActive, interaction]);
 
@@ -164,39 +180,34 @@ export default function SessionEmotionDetector() {
     setIsSessionActive(false);
     setSessionStart(null);
     setEmotion(null);
-    if (sendLoopRef.current) clearInterval(sendLoopRef.current);
+    if (sendLoopRef.current) clearTimeout(sendLoopRef.current);
   };
 
-  // --- Helper: Audio recording and conversion to base64 ---
-  async function getAudioChunkBase64() {
-    if (!mediaRecorder) return null;
-    if (mediaRecorder.state === "recording") {
-      mediaRecorder.stop();
-      // Wait for stop event and get the audio blob
-      const audioBlob = await new Promise<Blob>((resolve) => {
-        mediaRecorder.onstop = () => {
-          const blob = new Blob(audioChunksRef.current, { type: 'audio/wav' });
-          audioChunksRef.current = [];
-          resolve(blob);
-        };
-      });
-      // Restart recording for next chunk
-      mediaRecorder.start();
-      // Convert blob to base64
-      const base64 = await blobToBase64(audioBlob);
-      return base64;
+  // --- Helper: Drain captured audio into one PCM16 chunk ---
+  function takeAudioChunk(): Int16Array | null {
+    const chunks = audioChunksRef.current;
+    if (!chunks.length) return null;
+    audioChunksRef.current = [];
+    const length = chunks.reduce((n, c) => n + c.length, 0);
+    const samples = new Float32Array(length);
+    let offset = 0;
+    for (const chunk of chunks) {
+      samples.set(chunk, offset);
+      offset += chunk.length;
     }
-    return null;
+    return floatToPcm16(samples);
   }
 
-  function blobToBase64(blob: Blob): Promise<string> {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onloadend = () => {
-        resolve(reader.result as string);
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(blob);
+  // --- Helper: Webcam frame as raw JPEG bytes ---
+  function captureJpeg(): Promise<ArrayBuffer | null> {
+    const canvas: HTMLCanvasElement | null = webcamRef.current?.getCanvas();
+    if (!canvas) return Promise.resolve(null);
+    return new Promise((resolve) => {
+      canvas.toBlob(
+        (blob) => (blob ? blob.arrayBuffer().then(resolve) : resolve(null)),
+        "image/jpeg",
+        0.8
+      );
     });
   }
 
@@ -0,0 +1,59 @@
+// Binary frame encoder for the /emotions/ws/{user_id} socket.
+// Must match backend/app/utils/frame_protocol.py.
+
+const MAGIC_S = 0x53; // 'S'
+const MAGIC_B = 0x42; // 'B'
+const PROTOCOL_VERSION = 1;
+const HEADER_SIZE = 28;
+
+export const AUDIO_NONE = 0;
+export const AUDIO_PCM_S16LE = 1;
+export const AUDIO_PCM_F32LE = 2;
+export const AUDIO_WAV = 3;
+
+export interface FrameParts {
+  image?: ArrayBuffer | null;
+  pcm?: Int16Array | null;
+  sampleRate?: number;
+  interaction: Record<string, unknown>;
+  timestamp?: number; // ms since epoch
+}
+
+export function floatToPcm16(samples: Float32Array): Int16Array {
+  const out = new Int16Array(samples.length);
+  for (let i = 0; i < samples.length; i++) {
+    const s = Math.max(-1, Math.min(1, samples[i]));
+    out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return out;
+}
+
+export function encodeFrame({ image, pcm, sampleRate = 0, interaction, timestamp = Date.now() }: FrameParts): ArrayBuffer {
+  const imageBytes = image ? new Uint8Array(image) : new Uint8Array(0);
+  const audioBytes = pcm ? new Uint8Array(pcm.buffer, pcm.byteOffset, pcm.byteLength) : new Uint8Array(0);
+  const interactionBytes = new TextEncoder().encode(JSON.stringify(interaction));
+
+  const total = HEADER_SIZE + imageBytes.length + audioBytes.length + interactionBytes.length;
+  const buffer = new ArrayBuffer(total);
+  const view = new DataView(buffer);
+
+  view.setUint8(0, MAGIC_S);
+  view.setUint8(1, MAGIC_B);
+  view.setUint8(2, PROTOCOL_VERSION);
+  view.setUint8(3, pcm ? AUDIO_PCM_S16LE : AUDIO_NONE);
+  view.setFloat64(4, timestamp, true);
+  view.setUint32(12, pcm ? sampleRate : 0, true);
+  view.setUint32(16, imageBytes.length, true);
+  view.setUint32(20, audioBytes.length, true);
+  view.setUint32(24, interactionBytes.length, true);
+
+  const body = new Uint8Array(buffer);
+  let offset = HEADER_SIZE;
+  body.set(imageBytes, offset);
+  offset += imageBytes.length;
+  body.set(audioBytes, offset);
+  offset += audioBytes.length;
+  body.set(interactionBytes, offset);
+
+  return buffer;
+}